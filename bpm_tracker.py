@@ -1,22 +1,85 @@
+from adafruit_ticks import ticks_diff
+
+
 class BPMTracker:
-    def __init__(self):
-        self.timestamps = []
+    """
+    Tempo from MIDI clock timestamps, in ``adafruit_ticks`` milliseconds.
 
-    def add_timestamp(self, timestamp):
-        self.timestamps.append(timestamp)
-        # Keep only the last 5 timestamps
-        if len(self.timestamps) > 10:
-            self.timestamps.pop(0)
+    Intervals between ticks go into a preallocated ring buffer and a running
+    sum is kept alongside, so each tick costs the same few operations however
+    long the window is and nothing is allocated on the clock path.
+    Timestamps are integer ticks, so the tempo is as accurate after days of
+    uptime as after a minute; intervals are taken with ``ticks_diff`` and
+    survive the tick counter wrapping.
 
-    def calculate_bpm(self):
-        if len(self.timestamps) < 2:
-            return 0  # Not enough data to calculate BPM
+    :param int size: Number of tick intervals averaged, 24 is one beat of MIDI clock.
+    :param int ppqn: Ticks per quarter note of the incoming clock.
+    :param float outlier_ratio: If set, intervals further than this fraction from the
+      current average are left out, so a late or dropped tick does not move the tempo.
+    :param float smoothing: If set, EMA factor (0-1) applied to the reported BPM.
+    """
+
+    def __init__(self, size=24, ppqn=24, outlier_ratio=None, smoothing=None):
+        self.intervals = [0.0] * size
+        self.ppqn = ppqn
+        self.outlier_ratio = outlier_ratio
+        self.smoothing = smoothing
+        self.outliers = 0
+        self.reset()
+
+    def reset(self):
+        """Forget the clock history, e.g. on MIDI Start after the clock was stopped."""
+        self.index = 0
+        self.count = 0
+        self.interval_sum = 0.0
+        self.last_timestamp = None
+        self.consecutive_outliers = 0
+        self.bpm = 0
 
-        # Calculate average difference between timestamps
-        diffs = [self.timestamps[i] - self.timestamps[i - 1] for i in range(1, len(self.timestamps))]
-        avg_diff = sum(diffs) / len(diffs)
+    def add_timestamp(self, timestamp, ticks=1):
+        """Record a clock tick, or ``ticks`` ticks that were read together at ``timestamp``."""
+        last_timestamp = self.last_timestamp
+        self.last_timestamp = timestamp
+        if last_timestamp is None:
+            return
+        interval = ticks_diff(timestamp, last_timestamp) / ticks
+        if interval <= 0:
+            return
 
-        # Convert average difference to BPM (60 seconds per minute)
-        if avg_diff == 0:
-            return 0  # Prevent division by zero
-        return 60 / avg_diff
+        if self.outlier_ratio is not None and self.count:
+            average = self.interval_sum / self.count
+            if abs(interval - average) > average * self.outlier_ratio:
+                self.outliers += 1
+                self.consecutive_outliers += 1
+                if self.consecutive_outliers < len(self.intervals):
+                    return
+                # A whole window of outliers is a tempo change: start again from here.
+                self.index = 0
+                self.count = 0
+                self.interval_sum = 0.0
+                self.bpm = 0
+            self.consecutive_outliers = 0
+
+        size = len(self.intervals)
+        if self.count < size:
+            self.count += 1
+        else:
+            self.interval_sum -= self.intervals[self.index]
+        self.intervals[self.index] = interval
+        self.interval_sum += interval
+        self.index += 1
+        if self.index == size:
+            self.index = 0
+            # Re-add the window once per lap so rounding error cannot build up.
+            if self.count == size:
+                self.interval_sum = sum(self.intervals)
+
+        # Convert average tick interval to BPM (60000 ms per minute)
+        bpm = 60000 / (self.interval_sum / self.count * self.ppqn)
+        if self.smoothing is None or not self.bpm:
+            self.bpm = bpm
+        else:
+            self.bpm += self.smoothing * (bpm - self.bpm)
+
+    def calculate_bpm(self):
+        return self.bpm  # 0 until there is enough data
@@ -0,0 +1,151 @@
+import array
+
+# Card presets live in one binary file on CIRCUITPY, built on the host by
+# host/make_cards.py:
+#
+#   header   4s magic, u8 version, u8 record size, u16 little-endian count
+#   records  count x RECORD_SIZE bytes:
+#     0      UID length (4 or 7)
+#     1-7    UID, zero padded
+#     8      MIDI channel, 0-15
+#     9      instrument on/off control number
+#     10     program number, NO_PROGRAM for none
+#     11-12  initial FX1 and FX2 values, KEEP_VALUE to leave the current one
+#     13     LED theme
+#     14-15  reserved
+CARD_DATABASE_PATH = "/cards.bin"
+MAGIC = b"NFCP"
+VERSION = 1
+HEADER_SIZE = 8
+RECORD_SIZE = 16
+MAX_UID_LENGTH = 7
+
+NO_PROGRAM = 0xFF
+KEEP_VALUE = 0xFF
+
+_CHANNEL = 8
+_ON_OFF_CC = 9
+_PROGRAM = 10
+_FX1 = 11
+_FX2 = 12
+_LED_THEME = 13
+
+_EMPTY = -1
+
+
+def uid_key(uid, length) -> int:
+    """
+    Fold a UID into an integer key. It stays below 2**30, a small int on
+    CircuitPython, at every step, so nothing is allocated.
+    """
+    key = length
+    for i in range(length):
+        # Rotate left by 5 within 30 bits, then mix in the next byte.
+        key = (((key & 0x1FFFFFF) << 5) | (key >> 25)) ^ uid[i]
+    return key
+
+
+class Preset():
+    def __init__(self, channel=0, on_off_cc=1, program=NO_PROGRAM,
+                 fx1=KEEP_VALUE, fx2=KEEP_VALUE, led_theme=0) -> None:
+        self.channel = channel
+        self.on_off_cc = on_off_cc
+        self.program = program
+        self.fx1 = fx1
+        self.fx2 = fx2
+        self.led_theme = led_theme
+
+
+class CardDatabase():
+    """
+    Card UID to preset lookup.
+
+    Nothing is read until the first `lookup`, so boot does not pay for the
+    file. The records stay in the buffer they were read into and are found
+    through an open-addressing table of record numbers keyed by `uid_key`:
+    two bytes per slot at most half full, on top of 16 bytes per card, so a
+    few hundred cards take a few kilobytes. A lookup only does small-int
+    arithmetic and byte compares.
+    """
+
+    def __init__(self, path=CARD_DATABASE_PATH) -> None:
+        self.path = path
+        self.loaded = False
+        self.records = b""
+        self.count = 0
+        self.index = array.array("h")
+        self.mask = 0
+        self._preset = Preset()
+
+    def load(self):
+        self.loaded = True
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except OSError:
+            print('no card database at', self.path)
+            return
+        if (len(data) < HEADER_SIZE or data[0:4] != MAGIC or data[4] != VERSION
+                or data[5] != RECORD_SIZE):
+            print('card database', self.path, 'is not version', VERSION)
+            return
+        count = data[6] | data[7] << 8
+        if len(data) < HEADER_SIZE + count * RECORD_SIZE:
+            print('card database', self.path, 'is truncated')
+            return
+
+        size = 8
+        while size < 2 * count:
+            size <<= 1
+        index = array.array("h", [_EMPTY] * size)
+        mask = size - 1
+        for number in range(count):
+            start = HEADER_SIZE + number * RECORD_SIZE
+            slot = uid_key(data[start + 1:start + 1 + data[start]], data[start]) & mask
+            while index[slot] != _EMPTY:
+                slot = (slot + 1) & mask
+            index[slot] = number
+
+        self.records = data
+        self.count = count
+        self.index = index
+        self.mask = mask
+
+    def lookup(self, uid, length) -> int:
+        """Record number of the card with the first ``length`` bytes of ``uid``, -1 if unknown."""
+        if not self.loaded:
+            self.load()
+        if not self.count or length > MAX_UID_LENGTH:
+            return -1
+        records = self.records
+        index = self.index
+        mask = self.mask
+        slot = uid_key(uid, length) & mask
+        while True:
+            number = index[slot]
+            if number == _EMPTY:
+                return -1
+            start = HEADER_SIZE + number * RECORD_SIZE
+            if records[start] == length:
+                i = 0
+                while i < length and records[start + 1 + i] == uid[i]:
+                    i += 1
+                if i == length:
+                    return number
+            slot = (slot + 1) & mask
+
+    def preset(self, number) -> Preset:
+        """
+        The preset of record ``number``. The same Preset object is refilled
+        on every call, so read it before looking up the next card.
+        """
+        start = HEADER_SIZE + number * RECORD_SIZE
+        records = self.records
+        preset = self._preset
+        preset.channel = records[start + _CHANNEL]
+        preset.on_off_cc = records[start + _ON_OFF_CC]
+        preset.program = records[start + _PROGRAM]
+        preset.fx1 = records[start + _FX1]
+        preset.fx2 = records[start + _FX2]
+        preset.led_theme = records[start + _LED_THEME]
+        return preset
@@ -1,16 +1,43 @@
+from adafruit_ticks import ticks_ms, ticks_add, ticks_diff
+# Startup stages are timed from here, before anything big is imported
+boot_time = ticks_ms()
+
 import asyncio
 import board
-import time
+import gc
 from digitalio import DigitalInOut
-from adafruit_simplemath import map_range
 
 from effect_control import EffectControl
 from rotary_encoder import RotaryEncoder
-from main_display import MainDisplay
-from led_manager import LedManager, POSSIBLE_LED_STATES
-from nfc_reader import NfcReader
+from nfc_pool import NfcReaderPool
 from midi_messenger import MidiMessenger
+from midi_clock import MidiClock, COMMAND_CLOCK_START, COMMAND_CLOCK_STOP, COMMAND_CLOCK_TEMPO
 from bpm_tracker import BPMTracker
+from card_database import CardDatabase, Preset, NO_PROGRAM, KEEP_VALUE
+from ndef_preset import PresetCache
+from wakeup import Wakeup
+from task_profiler import TaskProfiler, COMMAND_PRINT, COMMAND_SYSEX
+from trace_recorder import TraceRecorder, COMMAND_TRACE
+
+# ##########################################################
+# Startup
+#
+# MIDI and NFC come up as this file is imported, so a card on the reader
+# is answered as soon as possible. The display and the LEDs, and the big
+# libraries behind them, are imported and set up by start_up once main()
+# is running, STARTUP_STAGE_DELAY apart. Until then what they would show
+# is kept in controllerData and shown when they come up.
+#
+
+STARTUP_STAGE_DELAY = 0.1
+
+def startup_stage(name):
+    ms = ticks_diff(ticks_ms(), boot_time)
+    if hasattr(gc, "mem_free"):
+        gc.collect()
+        print(f"startup: {name} up at {ms} ms, {gc.mem_free()} bytes free")
+    else:
+        print(f"startup: {name} up at {ms} ms")
 
 # ##########################################################
 # ControllerData
@@ -24,42 +51,127 @@ class ControllerData():
         self.fx2_value = 100
 
         self.led_on = False
-        self.led_turned_on = False
-        self.led_on_timestamp = 0
+        self.led_state = "IDLE"
+        self.led_theme = None
+
+controllerData = ControllerData()
+
+# ##########################################################
+# Wakeups
+#
+# Tasks wait on a WakeSource instead of spinning, so the CPU can idle
+# between inputs. Every deadline and timer is kept here, in integer
+# adafruit_ticks milliseconds. Only USB MIDI in is checked every
+# millisecond; inputs that latch what happened in between, like the
+# encoder's count, are checked less often.
+#
+
+wakeup = Wakeup()
+
+# ##########################################################
+# Trace
+#
+# Inputs and MIDI in and out are recorded as they happen; COMMAND_TRACE
+# ("t") on the serial console dumps the trace for host/replay_trace.py.
+#
+
+trace = TraceRecorder()
 
 # ##########################################################
 # MIDI
 #
 
 midi_messenger = MidiMessenger()
-bpm_tracker = BPMTracker()
+midi_messenger.trace = trace
+bpm_tracker = BPMTracker(outlier_ratio=0.5, smoothing=0.1)
+
+BEAT_LED_MS = 100
+
+beat_led = DigitalInOut(board.GP25)
+beat_led.switch_to_output()
+
+def beat_led_off():
+    beat_led.value = 0
+    controllerData.led_on = False
+
+beat_led_timer = wakeup.timer(beat_led_off)
+
+def show_clock(position, on_beat):
+    # Beat and sub-beat frames go out as the tick comes or goes rather
+    # than when their tasks next get a turn
+    if led_manager is not None:
+        led_manager.clock(position, on_beat)
+    if on_beat:
+        beat_led.value = 1
+        controllerData.led_on = True
+        beat_led_timer.wake_after(BEAT_LED_MS)
+
+def show_clock_stopped():
+    if led_manager is not None:
+        led_manager.stop_clock()
+        led_wake.wake()
+
+def midi_out_pending():
+    # Queued control changes, or a program change left in the out buffer
+    return bool(midi_messenger.pending_cc) or midi_messenger.out_len > 0
+
+def midi_received():
+    # Runs on every wakeup poll, so clock ticks are timestamped as they arrive.
+    ticks = midi_messenger.receive_realtime()
+    if midi_clock.running:
+        # The controller is the clock master; incoming clock is not followed
+        return midi_out_pending()
+    if midi_messenger.transport_changed:
+        if midi_messenger.playing:
+            bpm_tracker.reset()
+        else:
+            show_clock_stopped()
+    if ticks:
+        bpm_tracker.add_timestamp(ticks_ms(), ticks)
+        if midi_messenger.playing is not False:
+            show_clock(midi_messenger.clock_position, midi_messenger.on_beat)
+    return midi_out_pending()
+
+midi_out_wake = wakeup.watch(midi_received)
 
 async def midi_listen(controllerData: ControllerData):
     while True:
-        msg = midi_messenger.midi.receive()
-        if msg is not None:
-            print("Received:", msg, "at", time.monotonic())
-            if midi_messenger.is_timing_clock_event(msg):
-                bpm_tracker.add_timestamp(time.monotonic())
-                bpm = bpm_tracker.calculate_bpm()
-                print('bpm', bpm)
-                controllerData.led_on = True
-        await asyncio.sleep(0)
-
-async def blink_beat(controllerData: ControllerData):
-    led = DigitalInOut(board.GP25)
-    led.switch_to_output()
+        await midi_out_wake.wait()
+        midi_messenger.send_pending()
+
+# ##########################################################
+# MIDI clock master
+#
+# The controller follows incoming clock until it is told to start its own
+# (COMMAND_CLOCK_START, "s", on the serial console); from then on it sends
+# clock at CLOCK_MASTER_BPM, or the tempo typed as "<bpm>b", and Stop and
+# Start with "x" and "s".
+#
+
+CLOCK_MASTER_BPM = 120
 
+midi_clock = MidiClock(midi_messenger, CLOCK_MASTER_BPM)
+
+clock_wake = wakeup.watch()
+
+async def run_midi_clock():
     while True:
-        if controllerData.led_on and controllerData.led_turned_on == False:
-            led.value = 1
-            controllerData.led_turned_on = True
-            controllerData.led_on_timestamp = time.monotonic()
-        if controllerData.led_on and time.monotonic() > controllerData.led_on_timestamp + 0.1:
-            led.value = 0
-            controllerData.led_on = False
-            controllerData.led_turned_on = False
-        await asyncio.sleep(0)
+        if not midi_clock.running:
+            await clock_wake.wait()
+            continue
+        if midi_clock.send_due():
+            if midi_clock.transport_changed and not midi_clock.playing:
+                show_clock_stopped()
+            elif midi_clock.playing:
+                show_clock(midi_clock.clock_position, midi_clock.on_beat)
+        await asyncio.sleep(midi_clock.ms_to_next() / 1000)
+
+async def clear_of_clock(ms):
+    # Hold off a job that ties up the loop for ``ms`` until it fits before
+    # the next clock tick the controller sends
+    wait = midi_clock.ms_to_next()
+    if 0 <= wait <= ms:
+        await asyncio.sleep((wait + 1) / 1000)
 
 
 
@@ -67,8 +179,39 @@ async def blink_beat(controllerData: ControllerData):
 # Display
 #
 
-mainDisplay = MainDisplay()
+# Set by start_display
+mainDisplay = None
+
+display_wake = wakeup.watch()
 
+def show_value(area, value):
+    if mainDisplay is not None:
+        mainDisplay.set_text_area_value(area, value)
+        display_wake.wake()
+
+def start_display():
+    global mainDisplay
+    from main_display import MainDisplay
+    display = MainDisplay()
+    display.set_text_area_value("state", "ON" if controllerData.instrument_on else "OFF")
+    display.set_text_area_value("fx_1", controllerData.fx1_value)
+    display.set_text_area_value("fx_2", controllerData.fx2_value)
+    mainDisplay = display
+    display_wake.wake()
+
+async def refresh_display():
+    while True:
+        await display_wake.wait()
+        delay = ticks_diff(mainDisplay.next_refresh_tick(), ticks_ms())
+        if delay > 0:
+            # Values set meanwhile are folded into this refresh
+            await asyncio.sleep(delay / 1000)
+        await clear_of_clock(mainDisplay.refresh_duration)
+        # Queued MIDI goes out before the refresh ties up the loop
+        midi_messenger.send_pending()
+        # Values shown while this one waited are in it
+        display_wake.clear()
+        mainDisplay.refresh()
 
 # ##########################################################
 # Rotary Encoder
@@ -78,102 +221,356 @@ rotaryEncoder = RotaryEncoder(
     board.GP13,
     board.GP14
 )
+rotaryEncoder.trace = trace
 
-FX_1_INCREMENT = 5
+# A spin is read until the encoder has rested FX_1_SETTLE seconds and sent
+# as one update; FX_1_MAX_HOLD_MS bounds how long an endless spin goes unsent
+FX_1_SETTLE = 0.04
+FX_1_MAX_HOLD_MS = 500
+
+# The encoder counts detents itself, so a turn is only noticed later
+ROTARY_CHECK_MS = 5
+
+rotary_wake = wakeup.watch(rotaryEncoder.hasRotated, ROTARY_CHECK_MS)
 
 async def rotary_listen(controllerData: ControllerData):        
     while True:
-        direction = rotaryEncoder.listenToRotation()
-        
-        if direction is not None:
-            if direction == "CLOCKWISE":
-                controllerData.fx1_value = min(127, controllerData.fx1_value + FX_1_INCREMENT)
-            elif direction == "ANTICLOCKWISE":
-                controllerData.fx1_value = max(0, controllerData.fx1_value - FX_1_INCREMENT)
+        await rotary_wake.wait()
+        value = controllerData.fx1_value
+        held_until = ticks_add(ticks_ms(), FX_1_MAX_HOLD_MS)
+        while True:
+            value = min(127, max(0, value + rotaryEncoder.read_accelerated()))
+            if ticks_diff(ticks_ms(), held_until) >= 0:
+                break
+            await asyncio.sleep(FX_1_SETTLE)
+            if not rotaryEncoder.hasRotated():
+                break
+        # Detents read above woke the poller too; they are already counted
+        rotary_wake.clear()
+
+        if value != controllerData.fx1_value:
+            controllerData.fx1_value = value
             midi_messenger.send_instrument_fx1(controllerData.fx1_value)
-            mainDisplay.set_text_area_value('fx_1', controllerData.fx1_value)
-        await asyncio.sleep(0)
+            show_value('fx_1', controllerData.fx1_value)
+            show_fx_levels()
 
 # ##########################################################
 # Effect controls (potentiometers and other analog input devices)
 #
 
+EFFECT_POLL_INTERVAL = 0.02
+
 fx2 = EffectControl(board.GP28, 200, 65000)
+fx2.trace = trace
+fx2.trace_id = 0
+
+def set_fx2(value):
+    controllerData.fx2_value = value
+    midi_messenger.send_instrument_fx2(controllerData.fx2_value)
+    show_value('fx_2', controllerData.fx2_value)
+    show_fx_levels()
+
+# Every analog control and what to do when its value moves, read by one task
+effect_controls = (
+    (fx2, set_fx2),
+)
 
 async def poll_effect_controls(controllerData: ControllerData):
     while True:
-        value = fx2.get_value()
-        mapped_value = round(map_range(value, 0, 65535, 0, 127))
-        if mapped_value != controllerData.fx2_value:
-            controllerData.fx2_value = mapped_value
-            midi_messenger.send_instrument_fx2(controllerData.fx2_value)
-            mainDisplay.set_text_area_value('fx_2', controllerData.fx2_value)
-        await asyncio.sleep(0.1)
+        for control, on_change in effect_controls:
+            if control.update():
+                on_change(control.value)
+        await asyncio.sleep(EFFECT_POLL_INTERVAL)
 
 # ##########################################################
 # LED Manager
 #
 
-led_manager = LedManager()
+# Set by start_leds
+led_manager = None
+
+led_wake = wakeup.watch()
+
+def show_fx_levels():
+    if led_manager is not None:
+        led_manager.show_levels(controllerData.fx1_value, controllerData.fx2_value)
+        led_wake.wake()
+
+def show_led_state(state):
+    controllerData.led_state = state
+    if led_manager is not None:
+        led_manager.transition(state)
+        led_wake.wake()
+
+def start_leds():
+    global led_manager
+    from led_manager import LedManager, POSSIBLE_LED_STATES
+    manager = LedManager(tempo_locked=True)
+    if controllerData.led_theme is not None:
+        manager.set_theme(controllerData.led_theme)
+    if controllerData.led_state != manager.state:
+        manager.transition(POSSIBLE_LED_STATES[controllerData.led_state])
+    led_manager = manager
 
 async def run_led_animations():
     while True:
         led_manager.animate()
-        await asyncio.sleep(0)
+        led_wake.wake_after(led_manager.next_frame_ms())
+        await led_wake.wait()
 
 # ##########################################################
 # NFC
 #
+# Each card slot is (TCA9548A channel, IRQ pin, instrument on/off CC); see
+# nfc_pool for the pins an IRQ can use. A single slot with no channel is
+# one PN532 straight on the bus. A slot's CC of None takes the card
+# preset's on/off CC, otherwise the slot's instrument is switched on that
+# CC whatever card is on it. For four slots behind a switch:
+#
+#   NFC_SLOTS = ((0, board.GP17, 20), (1, board.GP19, 21),
+#                (2, board.GP21, 22), (3, board.GP9, 23))
+#
+# With NFC_TARGETS = 2 two cards can be stacked on a slot to layer two
+# instruments, each switched on and off on its own. A slot with a CC of
+# its own then takes NFC_TARGETS CCs from it up, one per card, so the
+# four slots above would take 20, 22, 24 and 26. Overlapping CCs are
+# refused at startup.
+#
 
-def on_card_detected():
+NFC_SLOTS = ((None, board.GP17, None),)
+NFC_TARGETS = 1
+
+def check_slot_controls():
+    used = set()
+    for channel, irq, control in NFC_SLOTS:
+        if control is None:
+            continue
+        for cc in range(control, control + NFC_TARGETS):
+            if cc in used or not 0 <= cc <= 127:
+                raise ValueError(f"NFC_SLOTS: CC {cc} is out of range or taken by another slot")
+            used.add(cc)
+
+check_slot_controls()
+
+cardDatabase = CardDatabase()
+unknown_card_preset = Preset()
+# The (channel, CC) each card's instrument was switched on with, by slot
+# and target, None while it is off
+card_controls = [None] * (len(NFC_SLOTS) * NFC_TARGETS)
+
+def apply_preset(preset: Preset):
+    midi_messenger.out_channel = preset.channel
+    midi_messenger.on_off_control = preset.on_off_cc
+    if preset.program != NO_PROGRAM:
+        midi_messenger.send_program_change(preset.program)
+    if preset.fx1 != KEEP_VALUE:
+        controllerData.fx1_value = preset.fx1
+        midi_messenger.send_instrument_fx1(preset.fx1)
+        show_value('fx_1', preset.fx1)
+    if preset.fx2 != KEEP_VALUE:
+        controllerData.fx2_value = preset.fx2
+        midi_messenger.send_instrument_fx2(preset.fx2)
+        show_value('fx_2', preset.fx2)
+    controllerData.led_theme = preset.led_theme
+    if led_manager is not None:
+        led_manager.set_theme(preset.led_theme)
+
+def card_preset(reader):
+    # A preset written on the card wins over the local database
+    if reader.card_preset is not None:
+        return reader.card_preset
+    number = cardDatabase.lookup(reader.card_uid, reader.card_uid_length)
+    if number < 0:
+        print("unknown card", bytes(reader.card_uid[:reader.card_uid_length]))
+        return unknown_card_preset
+    return cardDatabase.preset(number)
+
+def instrument_control(reader, preset):
+    control = NFC_SLOTS[reader.slot][2]
+    return preset.on_off_cc if control is None else control + reader.card.number
+
+def on_card_detected(reader):
+    preset = card_preset(reader)
+    apply_preset(preset)
+    midi_messenger.on_off_control = instrument_control(reader, preset)
+    card_controls[reader.slot * NFC_TARGETS + reader.card.number] = (
+        preset.channel, midi_messenger.on_off_control)
     midi_messenger.send_instrument_on()
-    led_manager.transition(POSSIBLE_LED_STATES["LIVE"])
-    mainDisplay.set_text_area_value('state', "ON")
+    show_instrument_state()
+
+def on_card_swapped(reader):
+    # One card put straight on in place of another: the new preset goes out
+    # and the instrument stays on, so the LEDs and display stay as they are.
+    # Only a card for another instrument switches the old one off first,
+    # on its own channel.
+    card = reader.slot * NFC_TARGETS + reader.card.number
+    preset = card_preset(reader)
+    control = instrument_control(reader, preset)
+    old_channel, old_control = card_controls[card]
+    changed = control != old_control or preset.channel != old_channel
+    if changed:
+        midi_messenger.send_instrument_off(old_control, old_channel)
+        midi_messenger.send_pending()
+    apply_preset(preset)
+    midi_messenger.on_off_control = control
+    card_controls[card] = (preset.channel, control)
+    if changed:
+        midi_messenger.send_instrument_on()
+
+def on_card_removed(reader):
+    card = reader.slot * NFC_TARGETS + reader.card.number
+    channel, control = card_controls[card]
+    midi_messenger.send_instrument_off(control, channel)
+    card_controls[card] = None
+    show_instrument_state()
+
+def show_instrument_state():
+    # On while any card has its instrument on
+    on = any(control is not None for control in card_controls)
+    if on == controllerData.instrument_on:
+        return
+    controllerData.instrument_on = on
+    show_led_state("LIVE" if on else "IDLE")
+    show_value('state', "ON" if on else "OFF")
+
+
+def on_preset_changed(reader):
+    # The card was rewritten since it was last on the reader
+    if reader.card_preset is not None:
+        apply_preset(reader.card_preset)
+
+
+nfcReaders = NfcReaderPool(
+    NFC_SLOTS,
+    on_card_detected = on_card_detected,
+    on_card_removed = on_card_removed,
+    preset_cache = PresetCache(),
+    on_preset_changed = on_preset_changed,
+    max_targets = NFC_TARGETS,
+    on_card_swapped = on_card_swapped
+)
 
-def on_card_removed():
-    midi_messenger.send_instrument_off()
-    led_manager.transition(POSSIBLE_LED_STATES["IDLE"])
-    mainDisplay.set_text_area_value('state', "OFF")
+for reader in nfcReaders.readers:
+    reader.trace = trace
 
+# IRQ edges are counted, so none is missed between checks; each round
+# trip to a reader waits at most this long on top
+NFC_CHECK_MS = 2
 
-nfcReader = NfcReader(
-    on_card_detected = on_card_detected,
-    on_card_removed = on_card_removed
-)
+nfc_wake = wakeup.watch(nfcReaders.irq_pending, NFC_CHECK_MS)
 
 async def check_nfc_card():
+    # Longest a poll has held the loop, in ms
+    poll_duration = 0
+    nfc_wake.wake_at(nfcReaders.next_deadline())
     while True:
-        nfcReader.wait_for_card()
-        
-        await asyncio.sleep(0)
+        await nfc_wake.wait()
+        await clear_of_clock(poll_duration)
+        start = ticks_ms()
+        nfcReaders.poll()
+        poll_duration = max(poll_duration, ticks_diff(ticks_ms(), start))
+        nfc_wake.wake_at(nfcReaders.next_deadline())
+
+# ##########################################################
+# Serial console
+#
+# Type COMMAND_PRINT ("p") on the serial console for a table of every task's
+# step times and heap use, or COMMAND_SYSEX ("m") to have it sent as SysEx.
+# With PROFILE_SYSEX_INTERVAL_MS set the SysEx goes out that often unasked.
+# COMMAND_TRACE ("t") dumps the trace. The clock master commands are
+# under MIDI clock master.
+#
+
+PROFILE_SYSEX_INTERVAL_MS = None
+
+profiler = TaskProfiler()
+
+# Typed commands wait in the serial buffer
+CONSOLE_CHECK_MS = 50
+
+console_wake = wakeup.watch(profiler.command_pending, CONSOLE_CHECK_MS)
+
+def typed_bpm(commands):
+    # The number typed just before COMMAND_CLOCK_TEMPO, or None
+    end = commands.index(COMMAND_CLOCK_TEMPO)
+    start = end
+    while start > 0 and commands[start - 1] in "0123456789.":
+        start -= 1
+    try:
+        return float(commands[start:end])
+    except ValueError:
+        return None
+
+async def serve_console():
+    if PROFILE_SYSEX_INTERVAL_MS:
+        console_wake.period = PROFILE_SYSEX_INTERVAL_MS
+        console_wake.wake_after(PROFILE_SYSEX_INTERVAL_MS)
+    while True:
+        await console_wake.wait()
+        commands = profiler.read_commands()
+        if COMMAND_CLOCK_TEMPO in commands:
+            bpm = typed_bpm(commands)
+            try:
+                midi_clock.set_bpm(bpm)
+            except (TypeError, ValueError):
+                print("tempo?", bpm)
+        if COMMAND_CLOCK_START in commands:
+            midi_clock.start()
+            clock_wake.wake()
+        elif COMMAND_CLOCK_STOP in commands:
+            midi_clock.stop()
+        # One line or message per pass, so the MIDI path is never held up
+        if COMMAND_PRINT in commands:
+            for line in profiler.report_lines():
+                print(line)
+                await asyncio.sleep(0)
+        if COMMAND_TRACE in commands:
+            for line in trace.dump_lines():
+                print(line)
+                await asyncio.sleep(0)
+        if COMMAND_SYSEX in commands or console_wake.expired:
+            console_wake.expired = False
+            for message in profiler.sysex_messages():
+                midi_messenger.send_sysex(message)
+                await asyncio.sleep(0)
 
 # ##########################################################
 # main
 #
 
+def start_task(name, coro):
+    return asyncio.create_task(profiler.wrap(name, coro))
+
+async def start_up():
+    # Each stage holds the loop while it runs; the MIDI and NFC tasks get
+    # the time in between
+    await asyncio.sleep(STARTUP_STAGE_DELAY)
+    start_display()
+    display_task = start_task("display", refresh_display())
+    startup_stage("display")
+    await asyncio.sleep(STARTUP_STAGE_DELAY)
+    start_leds()
+    led_anim_task = start_task("leds", run_led_animations())
+    startup_stage("leds")
+    await asyncio.gather(display_task, led_anim_task)
+
 async def main():
     print('main() running')
+    startup_stage("midi, nfc")
+
+    tasks = (
+        ("midi", midi_listen(controllerData)),
+        ("nfc", check_nfc_card()),
+        ("clock", run_midi_clock()),
+        ("wakeup", wakeup.run()),
+        ("rotary", rotary_listen(controllerData)),
+        ("fx_controls", poll_effect_controls(controllerData)),
+        ("console", serve_console()),
+        ("startup", start_up()),
+    )
 
-    controllerData = ControllerData()
-
-    mainDisplay.set_text_area_value("state", "ON" if controllerData.instrument_on else "OFF")
-    mainDisplay.set_text_area_value("fx_1", controllerData.fx1_value)
-    mainDisplay.set_text_area_value("fx_1", controllerData.fx2_value)
-
-    rotary_task = asyncio.create_task(rotary_listen(controllerData))
-    poll_fx_controls_task = asyncio.create_task(poll_effect_controls(controllerData))
-    read_nfc_task = asyncio.create_task(check_nfc_card())
-    led_anim_task = asyncio.create_task(run_led_animations())
-    midi_listen_task = asyncio.create_task(midi_listen(controllerData))
-    blink_beat_task = asyncio.create_task(blink_beat(controllerData))
-    
     await asyncio.gather(
-        rotary_task,
-        poll_fx_controls_task,
-        read_nfc_task,
-        led_anim_task,
-        midi_listen_task,
-        blink_beat_task
+        *[start_task(name, coro) for name, coro in tasks]
         )
     
 asyncio.run(main())
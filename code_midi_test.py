@@ -55,13 +55,10 @@ rotaryEncoder = RotaryEncoder(
 
 async def rotary_listen(state: State):        
     while True:
-        direction = rotaryEncoder.listenToRotation()
-        if direction is not None:
-            print('on_rotate', direction)
-            if direction == "CLOCKWISE":
-                state.fx_val = min(127, state.fx_val + 1)
-            elif direction == "ANTICLOCKWISE":
-                state.fx_val = max(0, state.fx_val - 1)
+        delta = rotaryEncoder.read_delta()
+        if delta:
+            print('on_rotate', delta)
+            state.fx_val = min(127, max(0, state.fx_val + delta))
             state.midi.send(ControlChange(2, state.fx_val))
             print('state.fx_val', state.fx_val)  
         await asyncio.sleep(0)
@@ -1,11 +1,81 @@
 from microcontroller import Pin
 from analogio import AnalogIn
 
+# Reads averaged per update; each AnalogIn read is a separate conversion
+OVERSAMPLE = 8
+# EMA weight of a new burst is 1 / 2**EMA_SHIFT
+EMA_SHIFT = 2
+# The filtered reading has to pass a step boundary by this much (16-bit
+# counts, about a quarter of a step of 128) before the value moves
+HYSTERESIS = 128
+
 class EffectControl():
-    def __init__(self, pin: Pin, value_min: float, value_max: float) -> None:
+    """
+    A pot or other analog input mapped to ``steps`` values, 0 to steps - 1.
+
+    `update` takes ``oversample`` reads in a burst, folds their mean into an
+    integer EMA and maps it, with ``value_min`` and ``value_max`` as the
+    ends of travel, onto the output steps. The value only moves once the
+    EMA is ``hysteresis`` past a step boundary, so a pot left alone never
+    flickers between two steps. All math is on small ints.
+    """
+
+    def __init__(self, pin: Pin, value_min: float, value_max: float, steps=128,
+                 oversample=OVERSAMPLE, ema_shift=EMA_SHIFT, hysteresis=HYSTERESIS) -> None:
         self.input_device = AnalogIn(pin)
-        self.value_min = value_min
-        self.value_max = value_max
+        self.value_min = int(value_min)
+        self.value_max = int(value_max)
+        self.steps = steps
+        self.oversample = oversample
+        self.ema_shift = ema_shift
+        self.hysteresis = hysteresis
+        # EMA of the 16-bit reading, times 2**ema_shift
+        self.ema = None
+        self.value = None
+        # A TraceRecorder and this control's number in it, when traced
+        self.trace = None
+        self.trace_id = 0
 
     def get_value(self):
-        return self.input_device.value
\ No newline at end of file
+        return self.input_device.value
+
+    def read(self) -> int:
+        """Mean of one burst of reads, 16-bit."""
+        device = self.input_device
+        total = 0
+        for _ in range(self.oversample):
+            total += device.value
+        reading = total // self.oversample
+        if self.trace is not None:
+            # Every burst, so a replay feeds the filter exactly what it had
+            self.trace.adc(self.trace_id, reading)
+        return reading
+
+    def map(self, reading) -> int:
+        span = self.value_max - self.value_min
+        step = (reading - self.value_min) * self.steps // span
+        return 0 if step < 0 else self.steps - 1 if step >= self.steps else step
+
+    def update(self) -> bool:
+        """Read and filter the input; True if `value` changed."""
+        reading = self.read()
+        if self.ema is None:
+            self.ema = reading << self.ema_shift
+        else:
+            self.ema += reading - (self.ema >> self.ema_shift)
+        filtered = self.ema >> self.ema_shift
+
+        value = self.value
+        if value is None:
+            value = self.map(filtered)
+        else:
+            up = self.map(filtered - self.hysteresis)
+            down = self.map(filtered + self.hysteresis)
+            if up > value:
+                value = up
+            elif down < value:
+                value = down
+        if value == self.value:
+            return False
+        self.value = value
+        return True
@@ -0,0 +1,95 @@
+"""
+Update cost and tempo error of BPMTracker on synthetic 24 PPQN clock.
+
+    python host/bench_bpm.py
+
+Each stream has Gaussian timing jitter on every tick, as a USB host
+produces, plus an occasional tick delivered late. Timestamps are whole
+milliseconds, as ``adafruit_ticks.ticks_ms()`` gives them. The previous
+list-based tracker is included for comparison; its ticks-per-minute output
+is divided by 24 so both report BPM.
+"""
+
+import random
+import sys
+import time
+
+from picosim import Simulator, percentile
+
+PPQN = 24
+
+
+class ListBPMTracker:
+    """The tracker as it was: list.pop(0) and a fresh diff list per tick."""
+
+    def __init__(self):
+        self.timestamps = []
+
+    def add_timestamp(self, timestamp):
+        self.timestamps.append(timestamp)
+        if len(self.timestamps) > 10:
+            self.timestamps.pop(0)
+
+    def calculate_bpm(self):
+        if len(self.timestamps) < 2:
+            return 0
+        diffs = [self.timestamps[i] - self.timestamps[i - 1] for i in range(1, len(self.timestamps))]
+        avg_diff = sum(diffs) / len(diffs)
+        if avg_diff == 0:
+            return 0
+        return 60000 / avg_diff / PPQN
+
+
+def clock_stream(bpm, seconds, jitter, late_every, rng):
+    interval = 60 / (bpm * PPQN)
+    stamps = []
+    for i in range(int(seconds / interval)):
+        t = i * interval + rng.gauss(0, jitter)
+        if late_every and i % late_every == late_every - 1:
+            t += interval * 0.8
+        stamps.append(t)
+    return sorted(stamps)
+
+
+def measure(tracker, stamps, bpm, settle=2 * PPQN):
+    errors = []
+    jumps = []
+    previous = None
+    start = time.perf_counter_ns()
+    for i, t in enumerate(stamps):
+        tracker.add_timestamp(int(t * 1000))
+        estimate = tracker.calculate_bpm()
+        if i >= settle:
+            errors.append(abs(estimate - bpm))
+            if previous is not None:
+                jumps.append(abs(estimate - previous))
+            previous = estimate
+    cost = (time.perf_counter_ns() - start) / len(stamps) / 1000
+    return cost, percentile(errors, 0.5), max(errors), max(jumps)
+
+
+def main():
+    out = sys.stdout
+    with Simulator().installed():
+        from bpm_tracker import BPMTracker
+        run(BPMTracker, out)
+
+
+def run(BPMTracker, out):
+    trackers = {
+        "list (before)": ListBPMTracker,
+        "ring": BPMTracker,
+        "ring + outliers + ema": lambda: BPMTracker(outlier_ratio=0.5, smoothing=0.1),
+    }
+    print(f"{'stream':<28}{'tracker':<24}{'us/tick':>9}{'err p50':>9}{'err max':>9}{'jump max':>9}", file=out)
+    for bpm in (90, 120, 174):
+        for jitter_ms, late_every in ((0.5, 0), (2.0, 0), (2.0, 97)):
+            stamps = clock_stream(bpm, 60, jitter_ms / 1000, late_every, random.Random(bpm))
+            name = f"{bpm} bpm, {jitter_ms} ms" + (", late ticks" if late_every else "")
+            for label, factory in trackers.items():
+                cost, err50, err_max, jump = measure(factory(), stamps, bpm)
+                print(f"{name:<28}{label:<24}{cost:9.2f}{err50:9.2f}{err_max:9.2f}{jump:9.2f}", file=out)
+
+
+if __name__ == "__main__":
+    main()
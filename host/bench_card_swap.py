@@ -0,0 +1,119 @@
+"""
+Swapping one card for another in code.py: how soon the new instrument is
+out, and what MIDI, LED states and display values it took to get there.
+
+    python host/bench_card_swap.py
+
+Card A is on the reader; at SWAP_AT it is lifted and card B put down GAP
+seconds later. B has its preset in an NDEF record, A another, and B was
+on the reader once before so its preset is cached (the "cold" row is
+without). Both presets set a program, FX 1 and an LED theme, or in the
+"prog" rows only a program. "swap" is code.py as it is. "off/on" is the same with the
+reader's on_card_swapped taken away, which is how every swap went
+before: A off, the LEDs to IDLE and the display to OFF, then B on and
+everything back. Gaps beyond the presence timeout are not swaps either
+way. "new ms" runs from B going down to B's program change going out;
+the other columns list what happened from SWAP_AT on.
+"""
+
+import os
+import sys
+
+from picosim import Simulator
+from picosim.devices import Card
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import make_cards  # noqa: E402
+
+CONTROL_CHANGE = 0xB0
+PROGRAM_CHANGE = 0xC0
+WARM_AT = 0.5
+A_AT = 2.0
+SWAP_AT = 3.0
+RUN = 4.5
+HOOK_POLL = 0.01
+
+GAPS = (0.0, 0.1, 0.25, 0.4, 0.7)
+
+
+def card_with_preset(uid, **fields):
+    uid, record = make_cards.pack_record({"uid": uid, **fields})
+    card = Card(uid)
+    ndef = make_cards.preset_ndef(record)
+    card.memory[16:16 + len(ndef)] = ndef
+    return card
+
+
+def run(gap, swap, warm, other_cc, program_only):
+    sim = Simulator()
+    a_fields = {} if program_only else {"fx1": "20", "led_theme": "1"}
+    b_fields = {} if program_only else {"fx1": "80", "led_theme": "2"}
+    a = card_with_preset("04:a1:b2:c3:d4:e5:f6", program="5", **a_fields)
+    b = card_with_preset("04:0b:1c:2d:3e:4f:50", program="9", on_off_cc="3" if other_cc else "1",
+                         **b_fields)
+    if warm:
+        sim.nfc.tap(b, at=WARM_AT, hold=0.5)
+    sim.nfc.place(a, at=A_AT)
+    sim.nfc.remove(a, at=SWAP_AT)
+    sim.nfc.place(b, at=SWAP_AT + gap)
+    led = []
+    shown = []
+
+    def hook(t):
+        # code.py's globals, while runpy has it installed as __main__
+        firmware = sys.modules["__main__"]
+        if not hasattr(firmware, "nfcReaders"):
+            # code.py is still being imported
+            sim.world.at(t + HOOK_POLL, hook)
+            return
+        show_led_state = firmware.show_led_state
+        show_value = firmware.show_value
+
+        def traced_led_state(state):
+            led.append((sim.world.now(), state))
+            show_led_state(state)
+
+        def traced_value(area, value):
+            if area == "state":
+                shown.append((sim.world.now(), value))
+            show_value(area, value)
+
+        firmware.show_led_state = traced_led_state
+        firmware.show_value = traced_value
+        if not swap:
+            for reader in firmware.nfcReaders.readers:
+                reader.on_card_swapped = None
+
+    sim.world.at(0.0, hook)
+    sim.run(RUN)
+
+    out = [(t, message) for t, message in sim.midi.received if t >= SWAP_AT and message[0] < 0xF0]
+    new = next((t for t, message in out if message[0] & 0xF0 == PROGRAM_CHANGE and message[1] == 9), None)
+    on_off = [f"{message[1]}:{'on' if message[2] else 'off'}" for t, message in out
+              if message[0] & 0xF0 == CONTROL_CHANGE and message[1] in (1, 3)]
+    return ((new - SWAP_AT - gap) * 1000 if new is not None else float("nan"),
+            len(out), " ".join(on_off) or "-",
+            " ".join(state for t, state in led if t >= SWAP_AT) or "-",
+            " ".join(value for t, value in shown if t >= SWAP_AT) or "-")
+
+
+def main():
+    out = sys.stdout
+    print(f"{'path':<10}{'preset':<7}{'cc':<7}{'gap s':>6}{'new ms':>8}{'midi':>6}  "
+          f"{'on/off out':<14}{'led':<12}display", file=out)
+    rows = [(gap, swap, True, False, False) for swap in (True, False) for gap in GAPS]
+    rows += [(0.0, True, False, False, False), (0.0, True, True, True, False),
+             (0.0, False, True, True, False), (0.0, True, True, False, True),
+             (0.0, False, True, False, True)]
+    for gap, swap, warm, other_cc, program_only in rows:
+        new, messages, on_off, led, shown = run(gap, swap, warm, other_cc, program_only)
+        path = ("swap" if swap else "off/on") + ("" if warm else " cold")
+        preset = "prog" if program_only else "fx"
+        cc = "other" if other_cc else "same"
+        print(f"{path:<10}{preset:<7}{cc:<7}{gap:6.2f}{new:8.1f}{messages:6d}  {on_off:<14}{led:<12}{shown}",
+              file=out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Card UID to preset lookup: CardDatabase against keying a dict by the hex
+string NfcReader used to build for every read.
+
+    python host/bench_cards.py --cards 300
+
+Builds a database of random 4 and 7 byte UIDs with make_cards, then times
+loading it and looking up every card plus as many unknown ones. Memory is
+what each approach keeps: the record buffer and index, or the dict with
+its string keys and preset tuples. Objects per lookup are counted the way
+CircuitPython would allocate them: the hex string path creates a string
+per byte and the joined key, CardDatabase only small ints.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import card_database  # noqa: E402
+import make_cards  # noqa: E402
+
+
+def random_cards(rng, count):
+    rows = []
+    uids = set()
+    while len(uids) < count:
+        uid = bytes(rng.randrange(256) for _ in range(rng.choice((4, 7))))
+        if uid in uids:
+            continue
+        uids.add(uid)
+        rows.append({"uid": uid.hex(), "channel": str(rng.randint(1, 16)),
+                     "on_off_cc": "1", "program": str(rng.randrange(128)),
+                     "fx1": "", "fx2": "64", "led_theme": str(rng.randrange(6))})
+    return rows
+
+
+def hex_key(uid, length):
+    return ''.join(hex(uid[i]) for i in range(length))
+
+
+def time_lookups(lookup, probes, rounds=20):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for uid, length in probes:
+            lookup(uid, length)
+    return (time.perf_counter() - start) / (rounds * len(probes)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cards", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    rows = random_cards(rng, args.cards)
+    data = make_cards.build(rows)
+    known = [bytes.fromhex(row["uid"]) for row in rows]
+    unknown = [bytes(rng.randrange(256) for _ in range(len(uid))) for uid in known]
+    # NfcReader hands over a fixed 10 byte buffer and a length.
+    probes = [(bytearray(uid) + bytearray(10 - len(uid)), len(uid)) for uid in known + unknown]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cards.bin")
+        with open(path, "wb") as f:
+            f.write(data)
+        db = card_database.CardDatabase(path)
+        start = time.perf_counter()
+        db.load()
+        load_ms = (time.perf_counter() - start) * 1000
+
+    for uid in known:
+        assert db.lookup(bytearray(uid), len(uid)) >= 0
+    misses = sum(db.lookup(uid, length) < 0 for uid, length in probes[len(known):])
+    db_bytes = len(db.records) + len(db.index) * db.index.itemsize
+    probe_lengths = []
+    for uid, length in probes:
+        slot = card_database.uid_key(uid, length) & db.mask
+        steps = 1
+        while db.index[slot] != -1:
+            slot = (slot + 1) & db.mask
+            steps += 1
+        probe_lengths.append(steps)
+
+    table = {}
+    for uid, row in zip(known, rows):
+        table[hex_key(uid, len(uid))] = (int(row["channel"]) - 1, 1, int(row["program"]), None, 64,
+                                         int(row["led_theme"]))
+    dict_bytes = sys.getsizeof(table) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in table.items())
+
+    print(f"{args.cards} cards, file {len(data)} bytes, loaded in {load_ms:.2f} ms, "
+          f"{misses}/{len(unknown)} unknown UIDs rejected, a miss probes at most {max(probe_lengths)} slots")
+    print(f"{'lookup':<22}{'us':>8}{'RAM bytes':>12}{'objects':>10}")
+    print(f"{'hex string dict':<22}{time_lookups(lambda u, n: table.get(hex_key(u, n)), probes):8.2f}"
+          f"{dict_bytes:12d}{'n + 1':>10}")
+    print(f"{'CardDatabase':<22}{time_lookups(db.lookup, probes):8.2f}{db_bytes:12d}{0:10d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Timing of the MIDI clock code.py sends as clock master, over a long run
+with the rest of the controller kept busy.
+
+    python host/bench_clock.py --duration 600 --bpm 120
+
+"<bpm>b" and "s" are typed on the serial console once the board is up.
+From then on a card is swapped, the encoder spun and the pot swept every
+CYCLE seconds, so NFC reads, display refreshes and LED frames keep
+competing with the clock. Tick intervals are measured where the host
+receives them; drift is how far the last tick is from where the first
+tick and the tempo put it. The profiler table typed out at the end
+shows which task's longest step a late tick could have waited behind.
+The simulator runs in real time, so a 600 s run takes ten minutes.
+"""
+
+import argparse
+import statistics
+import sys
+
+from picosim import Simulator, percentile
+from picosim.scenarios import CARD_A, CARD_B
+
+CLOCK = 0xF8
+START_AT = 1.0
+CYCLE = 5.0
+
+
+def busy(sim, duration, start):
+    sim.pot.noise = 2.0
+    sim.pot.hold(32768)
+    t = start
+    cards = (CARD_A, CARD_B)
+    n = 0
+    while t + CYCLE <= duration:
+        card = cards[n % 2]
+        sim.nfc.place(card, at=t)
+        sim.encoder.turn(12 if n % 2 else -12, at=t + 1.0, duration=0.3)
+        sim.pot.sweep(32768, 60000 if n % 2 else 4000, at=t + 2.0, duration=1.0)
+        sim.nfc.remove(card, at=t + CYCLE - 0.3)
+        t += CYCLE
+        n += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--duration", type=float, default=600.0)
+    parser.add_argument("--bpm", type=float, default=120.0)
+    args = parser.parse_args()
+    out = sys.stdout
+
+    sim = Simulator()
+    sim.console.type(f"{args.bpm}b s", at=START_AT)
+    busy(sim, args.duration, START_AT + 0.5)
+    firmware = {}
+
+    def look(t):
+        clock = sys.modules["__main__"].midi_clock
+        firmware.update(late=clock.late_ms_max, dropped=clock.ticks_dropped)
+
+    sim.console.type("p", at=args.duration - 1.0)
+    sim.world.at(args.duration - 0.05, look)
+    sim.run(args.duration)
+
+    ticks = [t for t, message in sim.midi.received if message[0] == CLOCK]
+    ideal = 60 / (args.bpm * 24)
+    intervals = [(b - a) * 1000 for a, b in zip(ticks, ticks[1:])]
+    phase = [(t - ticks[0] - i * ideal) * 1000 for i, t in enumerate(ticks)]
+    deviation = [abs(i - ideal * 1000) for i in intervals]
+    print(f"{'ticks':>28}: {len(ticks):10d}", file=out)
+    print(f"{'span s':>28}: {ticks[-1] - ticks[0]:10.1f}", file=out)
+    print(f"{'interval ideal ms':>28}: {ideal * 1000:10.3f}", file=out)
+    print(f"{'interval mean ms':>28}: {statistics.fmean(intervals):10.3f}", file=out)
+    print(f"{'interval stdev ms':>28}: {statistics.pstdev(intervals):10.3f}", file=out)
+    print(f"{'interval |dev| p99 ms':>28}: {percentile(deviation, 0.99):10.3f}", file=out)
+    print(f"{'interval |dev| max ms':>28}: {max(deviation):10.3f}", file=out)
+    print(f"{'drift at end ms':>28}: {phase[-1]:10.3f}", file=out)
+    print(f"{'phase error max ms':>28}: {max(phase, key=abs):10.3f}", file=out)
+    print(f"{'late max ms (firmware)':>28}: {firmware.get('late', 0):10d}", file=out)
+    print(f"{'dropped (firmware)':>28}: {firmware.get('dropped', 0):10d}", file=out)
+    lines = list(sim.console.tail)
+    start = next((i for i, line in enumerate(lines) if line.startswith("task")), len(lines))
+    for line in lines[start:]:
+        print("  " + line, file=out)
+
+
+if __name__ == "__main__":
+    main()
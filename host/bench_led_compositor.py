@@ -0,0 +1,87 @@
+"""
+Frame cost of LedManager's compositor as layers are added on top of the
+state animation.
+
+    python host/bench_led_compositor.py --frames 2000
+
+Every frame changes each active layer (a new state frame, a beat flash
+fading, the FX meters moving and fading) and renders it, so this is the
+worst case; animate() renders only when something changed. Frame time
+excludes the strip's wire time. Allocation is what tracemalloc sees while
+rendering: bytes retained per frame, and the transient peak, which comes
+from CPython boxing ints above 256 and from the simulated strip keeping a
+copy of the last frame; CircuitPython keeps such ints as small ints.
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from picosim import Simulator
+from picosim.devices import NeoPixelStrip
+
+CASES = (
+    ("state frame", ()),
+    ("+ beat flash", ("flash",)),
+    ("+ fx meters", ("flash", "meter")),
+)
+
+
+def run(layers, count):
+    sim = Simulator()
+    with sim.installed():
+        from led_manager import LedManager
+
+        leds = LedManager()
+        strip = sim.world.strips[16]
+        strip.frames = None  # not kept, so tracemalloc sees only the compositor
+        show_cost = leds.num_pixels * 3 * 8 * NeoPixelStrip.BIT_TIME + NeoPixelStrip.LATCH_TIME
+        frames = leds.frames
+        flash, meter = leds.flash_layer, leds.meter_layer
+
+        def frame(i):
+            leds.state_layer.set(frames[i % len(frames)])
+            if "flash" in layers:
+                if i % 8 == 0:
+                    flash.flash(leds.flash_levels[0])
+                else:
+                    flash.level = max(0, flash.level - flash.decay)
+                    flash.changed = True
+            if "meter" in layers:
+                meter.set(leds.meter_fx1, i % 128)
+                meter.set(leds.meter_fx2, 127 - i % 128)
+                meter.alpha = 256 - i % 200
+            leds.compositor.render()
+
+        for i in range(100):
+            frame(i)
+        shows = strip.shows
+        start = time.perf_counter()
+        for i in range(count):
+            frame(i)
+        elapsed = time.perf_counter() - start
+        shows = strip.shows - shows
+        per_frame = (elapsed - shows * show_cost) / count * 1e6
+
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for i in range(count):
+            frame(i)
+        after, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return per_frame, shows / count, after - before, peak - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--frames", type=int, default=2000)
+    args = parser.parse_args()
+    print(f"{'layers':<16}{'us/frame':>10}{'shows/frame':>13}{'retained B/frame':>18}{'peak B':>8}")
+    for name, layers in CASES:
+        per_frame, shows, retained, peak = run(layers, args.frames)
+        print(f"{name:<16}{per_frame:10.1f}{shows:13.2f}{retained / args.frames:18.2f}{peak:8d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+NeoPixel frame cost: LedManager's frame tables against adafruit_led_animation
+computing every frame.
+
+    python host/bench_led_frames.py --seconds 4
+
+Each state's animation is run on the simulated strip for a few seconds,
+with animate() called when next_frame_ms says, as run_led_animations
+does. CPU time is what animate() took minus the strip's wire time, which
+both paths pay per show; only shows of a frame that differs from the one
+before are needed.
+"""
+
+import argparse
+import time
+
+from picosim import Simulator
+from picosim.devices import NeoPixelStrip
+
+
+def run(frame_tables, seconds):
+    sim = Simulator()
+    rows = []
+    with sim.installed():
+        from led_manager import LedManager, POSSIBLE_LED_STATES
+
+        start = time.perf_counter()
+        leds = LedManager(frame_tables=frame_tables)
+        leds.set_theme(LED_THEME)
+        for state in ("TRANSITION", "LIVE"):
+            leds.transition(POSSIBLE_LED_STATES[state])
+        leds.transition(POSSIBLE_LED_STATES["IDLE"])
+        setup_ms = (time.perf_counter() - start) * 1000
+        strip = sim.world.strips[16]
+        show_cost = leds.num_pixels * 3 * 8 * NeoPixelStrip.BIT_TIME + NeoPixelStrip.LATCH_TIME
+
+        for state in ("IDLE", "TRANSITION", "LIVE"):
+            leds.transition(POSSIBLE_LED_STATES[state])
+            shows, changed = strip.shows, strip.changed_frames
+            calls = 0
+            busy = 0.0
+            end = time.monotonic() + seconds
+            while time.monotonic() < end:
+                t = time.perf_counter()
+                leds.animate()
+                busy += time.perf_counter() - t
+                calls += 1
+                time.sleep(leds.next_frame_ms() / 1000)
+            shows = strip.shows - shows
+            busy -= shows * show_cost
+            rows.append((state, calls, shows, strip.changed_frames - changed, busy / calls * 1e6,
+                         busy / seconds * 1000))
+        table_frames = sum(len(frames) for frames in leds.tables.values())
+        distinct = len({id(frame) for frames in leds.tables.values() for frame in frames})
+    return setup_ms, rows, table_frames, distinct
+
+
+LED_THEME = 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=4.0)
+    args = parser.parse_args()
+    print(f"{'path':<12}{'state':<12}{'frames':>8}{'shows':>8}{'changed':>9}{'us/frame':>10}{'cpu ms/s':>10}")
+    for frame_tables in (False, True):
+        setup_ms, rows, table_frames, distinct = run(frame_tables, args.seconds)
+        name = "tables" if frame_tables else "animation"
+        for state, calls, shows, changed, per_frame, per_second in rows:
+            print(f"{name:<12}{state:<12}{calls:8d}{shows:8d}{changed:9d}{per_frame:10.1f}{per_second:10.2f}")
+        print(f"{name:<12}setup {setup_ms:.1f} ms" +
+              (f", {table_frames} frames in tables, {distinct} distinct" if frame_tables else ""))
+
+
+if __name__ == "__main__":
+    main()
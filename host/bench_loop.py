@@ -0,0 +1,37 @@
+"""
+Loop latency and throughput of the unmodified firmware on the simulated board.
+
+    pip install --no-deps -r host/requirements.txt
+    python host/bench_loop.py --duration 12 --bpm 120
+    python host/bench_loop.py --scenario clock
+    python host/bench_loop.py --scenario sweep
+
+Absolute times are those of the host CPU, not the RP2040; compare runs
+against each other, not against the device.
+"""
+
+import argparse
+
+from picosim import Simulator
+from picosim.scenarios import clock_only, gig, knob_sweep
+
+SCENARIOS = {"gig": gig, "clock": clock_only, "sweep": knob_sweep}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--duration", type=float, default=12.0)
+    parser.add_argument("--bpm", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="gig")
+    parser.add_argument("--warmup", type=float, default=1.5,
+                        help="seconds of boot excluded from the loop statistics")
+    args = parser.parse_args()
+
+    sim = Simulator(seed=args.seed)
+    SCENARIOS[args.scenario](sim, args.duration, bpm=args.bpm, start=args.warmup)
+    print(sim.run(args.duration, warmup=args.warmup))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Outgoing control change encoding: adafruit_midi ControlChange objects
+against MidiMessenger's preallocated encoder.
+
+    python host/bench_midi_encode.py
+
+Sends bursts of control changes on one channel, as a fast encoder spin
+and a pot moving together produce. Each path is timed and counted for
+port writes, bytes written and heap objects: message objects are counted
+by hooking ControlChange.__init__, as is the buffer each __bytes__() call
+returns; lists built to batch a send count as one more.
+"""
+
+import time
+
+from picosim import Simulator
+
+BURSTS = 2000
+BURST = (2, 3, 2, 3, 1, 2, 3, 2)
+
+
+def controls():
+    # One burst per pass; within a burst controllers repeat, as a spin and
+    # a pot being moved at once do before coalescing.
+    for i in range(BURSTS):
+        yield [(control, (i + j) % 128) for j, control in enumerate(BURST)]
+
+
+def send_objects(messenger, ControlChange):
+    for burst in controls():
+        for control, value in burst:
+            messenger.midi.send(ControlChange(control, value))
+    return 0
+
+
+def send_object_list(messenger, ControlChange):
+    for burst in controls():
+        messenger.midi.send([ControlChange(control, value) for control, value in burst])
+    return BURSTS
+
+
+def send_encoded(messenger, ControlChange):
+    for burst in controls():
+        for control, value in burst:
+            # On channel 0 a queue key is the control number
+            messenger._send_control_change(control, value)
+        messenger._flush_out()
+    return 0
+
+
+def run(label, send, **options):
+    sim = Simulator()
+    with sim.installed():
+        from adafruit_midi.control_change import ControlChange
+        from midi_messenger import MidiMessenger
+
+        messenger = MidiMessenger(max_rate=None, **options)
+        created = [0]
+        init = ControlChange.__init__
+        to_bytes = ControlChange.__bytes__
+
+        def counting_init(self, *args, **kwargs):
+            created[0] += 1
+            init(self, *args, **kwargs)
+
+        def counting_bytes(self):
+            created[0] += 1
+            return to_bytes(self)
+
+        ControlChange.__init__ = counting_init
+        ControlChange.__bytes__ = counting_bytes
+        try:
+            start = time.perf_counter()
+            lists = send(messenger, ControlChange)
+            elapsed = time.perf_counter() - start
+        finally:
+            ControlChange.__init__ = init
+            ControlChange.__bytes__ = to_bytes
+    created[0] += lists
+    messages = len(sim.midi.received)
+    print(f"{label:<30}{elapsed / messages * 1e6:8.2f}{sim.midi.writes:8d}"
+          f"{sim.midi.bytes_written:8d}{created[0]:9d}")
+
+
+def main():
+    print(f"{BURSTS} bursts of {len(BURST)} control changes")
+    print(f"{'path':<30}{'us/msg':>8}{'writes':>8}{'bytes':>8}{'objects':>9}")
+    run("send(ControlChange) each", send_objects)
+    run("send([ControlChange, ...])", send_object_list)
+    run("encoder", send_encoded)
+    run("encoder, running status", send_encoded, running_status=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+CPU cost of consuming incoming MIDI: adafruit_midi's one-message-per-call
+receive() against MidiMessenger.receive_realtime().
+
+    python host/bench_midi_in.py
+
+The stream is 24 PPQN clock with a control change every 48 ticks, as a DAW
+sends while automating. Message objects are counted by hooking
+MIDIMessage.__init__.
+"""
+
+import time
+
+from picosim import Simulator
+
+TICKS = 20000
+
+
+def script(sim):
+    for i in range(TICKS):
+        sim.midi.send((0xF8,), at=0.0)
+        if i % 48 == 0:
+            sim.midi.send((0xB0, 7, i % 128), at=0.0)
+
+
+def consume(receive_ticks):
+    start = time.perf_counter()
+    ticks = 0
+    calls = 0
+    while ticks < TICKS:
+        ticks += receive_ticks()
+        calls += 1
+    return time.perf_counter() - start, calls
+
+
+def run(label, make_receiver):
+    sim = Simulator()
+    script(sim)
+    with sim.installed():
+        from adafruit_midi.midi_message import MIDIMessage
+        from midi_messenger import MidiMessenger
+
+        created = [0]
+        init = MIDIMessage.__init__
+
+        def counting_init(self, *args, **kwargs):
+            created[0] += 1
+            init(self, *args, **kwargs)
+
+        MIDIMessage.__init__ = counting_init
+        try:
+            elapsed, calls = consume(make_receiver(MidiMessenger()))
+        finally:
+            MIDIMessage.__init__ = init
+    nbytes = sum(len(message) for _, message in sim.midi.sent)
+    print(f"{label:<22}{elapsed / nbytes * 1e6:10.2f}{calls:10d}{created[0]:10d}")
+
+
+def adafruit_receive(messenger):
+    from adafruit_midi.timing_clock import TimingClock
+
+    def receive():
+        msg = messenger.midi.receive()
+        return 1 if isinstance(msg, TimingClock) else 0
+    return receive
+
+
+def raw_receive(messenger):
+    return messenger.receive_realtime
+
+
+def main():
+    print(f"{'path':<22}{'us/byte':>10}{'calls':>10}{'objects':>10}")
+    run("midi.receive()", adafruit_receive)
+    run("receive_realtime()", raw_receive)
+
+
+if __name__ == "__main__":
+    main()
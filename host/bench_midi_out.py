@@ -0,0 +1,76 @@
+"""
+Outgoing control change traffic with MidiMessenger's coalescing queue.
+
+    python host/bench_midi_out.py
+
+Replays one second of input as the firmware would see it on a 1 ms loop:
+a 40-detent encoder spin in 250 ms, a pot whose reading flips between two
+steps on every 100 ms poll, and a card placed in the middle of the spin.
+For each rate limit it reports what reached USB, how much was coalesced,
+how long instrument-on waited and whether the last value sent is the
+final one.
+"""
+
+import time
+
+from picosim import Simulator
+
+PASS_TIME = 0.001
+DURATION = 1.0
+
+
+def inputs():
+    events = []
+    value = 100
+    for i in range(40):
+        value = max(0, value - 5) if i < 20 else min(127, value + 5)
+        events.append((0.1 + i * 0.25 / 40, "fx1", value))
+    for i in range(10):
+        events.append((i * 0.1, "fx2", 64 + i % 2))
+    events.append((0.2, "on", None))
+    return sorted(events, key=lambda event: event[0])
+
+
+def run(max_rate):
+    sim = Simulator()
+    with sim.installed():
+        from midi_messenger import MidiMessenger
+
+        messenger = MidiMessenger(max_rate=max_rate)
+        events = inputs()
+        on_queued = None
+        start = time.monotonic()
+        while True:
+            now = time.monotonic() - start
+            if now > DURATION:
+                break
+            while events and events[0][0] <= now:
+                _, kind, value = events.pop(0)
+                if kind == "fx1":
+                    messenger.send_instrument_fx1(value)
+                elif kind == "fx2":
+                    messenger.send_instrument_fx2(value)
+                else:
+                    messenger.send_instrument_on()
+                    on_queued = sim.world.now()
+            messenger.send_pending()
+            time.sleep(PASS_TIME)
+
+    out = sim.midi.received
+    on_sent = next(t for t, data in out if data[1] == 1)
+    last_fx1 = [data[2] for _, data in out if data[1] == 2][-1]
+    return (len(out), messenger.messages_coalesced, sim.midi.bytes_written,
+            (on_sent - on_queued) * 1000, last_fx1)
+
+
+def main():
+    requested = len(inputs())
+    print(f"{requested} updates requested")
+    print(f"{'max rate':<10}{'sent':>8}{'coalesced':>11}{'bytes':>8}{'on wait ms':>12}{'last fx1':>10}")
+    for max_rate in (None, 200, 100, 50):
+        sent, coalesced, nbytes, on_wait, last_fx1 = run(max_rate)
+        print(f"{str(max_rate):<10}{sent:8d}{coalesced:11d}{nbytes:8d}{on_wait:12.2f}{last_fx1:10d}")
+
+
+if __name__ == "__main__":
+    main()
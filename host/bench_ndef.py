@@ -0,0 +1,98 @@
+"""
+Presets read off the card: a cold NDEF read against a placement served
+from the PresetCache.
+
+    python host/bench_ndef.py
+
+One NTAG carrying a preset is placed three times: first unknown (the
+preset is read before the card is announced), then again (the cached
+preset is applied at once and the pages are re-read in the background),
+then once more after the card was rewritten off the reader (the cached
+preset goes out first and the change follows from the background read).
+The reader is driven from a 1 ms loop as the firmware's wakeup task does.
+"""
+
+import os
+import sys
+import time
+
+from picosim import Simulator
+from picosim.devices import Card
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import make_cards  # noqa: E402
+
+PASS_TIME = 0.001
+HOLD = 1.0
+PLACEMENTS = (1.0, 3.0, 5.0)
+REWRITE_AT = 4.5
+
+
+def card_with_preset(**fields):
+    row = {"uid": "04:a1:b2:c3:d4:e5:f6", "channel": "3", "program": "5", **fields}
+    uid, record = make_cards.pack_record(row)
+    card = Card(uid)
+    ndef = make_cards.preset_ndef(record)
+    card.memory[16:16 + len(ndef)] = ndef
+    return card, record
+
+
+def run(use_cache):
+    sim = Simulator()
+    card, _ = card_with_preset(fx1="20")
+    _, rewritten = card_with_preset(fx1="90")
+    ndef = make_cards.preset_ndef(rewritten)
+    for at in PLACEMENTS:
+        sim.nfc.place(card, at=at)
+        sim.nfc.remove(card, at=at + HOLD)
+    sim.world.at(REWRITE_AT, lambda t: card.memory.__setitem__(slice(16, 16 + len(ndef)), ndef))
+
+    events = []
+    with sim.installed():
+        from adafruit_ticks import ticks_ms, ticks_diff
+        from ndef_preset import PresetCache
+        from nfc_reader import NfcReader
+
+        def record(kind):
+            preset = reader.card_preset
+            events.append((sim.world.now(), kind, None if preset is None else preset.fx1))
+
+        reader = NfcReader(lambda: record("detected"), lambda: record("removed"),
+                           preset_cache=PresetCache() if use_cache else None,
+                           on_preset_changed=lambda: record("changed"))
+        start = time.monotonic()
+        next_pass = start
+        verified = []
+        reading = False
+        while time.monotonic() - start < PLACEMENTS[-1] + HOLD + 0.7:
+            deadline = reader.next_deadline()
+            if reader.irq_pending() or (deadline is not None and ticks_diff(ticks_ms(), deadline) >= 0):
+                reader.poll()
+            if reading and not reader.reading:
+                verified.append(sim.world.now())
+            reading = bool(reader.reading)
+            next_pass += PASS_TIME
+            while time.monotonic() < next_pass:
+                pass
+
+    reads = [t for t, command in sim.nfc.commands if command == 0x40]
+    for at in PLACEMENTS:
+        detected = next((t, fx1) for t, kind, fx1 in events if kind == "detected" and t >= at)
+        changed = next(((t, fx1) for t, kind, fx1 in events if kind == "changed" and at <= t < at + HOLD), None)
+        done = next((t for t in verified if at <= t < at + HOLD), None)
+        page_reads = sum(at <= t < at + HOLD for t in reads)
+        print(f"{'cache' if use_cache else 'no cache':<10}{at:6.1f}{(detected[0] - at) * 1000:12.1f}"
+              f"{str(detected[1]):>8}{page_reads:8d}"
+              f"{'' if done is None else f'{(done - at) * 1000:.1f}':>14}"
+              f"{'' if changed is None else f'{(changed[0] - at) * 1000:.1f} -> {changed[1]}':>16}")
+
+
+def main():
+    print(f"{'':<10}{'placed':>6}{'detect ms':>12}{'fx1':>8}{'reads':>8}{'read done ms':>14}{'changed ms':>16}")
+    run(use_cache=True)
+    run(use_cache=False)
+
+
+if __name__ == "__main__":
+    main()
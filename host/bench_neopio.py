@@ -0,0 +1,114 @@
+"""
+NeoPIO show() cost for 8 strands of 30 pixels: the original synchronous
+transmit against double buffering with unchanged frames and strands skipped.
+
+    python host/bench_neopio.py --frames 200
+
+Each workload shows a frame every ``--interval`` ms: every strand changing,
+one strand changing, or nothing changing. "show ms" is how long show()
+blocked, the transpose plus waiting on the state machine; pixel writes are
+not counted. Transposing uses neopio's pure-Python bit_transpose, as the
+host has no ``bitops``. Every byte stream the simulated state machine sent
+is checked against an independent transpose of the frame it was sent for.
+"""
+
+import argparse
+import time
+
+from picosim import Simulator
+
+STRANDS = 8
+PER_STRAND = 30
+WORKLOADS = ("all strands", "one strand", "static")
+
+
+def reference_transpose(frame, strands):
+    # Bit by bit from the bitops.bit_transpose description, to check neopio against
+    stride = len(frame) // strands
+    out = bytearray(stride * 8)
+    for s in range(strands):
+        for i in range(stride):
+            for b in range(8):
+                if frame[s * stride + i] >> (7 - b) & 1:
+                    out[8 * i + b] |= 1 << (7 - s)
+    return bytes(out)
+
+
+def original_transmit(pixels):
+    # neopio's _transmit as it was: transpose everything, then a blocking write
+    import neopio
+
+    def transmit(buffer):
+        neopio.bit_transpose(buffer, pixels._transposed, pixels._num_strands)
+        pixels._sm.write(pixels._transposed)
+    return transmit
+
+
+def draw(pixels, workload, i):
+    if workload == "all strands":
+        for s in range(STRANDS):
+            for p in range(PER_STRAND):
+                pixels[s * PER_STRAND + p] = ((i + p) * 8 % 256, s * 30, (i * 3 + s) % 256)
+    elif workload == "one strand":
+        s = i % STRANDS
+        for p in range(PER_STRAND):
+            pixels[s * PER_STRAND + p] = ((i + p) * 8 % 256, s * 30, i % 256)
+
+
+def run(mode, workload, count, interval):
+    sim = Simulator()
+    with sim.installed():
+        import board
+        import neopio
+
+        pixels = neopio.NeoPIO(board.GP0, board.GP1, board.GP2, STRANDS * PER_STRAND,
+                               auto_write=False, double_buffer=mode == "double buffered")
+        if mode == "original":
+            pixels._transmit = original_transmit(pixels)
+        sm = pixels._sm
+        sent = []
+        blocked = []
+        for i in range(count):
+            start = time.perf_counter()
+            draw(pixels, workload, i)
+            drawn = time.perf_counter()
+            pixels.show()
+            blocked.append(time.perf_counter() - drawn)
+            sent.append(bytes(pixels._post_brightness_buffer))
+            time.sleep(max(0.0, interval / 1000 - (time.perf_counter() - start)))
+        while sm.writing:
+            pass
+
+        # Frames skipped as unchanged were not sent; the wire kept the one before
+        expected = []
+        for frame in sent:
+            if mode == "original" or not expected or expected[-1] != frame:
+                expected.append(frame)
+        exact = len(sm.frames) == len(expected) and all(
+            wire == reference_transpose(frame, STRANDS) for wire, frame in zip(sm.frames, expected))
+        strands = getattr(pixels, "strands_transposed", None)
+        if mode == "original":
+            strands = count * STRANDS
+    blocked.sort()
+    return (sum(blocked) / count * 1000, blocked[len(blocked) * 99 // 100] * 1000,
+            len(sm.frames), strands, sm.torn, exact)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=20.0, help="ms between shows")
+    args = parser.parse_args()
+    print(f"{'workload':<13}{'mode':<17}{'show ms':>9}{'p99 ms':>8}{'sent':>6}{'strands':>9}"
+          f"{'torn':>6}  bit-exact")
+    for workload in WORKLOADS:
+        base = None
+        for mode in ("original", "single buffered", "double buffered"):
+            mean, p99, sent, strands, torn, exact = run(mode, workload, args.frames, args.interval)
+            base = base or mean
+            print(f"{workload:<13}{mode:<17}{mean:9.3f}{p99:8.3f}{sent:6d}{strands:9d}{torn:6d}  "
+                  f"{'yes' if exact else 'NO'}  x{base / mean:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Loop stalls caused by reading cards: the blocking NfcReader.wait_for_card()
+the firmware used to call against the non-blocking NfcReader.poll().
+
+    python host/bench_nfc.py
+
+Two cards are tapped in turn, each held for a second. Both readers are
+driven from a 1 ms loop, as the firmware's tasks are: the blocking one on
+every pass, the new one only when its IRQ counter moved or its deadline
+passed. Reported are the longest single call, the longest once the first
+card was seen (the old reader also blocked for up to a second at boot),
+the total time spent inside the reader, and how long after the card
+arrived or left the callbacks ran.
+"""
+
+import time
+
+from picosim import Simulator
+from picosim.scenarios import CARD_A, CARD_B
+
+PASS_TIME = 0.001
+DURATION = 7.0
+TAPS = [(CARD_A, 1.0), (CARD_B, 3.0), (CARD_A, 5.0)]
+HOLD = 1.0
+
+
+class BlockingNfcReader():
+    """NfcReader as it was: PN532 driver calls straight from the loop."""
+
+    def __init__(self, on_card_detected, on_card_removed):
+        import board
+        import busio
+        import countio
+        from adafruit_pn532.i2c import PN532_I2C
+
+        self.on_card_detected = on_card_detected
+        self.on_card_removed = on_card_removed
+        self.pn532 = PN532_I2C(busio.I2C(board.GP5, board.GP4), debug=False, irq=board.GP17)
+        self.interrupt = countio.Counter(board.GP17)
+        self.pn532.SAM_configuration()
+        self.pn532.listen_for_passive_target()
+        self.last_card_id = None
+        self.last_card_timestamp = time.monotonic()
+
+    def wait_for_card(self):
+        if self.interrupt.count > 0:
+            uid = self.pn532.get_passive_target()
+            if uid is not None:
+                card_id = ''.join(hex(i) for i in uid)
+                if self.last_card_id is None:
+                    self.on_card_detected()
+                self.last_card_id = card_id
+            self.pn532.listen_for_passive_target()
+            self.interrupt.reset()
+            self.last_card_timestamp = time.monotonic()
+        elif time.monotonic() > self.last_card_timestamp + 0.5 and self.last_card_id is not None:
+            self.last_card_id = None
+            self.on_card_removed()
+
+
+def blocking_step(reader):
+    reader.wait_for_card()
+    return True
+
+
+def polled_step(reader):
+    from adafruit_ticks import ticks_ms, ticks_diff
+
+    deadline = reader.next_deadline()
+    if not reader.irq_pending() and (deadline is None or ticks_diff(ticks_ms(), deadline) < 0):
+        return False
+    reader.poll()
+    return True
+
+
+def run(label, make_reader, step):
+    sim = Simulator()
+    for card, at in TAPS:
+        sim.nfc.tap(card, at=at, hold=HOLD)
+    detected = []
+    removed = []
+    with sim.installed():
+        reader = make_reader(lambda: detected.append(sim.world.now()),
+                             lambda: removed.append(sim.world.now()))
+        start = time.monotonic()
+        calls = 0
+        busy = 0.0
+        longest = 0.0
+        longest_after_boot = 0.0
+        next_pass = start
+        while time.monotonic() - start < DURATION:
+            seen = bool(detected)
+            t = time.perf_counter()
+            if step(reader):
+                calls += 1
+                elapsed = time.perf_counter() - t
+                busy += elapsed
+                longest = max(longest, elapsed)
+                if seen:
+                    longest_after_boot = max(longest_after_boot, elapsed)
+            next_pass += PASS_TIME
+            while time.monotonic() < next_pass:
+                pass
+    detect = max(d - at for d, (_, at) in zip(detected, TAPS)) if len(detected) == len(TAPS) else float("nan")
+    remove = max(r - at - HOLD for r, (_, at) in zip(removed, TAPS)) if len(removed) == len(TAPS) else float("nan")
+    print(f"{label:<12}{calls:8d}{longest * 1000:14.2f}{longest_after_boot * 1000:14.2f}"
+          f"{busy / DURATION * 100:9.1f}"
+          f"{detect * 1000:12.1f}{remove * 1000:12.1f}")
+
+
+def main():
+    print(f"{'reader':<12}{'calls':>8}{'max stall ms':>14}{'after boot':>14}{'busy %':>9}"
+          f"{'detect ms':>12}{'remove ms':>12}")
+    run("blocking", BlockingNfcReader, blocking_step)
+
+    def polled(on_card_detected, on_card_removed):
+        from nfc_reader import NfcReader
+        return NfcReader(on_card_detected, on_card_removed)
+
+    run("poll()", polled, polled_step)
+
+
+if __name__ == "__main__":
+    main()
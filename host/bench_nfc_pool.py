@@ -0,0 +1,105 @@
+"""
+Card detect and removal latency per slot of NfcReaderPool, as slots are
+added behind the TCA9548A.
+
+    python host/bench_nfc_pool.py --slots 1 2 3 4 5
+
+Each slot gets a card of its own twice: once alone, the slots a
+STAGGER apart so no two detections overlap, and once all at the same
+moment, the worst case for round-robin polling. The pool is driven from
+a 1 ms loop the way check_nfc_card in code.py drives it: a step when an
+IRQ counter moved or a deadline passed. "direct" is the single reader
+straight on the bus, without the switch, as the controller is wired
+today. Also reported are the longest pool step, the time spent inside
+the pool and how often the switch was written.
+"""
+
+import argparse
+import sys
+import time
+
+from picosim import Card, Simulator, percentile
+
+PASS_TIME = 0.001
+ALONE_AT = 1.0
+STAGGER = 0.25
+HOLD = 1.0
+TOGETHER_AT = 4.0
+DURATION = TOGETHER_AT + HOLD + 1.0
+
+
+def slot_card(slot):
+    return Card(bytes((0x04, 0x10 + slot, 0x22, 0x33, 0x44, 0x55, 0x66)))
+
+
+def run(slots):
+    sim = Simulator(nfc_slots=slots)
+    taps = []
+    for slot, pn532 in enumerate(sim.nfc_slots):
+        at = ALONE_AT + slot * STAGGER
+        pn532.tap(slot_card(slot), at=at, hold=HOLD)
+        taps.append((slot, "alone", at))
+        pn532.tap(slot_card(slot), at=TOGETHER_AT, hold=HOLD)
+        taps.append((slot, "together", TOGETHER_AT))
+    detected = []
+    removed = []
+    with sim.installed():
+        import board
+        from adafruit_ticks import ticks_ms, ticks_diff
+        from nfc_pool import NfcReaderPool, IRQ_PINS
+
+        if slots is None:
+            layout = ((None, board.GP17),)
+        else:
+            layout = tuple((n, IRQ_PINS[n]) for n in range(slots))
+        pool = NfcReaderPool(layout,
+                             lambda reader: detected.append((reader.slot, sim.world.now())),
+                             lambda reader: removed.append((reader.slot, sim.world.now())))
+        steps = []
+        start = time.monotonic()
+        next_pass = start
+        while time.monotonic() - start < DURATION:
+            deadline = pool.next_deadline()
+            if pool.irq_pending() or (deadline is not None and ticks_diff(ticks_ms(), deadline) >= 0):
+                t = time.perf_counter()
+                pool.poll()
+                steps.append(time.perf_counter() - t)
+            next_pass += PASS_TIME
+            while time.monotonic() < next_pass:
+                pass
+
+    results = {}
+    for slot, kind, at in taps:
+        seen = [t - at for s, t in detected if s == slot and at <= t < at + HOLD]
+        gone = [t - at - HOLD for s, t in removed if s == slot and t >= at + HOLD]
+        results[slot, kind] = (seen[0] * 1000 if seen else float("nan"),
+                               gone[0] * 1000 if gone else float("nan"))
+    selects = sim.nfc_switch.selects if sim.nfc_switch is not None else 0
+    return results, steps, selects
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--slots", type=int, nargs="+", default=[1, 2, 3, 4, 5])
+    args = parser.parse_args()
+    out = sys.stdout
+
+    print(f"{'slots':>8}{'slot':>5}{'alone ms':>10}{'together ms':>13}{'removed ms':>12}"
+          f"{'steps':>7}{'step p99 ms':>13}{'step max ms':>13}{'busy %':>8}{'selects':>9}", file=out)
+    for slots in [None] + args.slots:
+        results, steps, selects = run(slots)
+        steps_ms = [s * 1000 for s in steps]
+        for slot in range(slots or 1):
+            alone, removed_alone = results[slot, "alone"]
+            together, removed_together = results[slot, "together"]
+            label = ("direct" if slots is None else str(slots)) if slot == 0 else ""
+            line = (f"{label:>8}{slot:5d}{alone:10.1f}{together:13.1f}"
+                    f"{max(removed_alone, removed_together):12.1f}")
+            if slot == 0:
+                line += (f"{len(steps):7d}{percentile(steps_ms, 0.99):13.2f}{max(steps_ms):13.2f}"
+                         f"{sum(steps) / DURATION * 100:8.1f}{selects:9d}")
+            print(line, file=out)
+
+
+if __name__ == "__main__":
+    main()
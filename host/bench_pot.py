@@ -0,0 +1,77 @@
+"""
+FX2 pot on code.py: control changes sent while it is left alone, and how
+quickly a real movement gets through.
+
+    python host/bench_pot.py --noise 3 --moves 9
+
+The pot is parked at a run of positions, some of them on step boundaries,
+with Gaussian ADC noise (12-bit counts), and moved between them in 100 ms.
+Untouched is everything from 1 s after a move until the next one; latency
+is from the start of a move to the first FX2 control change.
+"""
+
+import argparse
+import random
+
+from picosim import Simulator, percentile
+
+CONTROL_CHANGE = 0xB0
+CONTROL_FX2 = 3
+MOVE_TIME = 0.1
+SETTLE = 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--noise", type=float, default=3.0)
+    parser.add_argument("--moves", type=int, default=9)
+    parser.add_argument("--hold", type=float, default=5.0, help="seconds parked between moves")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    sim = Simulator(seed=args.seed)
+    sim.pot.noise = args.noise
+    position = 32768
+    sim.pot.hold(position)
+    moves = []
+    t = args.warmup
+    for i in range(args.moves):
+        # Stops alternate between anywhere, a step boundary of a plain
+        # 0-65535 mapping, and one of the calibrated 200-65000 mapping
+        target = rng.randrange(2000, 63000)
+        if i % 3 == 1:
+            target = (target // 516) * 516 + 258
+        elif i % 3 == 2:
+            target = 200 + (target - 200) * 128 // 64800 * 64800 // 128
+        sim.pot.sweep(position, target, at=t, duration=MOVE_TIME)
+        moves.append(t)
+        position = target
+        t += MOVE_TIME + args.hold
+    sim.run(t, warmup=args.warmup)
+
+    changes = [at for at, message in sim.midi.received
+               if message[0] & 0xF0 == CONTROL_CHANGE and message[1] == CONTROL_FX2]
+    latencies = []
+    untouched = 0
+    untouched_time = 0.0
+    for n, start in enumerate(moves):
+        end = moves[n + 1] if n + 1 < len(moves) else t
+        after = [at for at in changes if start <= at < end]
+        if after:
+            latencies.append((after[0] - start) * 1000)
+        quiet = start + MOVE_TIME + SETTLE
+        untouched += sum(at >= quiet for at in after)
+        untouched_time += end - quiet
+
+    print(f"{'noise':>18}: {args.noise:10.2f}")
+    print(f"{'pot reads/s':>18}: {sim.pot.reads / t:10.2f}")
+    print(f"{'untouched CC/min':>18}: {untouched / untouched_time * 60:10.2f}")
+    print(f"{'moves seen':>18}: {len(latencies):7d}/{len(moves)}")
+    print(f"{'latency p50 ms':>18}: {percentile(latencies, 0.5):10.2f}")
+    print(f"{'latency max ms':>18}: {max(latencies, default=0.0):10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+The task profiler on code.py: what it reports, whether reading it out
+disturbs the beat, and what wrapping a task costs per step.
+
+    python host/bench_profiler.py --duration 12
+
+The gig scenario is played while "p" is typed on the serial console and
+"m" a second later. The printed table and the decoded SysEx dump are shown
+with the loop report; the beat latency shows whether the dumps held up
+the MIDI path. The per-step cost is CPython's, for comparing, not the
+RP2040's.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+from picosim import Simulator
+from picosim.scenarios import gig
+
+SYSEX_FIELDS = ("steps", "busy ms", "max", "p50<", "p99<", "free lo", "gcs")
+
+
+def decode_value(raw):
+    # 7 bits a byte, most significant first, as TaskProfiler.sysex_messages
+    value = 0
+    for byte in raw:
+        value = value << 7 | byte
+    return value
+
+
+def step_cost(steps):
+    sim = Simulator()
+    with sim.installed():
+        from task_profiler import TaskProfiler
+
+        async def spin():
+            for _ in range(steps):
+                await asyncio.sleep(0)
+
+        costs = []
+        for profiled in (False, True):
+            profiler = TaskProfiler()
+            start = time.perf_counter()
+            asyncio.run(profiler.wrap("spin", spin()) if profiled else spin())
+            costs.append((time.perf_counter() - start) / steps * 1e6)
+    return costs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--duration", type=float, default=12.0)
+    parser.add_argument("--bpm", type=float, default=120.0)
+    args = parser.parse_args()
+    out = sys.stdout
+
+    sim = Simulator()
+    gig(sim, args.duration, bpm=args.bpm)
+    sim.console.type("p", at=args.duration - 2.0)
+    sim.console.type("m", at=args.duration - 1.0)
+    report = sim.run(args.duration, warmup=1.5)
+
+    lines = list(sim.console.tail)
+    start = next(i for i, line in enumerate(lines) if line.startswith("task"))
+    print("console:", file=out)
+    for line in lines[start:]:
+        print("  " + line, file=out)
+    print("sysex:", file=out)
+    print(f"  {'task':<12}" + "".join(f"{field:>9}" for field in SYSEX_FIELDS), file=out)
+    for _, message in sim.midi.received:
+        if message[0] == 0xF0:
+            body = message[1:-1]
+            end = body.index(0, 3)
+            raw = body[end + 1:]
+            values = [decode_value(raw[i:i + 4]) for i in range(0, len(raw), 4)]
+            print(f"  {body[3:end].decode():<12}" + "".join(f"{v:9d}" for v in values), file=out)
+    summary = report.summary()
+    for key in ("pass time max ms", "beat led latency p50 ms", "beat led latency max ms",
+                "midi in backlog max ms"):
+        print(f"{key:>28}: {summary[key]:10.2f}", file=out)
+    plain, profiled = step_cost(20000)
+    print(f"{'step us plain / profiled':>28}: {plain:10.2f} / {profiled:.2f}", file=out)
+
+
+if __name__ == "__main__":
+    main()
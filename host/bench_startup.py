@@ -0,0 +1,67 @@
+"""
+Power-on to the first accepted card, and what each startup stage costs.
+
+    python host/bench_startup.py --runs 5
+
+A card is on the reader when the board powers up; it counts as accepted
+when the instrument-on control change reaches the host. Times are from
+code.py starting. The firmware prints a line as each stage comes up, with
+the free heap where CircuitPython reports it; on the host the Python heap
+in use at that moment (tracemalloc) stands in for it, so compare stages
+with each other rather than with the device.
+"""
+
+import argparse
+import sys
+import tracemalloc
+
+from picosim import Simulator, percentile
+from picosim.scenarios import CARD_A
+
+CONTROL_CHANGE = 0xB0
+CONTROL_ON_OFF = 1
+
+
+def run(duration):
+    sim = Simulator()
+    sim.nfc.place(CARD_A, at=0.0)
+    stages = []
+    console_write = sim.console.write
+
+    def write(text):
+        if text.startswith("startup:"):
+            stages.append((sim.world.now(), text.strip(), tracemalloc.get_traced_memory()[0]))
+        return console_write(text)
+
+    sim.console.write = write
+    tracemalloc.start()
+    try:
+        sim.run(duration)
+    finally:
+        tracemalloc.stop()
+    accepted = next((t for t, message in sim.midi.received
+                     if message[0] & 0xF0 == CONTROL_CHANGE and message[1] == CONTROL_ON_OFF
+                     and message[2]), None)
+    return accepted, stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--duration", type=float, default=2.0)
+    args = parser.parse_args()
+    out = sys.stdout
+
+    accepted = []
+    for i in range(args.runs):
+        t, stages = run(args.duration)
+        accepted.append(t * 1000 if t is not None else float("inf"))
+        if i == 0:
+            for at, line, heap in stages:
+                print(f"{at * 1000:8.1f} ms  {heap / 1024:8.1f} KiB  {line}", file=out)
+    print(f"{'first card accepted p50 ms':>28}: {percentile(accepted, 0.5):10.1f}", file=out)
+    print(f"{'first card accepted max ms':>28}: {max(accepted):10.1f}", file=out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Loop cost of footswitches against how many there are: a Switch object
+per footswitch, each polled every pass, against one SwitchBank reading
+them all through keypad.
+
+    python host/bench_switch_bank.py --switches 1 2 4 8 12 16
+
+Both run a 1 ms loop for RUN seconds with every other switch's LED
+blinking, the rest ON, and each switch pressed once along the way; a
+press toggles a steady LED between ON and OFF. "Switch" is switch.py as
+it is, with a button and an LED pin per switch, so eight of them use up
+the free pins. "bank" reads the switches from a 74HC165 chain on
+ShiftRegisterKeys and drives the LEDs from the free pins, the last two
+of 16 without one; a pass is one Wakeup.poll with the bank's event check
+and blink timer registered, and `SwitchBank.update` when the check says
+so. The pass columns time just that work; "presses" is what reached
+the callback out of what was made.
+"""
+
+import argparse
+import sys
+import time
+
+from picosim import Simulator, percentile
+from picosim.devices import Footswitches
+
+PASS_TIME = 0.001
+RUN = 2.0
+FIRST_PRESS = 0.2
+HOLD = 0.1
+# Free GPIOs in the order they are given out
+FREE_PINS = (0, 1, 2, 3, 8, 9, 10, 11, 12, 15, 18, 19, 20, 21)
+# 74HC165 clock, data and latch
+SHIFT_PINS = (22, 26, 27)
+# Without the 74HC165 its pins are free as well
+SWITCH_PINS = FREE_PINS + SHIFT_PINS
+
+
+def press_all(switches, count):
+    spacing = (RUN - FIRST_PRESS - 2 * HOLD) / count
+    for key in range(count):
+        switches.press(key, at=FIRST_PRESS + key * spacing, hold=HOLD)
+
+
+def paced(duration, work):
+    passes = []
+    start = time.monotonic()
+    next_pass = start
+    while time.monotonic() - start < duration:
+        t = time.perf_counter()
+        work()
+        passes.append(time.perf_counter() - t)
+        next_pass += PASS_TIME
+        while time.monotonic() < next_pass:
+            pass
+    return passes
+
+
+def run_switches(count):
+    sim = Simulator()
+    buttons = [sim.world.pin(n) for n in SWITCH_PINS[:count]]
+    footswitches = Footswitches(sim.world, pins=buttons)
+    press_all(footswitches, count)
+    pressed = []
+    with sim.installed():
+        import board
+        from switch import Switch, ON, OFF, BLINK
+
+        switches = []
+
+        def on_click(key):
+            def callback():
+                pressed.append(key)
+                switch = switches[key]
+                if switch.state != BLINK:
+                    switch.setState(OFF if switch.state == ON else ON)
+            return callback
+
+        for key in range(count):
+            switches.append(Switch(getattr(board, f"GP{SWITCH_PINS[key]}"),
+                                   getattr(board, f"GP{SWITCH_PINS[count + key]}"),
+                                   on_click(key), state=BLINK if key % 2 else ON))
+
+        def work():
+            for switch in switches:
+                switch.update()
+
+        passes = paced(RUN, work)
+    return passes, len(pressed), footswitches.presses
+
+
+def run_bank(count):
+    sim = Simulator()
+    footswitches = sim.world.shift_registers[SHIFT_PINS[1]] = Footswitches(sim.world, count=count)
+    press_all(footswitches, count)
+    pressed = []
+    with sim.installed():
+        import board
+        import digitalio
+        import keypad
+        from switch import ON, OFF, BLINK
+        from switch_bank import SwitchBank
+        from wakeup import Wakeup
+
+        clock, data, latch = (getattr(board, f"GP{n}") for n in SHIFT_PINS)
+        keys = keypad.ShiftRegisterKeys(clock=clock, data=data, latch=latch, key_count=count,
+                                        value_when_pressed=False)
+        leds = []
+        for key in range(count):
+            if key < len(FREE_PINS):
+                led = digitalio.DigitalInOut(getattr(board, f"GP{FREE_PINS[key]}"))
+                led.direction = digitalio.Direction.OUTPUT
+                leds.append(led)
+            else:
+                leds.append(None)
+
+        def on_press(key):
+            pressed.append(key)
+            state = bank.states[key]
+            if state != BLINK:
+                bank.set_state(key, OFF if state == ON else ON)
+
+        wakeup = Wakeup()
+        bank = SwitchBank(keys, leds, wakeup, on_press)
+        for key in range(1, count, 2):
+            bank.set_state(key, BLINK)
+        switch_wake = wakeup.watch(bank.events_pending)
+
+        def work():
+            wakeup.poll()
+            if switch_wake.event.is_set():
+                switch_wake.clear()
+                bank.update()
+
+        passes = paced(RUN, work)
+        keys.deinit()
+    return passes, len(pressed), footswitches.presses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--switches", type=int, nargs="+", default=[1, 2, 4, 8, 12, 16])
+    args = parser.parse_args()
+    out = sys.stdout
+
+    print(f"{'switches':>8}  {'kind':<8}{'passes':>7}{'pass mean us':>14}{'pass p99 us':>13}"
+          f"{'pass max us':>13}{'presses':>9}", file=out)
+    for count in args.switches:
+        kinds = [("bank", run_bank)]
+        if 2 * count <= len(SWITCH_PINS):
+            kinds.insert(0, ("Switch", run_switches))
+        for kind, run in kinds:
+            passes, seen, made = run(count)
+            passes_us = [p * 1e6 for p in passes]
+            print(f"{count:8d}  {kind:<8}{len(passes):7d}{sum(passes_us) / len(passes_us):14.1f}"
+                  f"{percentile(passes_us, 0.99):13.1f}{max(passes_us):13.1f}{f'{seen}/{made}':>9}",
+                  file=out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Check that code.py switches every card's instrument off on the channel
+and control it was switched on with, whichever cards are on the readers.
+
+    python host/check_card_controls.py
+
+Each sequence boots code.py with its own NFC_SLOTS and NFC_TARGETS and
+places and removes cards carrying presets for different channels and
+on/off controls. Every expected on and off must go out within its limit
+of when it fell due: ON_MS of the card going down, OFF_MS of it being
+taken away. No other on/off control change may go out on any of the
+channels and controls involved. Exits non-zero on failure.
+"""
+
+import os
+import re
+import sys
+import tempfile
+
+from picosim import Simulator
+from picosim.devices import Card
+from picosim.simulator import REPO_DIR
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import make_cards  # noqa: E402
+
+CONTROL_CHANGE = 0xB0
+# Detect plus the NDEF read, and nfc_reader.PRESENCE_TIMEOUT_MS plus a listen
+ON_MS = 100
+OFF_MS = 500 + 100
+
+
+def card_with_preset(uid, **fields):
+    uid, record = make_cards.pack_record({"uid": uid, **fields})
+    card = Card(uid)
+    ndef = make_cards.preset_ndef(record)
+    card.memory[16:16 + len(ndef)] = ndef
+    return card
+
+
+# Channels are 1-16 as in make_cards, and 0-15 in the expected messages
+CARDS = {
+    "A": card_with_preset("04:a1:b2:c3:d4:e5:f6", channel="1", on_off_cc="1", program="5"),
+    "B": card_with_preset("04:0b:1c:2d:3e:4f:50", channel="2", on_off_cc="5", program="9"),
+    "C": card_with_preset("04:77:66:55:44:33:22", channel="3", on_off_cc="7", program="2"),
+}
+
+# name, (Simulator nfc_slots, NFC_SLOTS, NFC_TARGETS),
+# [(t, slot, "place" / "remove", card)],
+# [(due, channel, control, value, limit ms)], seconds to run
+SEQUENCES = [
+    ("two slots on their own channels",
+     (2, "((0, board.GP17, 20), (1, board.GP19, 21))", 1),
+     [(1.0, 0, "place", "A"), (1.5, 1, "place", "B"), (2.5, 0, "remove", "A"),
+      (3.5, 1, "remove", "B")],
+     [(1.0, 0, 20, 1, ON_MS), (1.5, 1, 21, 1, ON_MS),
+      (2.5, 0, 20, 0, OFF_MS), (3.5, 1, 21, 0, OFF_MS)],
+     4.5),
+    ("two slots, the later card taken off first",
+     (2, "((0, board.GP17, 20), (1, board.GP19, 21))", 1),
+     [(1.0, 0, "place", "A"), (1.5, 1, "place", "B"), (2.5, 1, "remove", "B"),
+      (3.5, 0, "remove", "A")],
+     [(1.0, 0, 20, 1, ON_MS), (1.5, 1, 21, 1, ON_MS),
+      (2.5, 1, 21, 0, OFF_MS), (3.5, 0, 20, 0, OFF_MS)],
+     4.5),
+    ("stacked, each on its preset's control",
+     (None, "((None, board.GP17, None),)", 2),
+     [(1.0, 0, "place", "A"), (1.5, 0, "place", "B"), (2.5, 0, "remove", "A"),
+      (3.5, 0, "remove", "B")],
+     [(1.0, 0, 1, 1, ON_MS), (1.5, 1, 5, 1, ON_MS),
+      (2.5, 0, 1, 0, OFF_MS), (3.5, 1, 5, 0, OFF_MS)],
+     4.5),
+    ("stacked, the later card taken off first",
+     (None, "((None, board.GP17, None),)", 2),
+     [(1.0, 0, "place", "A"), (1.5, 0, "place", "B"), (2.5, 0, "remove", "B"),
+      (3.5, 0, "remove", "A")],
+     [(1.0, 0, 1, 1, ON_MS), (1.5, 1, 5, 1, ON_MS),
+      (2.5, 1, 5, 0, OFF_MS), (3.5, 0, 1, 0, OFF_MS)],
+     4.5),
+    ("stacked on slots with CCs of their own",
+     (2, "((0, board.GP17, 20), (1, board.GP19, 22))", 2),
+     [(1.0, 0, "place", "A"), (1.5, 0, "place", "B"), (2.0, 1, "place", "C"),
+      (3.0, 0, "remove", "A"), (3.5, 1, "remove", "C"), (4.0, 0, "remove", "B")],
+     [(1.0, 0, 20, 1, ON_MS), (1.5, 1, 21, 1, ON_MS), (2.0, 2, 22, 1, ON_MS),
+      (3.0, 0, 20, 0, OFF_MS), (3.5, 2, 22, 0, OFF_MS), (4.0, 1, 21, 0, OFF_MS)],
+     5.0),
+]
+
+
+def firmware(slots, targets, directory):
+    # code.py as it is but for its slot layout
+    with open(os.path.join(REPO_DIR, "code.py")) as f:
+        source = f.read()
+    source = re.sub(r"^NFC_SLOTS = .*$", lambda m: f"NFC_SLOTS = {slots}", source, count=1, flags=re.M)
+    source = re.sub(r"^NFC_TARGETS = .*$", lambda m: f"NFC_TARGETS = {targets}", source, count=1,
+                    flags=re.M)
+    path = os.path.join(directory, "code.py")
+    with open(path, "w") as f:
+        f.write(source)
+    return path
+
+
+def run(layout, steps, duration, directory):
+    nfc_slots, slots, targets = layout
+    sim = Simulator(nfc_slots=nfc_slots)
+    for t, slot, action, name in steps:
+        getattr(sim.nfc_slots[slot], action)(CARDS[name], at=t)
+    sim.run(duration, script=firmware(slots, targets, directory))
+    return [(t, message[0] & 0x0F, message[1], message[2]) for t, message in sim.midi.received
+            if message[0] & 0xF0 == CONTROL_CHANGE]
+
+
+def check(expected, events):
+    problems = []
+    involved = {(channel, control) for _, channel, control, _, _ in expected}
+    unmatched = [event for event in events if event[1:3] in involved]
+    for due, channel, control, value, limit in expected:
+        match = next((event for event in unmatched if event[1:] == (channel, control, value)
+                      and event[0] >= due), None)
+        if match is None:
+            problems.append(f"missing {channel + 1}:{control} {'on' if value else 'off'}")
+            continue
+        unmatched.remove(match)
+        if (match[0] - due) * 1000 > limit:
+            problems.append(f"{channel + 1}:{control} {'on' if value else 'off'} "
+                            f"{(match[0] - due) * 1000:.0f} ms after it was due")
+    for t, channel, control, value in unmatched:
+        problems.append(f"unexpected {channel + 1}:{control} {value} at {t:.3f}")
+    return problems
+
+
+def main():
+    out = sys.stdout
+    failed = False
+    print(f"{'sequence':<44}on/off out (channel:cc value)", file=out)
+    with tempfile.TemporaryDirectory() as directory:
+        for name, layout, steps, expected, duration in SEQUENCES:
+            events = run(layout, steps, duration, directory)
+            problems = check(expected, events)
+            failed = failed or bool(problems)
+            involved = {(channel, control) for _, channel, control, _, _ in expected}
+            timeline = ", ".join(f"{channel + 1}:{control} {value} {t:.3f}"
+                                 for t, channel, control, value in events
+                                 if (channel, control) in involved)
+            print(f"{name:<44}{timeline}", file=out)
+            for problem in problems:
+                print(f"{'':<44}NO: {problem}", file=out)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Check that code.py reads every encoder detent, however fast it is spun, and
+sends one FX1 update per spin.
+
+    python host/check_encoder.py
+
+The FX1 encoder is spun at increasing rates, alternating direction, and
+then flicked down and up the whole range. After each spin has settled the
+firmware's encoder position must equal the detents turned. Spins shorter
+than FX_1_MAX_HOLD_MS must produce exactly one FX1 control change, and each
+flick must take FX1 all the way to 0 and 127. Exits non-zero on failure.
+"""
+
+import argparse
+import sys
+
+from picosim import Simulator
+
+CONTROL_CHANGE = 0xB0
+CONTROL_FX1 = 2
+SETTLE = 0.6  # seconds after a spin before it is checked
+GAP = 1.0  # seconds between spins
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--detents", type=int, default=12, help="detents per rated spin")
+    parser.add_argument("--rates", type=float, nargs="+", default=[5, 10, 20, 40, 80, 160, 320],
+                        help="detents per second")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    args = parser.parse_args()
+    out = sys.stdout
+
+    sim = Simulator()
+    spins = [(args.detents * (1 if i % 2 == 0 else -1), rate) for i, rate in enumerate(args.rates)]
+    spins += [(-20, 100), (20, 100)]
+    rows = []
+    t = args.warmup
+
+    def check(start, detents, rate):
+        def sample(now):
+            # code.py's globals, while runpy has it installed as __main__
+            firmware = sys.modules["__main__"]
+            rows.append((start, now, detents, rate, firmware.rotaryEncoder.prevRotaryVal,
+                         sim.encoder.detents_turned, firmware.controllerData.fx1_value))
+        return sample
+
+    for detents, rate in spins:
+        duration = abs(detents) / rate
+        sim.encoder.turn(detents, at=t, duration=duration)
+        sim.world.at(t + duration + SETTLE, check(t, detents, rate))
+        t += duration + SETTLE + GAP
+    sim.run(t, warmup=args.warmup)
+
+    updates = [at for at, message in sim.midi.received
+               if message[0] & 0xF0 == CONTROL_CHANGE and message[1] == CONTROL_FX1]
+    print(f"{'detents':>8}{'per s':>7}{'read':>7}{'turned':>8}{'fx1':>5}{'updates':>9}  ok", file=out)
+    failed = False
+    previous_fx1 = 100
+    for i, (start, end, detents, rate, read, turned, fx1) in enumerate(rows):
+        sent = sum(start <= at < end for at in updates)
+        ok = read == turned
+        if abs(detents) / rate < 0.5:  # code.py's FX_1_MAX_HOLD_MS
+            ok = ok and sent == 1
+        if i >= len(args.rates):
+            ok = ok and fx1 == (0 if detents < 0 else 127)
+        failed = failed or not ok
+        print(f"{detents:8d}{rate:7.0f}{read:7d}{turned:8d}{fx1:5d}{sent:9d}  {'yes' if ok else 'NO'}"
+              f"   ({fx1 - previous_fx1:+d})", file=out)
+        previous_fx1 = fx1
+    if len(rows) != len(spins):
+        print(f"only {len(rows)} of {len(spins)} spins were checked", file=out)
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
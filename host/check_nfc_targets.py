@@ -0,0 +1,157 @@
+"""
+Check that NfcReader with two targets switches two stacked cards on and
+off independently, whatever order they come and go in.
+
+    python host/check_nfc_targets.py
+
+Each sequence places and removes cards on one simulated PN532 while the
+reader is driven from a 1 ms loop, as check_nfc_card in code.py drives
+it. Every expected on and off callback must come, each within its limit
+of when it fell due, and in the order they fell due; those due at the
+same moment may come in any order. A card is on within DETECT_MS of
+being placed, and off within the presence timeout plus DETECT_MS of
+leaving. A card that is not part of a change must not see any event. Two cards placed together must be found by the same listen.
+Every sequence runs without and with a preset cache, which reads each
+card's NDEF pages before it is on. Exits non-zero on failure.
+"""
+
+import sys
+import time
+
+from picosim import Card, Simulator
+from picosim.scenarios import CARD_A, CARD_B
+
+CARD_C = Card(b"\x04\x77\x66\x55\x44\x33\x22")
+CARDS = {"A": CARD_A, "B": CARD_B, "C": CARD_C}
+
+PASS_TIME = 0.001
+# Two blank cards placed together are read one after the other, four
+# NTAG reads each, before the second is on
+DETECT_MS = 100
+# nfc_reader.PRESENCE_TIMEOUT_MS
+REMOVE_MS = 500 + DETECT_MS
+
+# name, [(t, "place" / "remove", card)], [(card, "on" / "off", due, limit ms)],
+# cards to be found together, seconds to run
+SEQUENCES = [
+    ("stacked together",
+     [(1.0, "place", "A"), (1.0, "place", "B"), (2.0, "remove", "A"), (2.0, "remove", "B")],
+     [("A", "on", 1.0, DETECT_MS), ("B", "on", 1.0, DETECT_MS),
+      ("A", "off", 2.0, REMOVE_MS), ("B", "off", 2.0, REMOVE_MS)],
+     ("A", "B"), 3.0),
+    ("layered, last in first out",
+     [(1.0, "place", "A"), (1.5, "place", "B"), (2.5, "remove", "B"), (3.5, "remove", "A")],
+     [("A", "on", 1.0, DETECT_MS), ("B", "on", 1.5, DETECT_MS),
+      ("B", "off", 2.5, REMOVE_MS), ("A", "off", 3.5, REMOVE_MS)],
+     None, 4.5),
+    ("layered, first in first out",
+     [(1.0, "place", "A"), (1.5, "place", "B"), (2.5, "remove", "A"), (3.5, "remove", "B")],
+     [("A", "on", 1.0, DETECT_MS), ("B", "on", 1.5, DETECT_MS),
+      ("A", "off", 2.5, REMOVE_MS), ("B", "off", 3.5, REMOVE_MS)],
+     None, 4.5),
+    ("lifted and put back within the timeout",
+     [(1.0, "place", "A"), (1.5, "place", "B"), (2.0, "remove", "A"), (2.2, "place", "A"),
+      (3.0, "remove", "B")],
+     [("A", "on", 1.0, DETECT_MS), ("B", "on", 1.5, DETECT_MS), ("B", "off", 3.0, REMOVE_MS)],
+     None, 4.0),
+    ("one swapped under the other",
+     [(1.0, "place", "A"), (1.5, "place", "B"), (2.5, "remove", "A"), (2.5, "place", "C"),
+      (3.5, "remove", "B"), (3.5, "remove", "C")],
+     [("A", "on", 1.0, DETECT_MS), ("B", "on", 1.5, DETECT_MS),
+      ("A", "off", 2.5, DETECT_MS), ("C", "on", 2.5, DETECT_MS),
+      ("B", "off", 3.5, REMOVE_MS), ("C", "off", 3.5, REMOVE_MS)],
+     None, 4.5),
+    ("third card waits for a free place",
+     [(1.0, "place", "A"), (1.2, "place", "B"), (1.4, "place", "C"), (2.0, "remove", "A"),
+      (3.0, "remove", "B"), (3.0, "remove", "C")],
+     [("A", "on", 1.0, DETECT_MS), ("B", "on", 1.2, DETECT_MS),
+      ("A", "off", 2.0, DETECT_MS), ("C", "on", 2.0, DETECT_MS),
+      ("B", "off", 3.0, REMOVE_MS), ("C", "off", 3.0, REMOVE_MS)],
+     None, 4.0),
+]
+
+
+def run(steps, duration, cached):
+    sim = Simulator()
+    for t, action, name in steps:
+        getattr(sim.nfc, action)(CARDS[name], at=t)
+    names = {card.uid: name for name, card in CARDS.items()}
+    events = []
+    with sim.installed():
+        from adafruit_ticks import ticks_ms, ticks_diff
+        from ndef_preset import PresetCache
+        from nfc_reader import NfcReader
+
+        # The card on each target; its UID is gone by the time it is off
+        on_target = {}
+
+        def event(kind):
+            def callback():
+                card = reader.card
+                if kind == "on":
+                    on_target[card.number] = names[bytes(card.uid[:card.uid_length])]
+                events.append((on_target[card.number], kind, sim.world.now()))
+            return callback
+
+        reader = NfcReader(event("on"), event("off"), max_targets=2,
+                           preset_cache=PresetCache() if cached else None)
+        start = time.monotonic()
+        next_pass = start
+        while time.monotonic() - start < duration:
+            deadline = reader.next_deadline()
+            if reader.irq_pending() or (deadline is not None and ticks_diff(ticks_ms(), deadline) >= 0):
+                reader.poll()
+            next_pass += PASS_TIME
+            while time.monotonic() < next_pass:
+                pass
+    return events
+
+
+def check(expected, together, events, cached):
+    problems = []
+    unmatched = list(range(len(events)))
+    last_due = None
+    last_index = -1
+    for card, kind, due, limit in expected:
+        index = next((i for i in unmatched if events[i][:2] == (card, kind)), None)
+        if index is None:
+            problems.append(f"missing {card} {kind}")
+            continue
+        unmatched.remove(index)
+        t = events[index][2]
+        if not 0 <= (t - due) * 1000 <= limit:
+            problems.append(f"{card} {kind} {(t - due) * 1000:.0f} ms after it was due")
+        if due != last_due:
+            if index < last_index:
+                problems.append(f"{card} {kind} came before an event due earlier")
+            last_due = due
+        last_index = max(last_index, index)
+    for i in unmatched:
+        problems.append(f"unexpected {events[i][0]} {events[i][1]}")
+    if together and not cached:
+        first, second = (next((t for name, kind, t in events if name == card and kind == "on"), None)
+                         for card in together)
+        # Callbacks from the same poll are microseconds apart, polls a millisecond
+        if first is None or second is None or abs(first - second) > PASS_TIME / 2:
+            problems.append(f"{' and '.join(together)} were not found by the same listen")
+    return problems
+
+
+def main():
+    out = sys.stdout
+    failed = False
+    print(f"{'sequence':<40}{'cache':>6}  events", file=out)
+    for name, steps, expected, together, duration in SEQUENCES:
+        for cached in (False, True):
+            events = run(steps, duration, cached)
+            problems = check(expected, together, events, cached)
+            failed = failed or bool(problems)
+            timeline = ", ".join(f"{card} {kind} {t:.3f}" for card, kind, t in events)
+            print(f"{name:<40}{'yes' if cached else 'no':>6}  {timeline}", file=out)
+            for problem in problems:
+                print(f"{'':<48}NO: {problem}", file=out)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
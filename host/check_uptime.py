@@ -0,0 +1,118 @@
+"""
+Check that code.py keeps time as well after days of uptime as after boot.
+
+    python host/check_uptime.py --days 0 1 3 7 30
+
+The board's tick counter is fast-forwarded by each uptime, and by the
+next uptime after it at which the counter wraps WRAP_AT seconds into the
+run (marked "wrap"): integer ticks only see the uptime modulo the
+counter's 6.2 day period, and the wrap is where they could go wrong. The
+DAW plays 120 BPM clock throughout and a card is taken off the reader
+once before WRAP_AT and once after. Every uptime must give the tempo,
+the card removal delay and the beat LED pulse that uptime 0 gives.
+
+code.py itself is booted on the simulator's manual clock, which only
+moves when every task is waiting and then jumps to the next wakeup. The
+host's own speed and load do not come into it, so every row is exact and
+the tolerances only cover rounding to the tick.
+
+For comparison, the step between two float32 values at each uptime is
+shown: a deadline kept in float seconds cannot be more exact than that,
+and CircuitPython's floats are at best single precision. Exits non-zero
+on failure.
+"""
+
+import argparse
+import math
+import sys
+
+from picosim import Simulator, percentile
+from picosim.scenarios import CARD_A, CARD_B
+
+BPM = 120
+RUN = 12.0
+WRAP_AT = 6.0
+# MidiMessenger's default on/off control
+ON_OFF_CC = 1
+CONTROL_CHANGE = 0xB0
+# The tick counter's period and its value at power-on, as in CircuitPython
+TICKS_PERIOD_S = (1 << 29) / 1000
+TICKS_START_S = ((1 << 29) - 65536) / 1000
+CARDS = ((CARD_A, 2.0, 5.0), (CARD_B, 7.0, 10.0))
+BPM_SAMPLES = (4.0, WRAP_AT - 0.05, WRAP_AT + 0.05, WRAP_AT + 1.0, RUN - 0.5)
+
+# Allowed difference from uptime 0
+BPM_TOLERANCE = 0.5
+REMOVAL_TOLERANCE_MS = 2
+PULSE_TOLERANCE_MS = 2
+
+
+def wrapping_uptime(uptime):
+    # The first uptime from ``uptime`` on at which the counter wraps WRAP_AT into the run
+    first = TICKS_PERIOD_S - TICKS_START_S - WRAP_AT
+    return first + math.ceil((uptime - first) / TICKS_PERIOD_S) * TICKS_PERIOD_S
+
+
+def run(uptime):
+    sim = Simulator(uptime=uptime, manual_clock=True)
+    world = sim.world
+    sim.midi.clock(bpm=BPM, at=1.0, duration=RUN - 1.0, start=True)
+    for card, placed, removed in CARDS:
+        sim.nfc.place(card, at=placed)
+        sim.nfc.remove(card, at=removed)
+    tempo = []
+    for t in BPM_SAMPLES:
+        # The firmware's own tracker, as code.py set it up
+        world.at(t, lambda t: tempo.append(sys.modules["__main__"].bpm_tracker.bpm))
+    sim.run(RUN)
+    offs = [t for t, message in sim.midi.received
+            if message[0] & 0xF0 == CONTROL_CHANGE and message[1] == ON_OFF_CC and message[2] == 0]
+
+    removal = []
+    for _, _, removed in CARDS:
+        later = [t for t in offs if t >= removed]
+        removal.append((later[0] - removed) * 1000 if later else float("inf"))
+    pulses = []
+    lit = None
+    for t, level in sim.beat_led.history:
+        if level and lit is None:
+            lit = t
+        elif not level and lit is not None:
+            pulses.append((t - lit) * 1000)
+            lit = None
+    return tempo, removal, pulses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--days", type=float, nargs="+", default=[0, 1, 3, 7, 30])
+    args = parser.parse_args()
+    out = sys.stdout
+
+    print(f"{'days':>12}{'float32 step ms':>16}{'bpm min':>9}{'bpm max':>9}"
+          f"{'removal ms':>17}{'pulse p50':>10}{'pulse max':>10}  ok", file=out)
+    baseline = None
+    failed = False
+    uptimes = set()
+    for days in [0.0] + args.days:
+        uptimes.add((days * 86400, False))
+        uptimes.add((wrapping_uptime(days * 86400), True))
+    for uptime, wraps in sorted(uptimes):
+        tempo, removal, pulses = run(uptime)
+        step = 2.0 ** (math.floor(math.log2(uptime)) - 23) * 1000 if uptime >= 1 else 0.0
+        pulse = (percentile(pulses, 0.5), max(pulses, default=0.0))
+        if baseline is None:
+            baseline = removal, pulse
+        ok = (all(abs(bpm - BPM) < BPM_TOLERANCE for bpm in tempo)
+              and all(abs(r - b) < REMOVAL_TOLERANCE_MS for r, b in zip(removal, baseline[0]))
+              and all(abs(p - b) < PULSE_TOLERANCE_MS for p, b in zip(pulse, baseline[1])))
+        failed = failed or not ok
+        removals = " / ".join(f"{r:.0f}" for r in removal)
+        label = f"{uptime / 86400:.2f}" + (" wrap" if wraps else "")
+        print(f"{label:>12}{step:16.3f}{min(tempo):9.2f}{max(tempo):9.2f}"
+              f"{removals:>17}{pulse[0]:10.1f}{pulse[1]:10.1f}  {'yes' if ok else 'NO'}", file=out)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Build the card database the firmware reads from CIRCUITPY.
+
+    python host/make_cards.py cards.csv -o /Volumes/CIRCUITPY/cards.bin
+
+The CSV has a header row and one card per line:
+
+    uid,channel,on_off_cc,program,fx1,fx2,led_theme
+    04:12:34:56:78:9A:BC,1,1,,100,,0
+    DE AD BE EF,10,64,5,,,2
+
+``uid`` is the hex UID the firmware prints for an unknown card, with or
+without separators. ``channel`` is 1-16. ``program``, ``fx1`` and ``fx2``
+may be left empty for no program change and to keep the current FX
+values. Missing trailing columns take the defaults of
+``card_database.Preset``.
+
+To carry the preset on the card itself instead, write the NDEF message
+``preset_ndef`` returns (``--ndef`` prints it as hex per card) to the
+NTAG's user memory from page 4.
+"""
+
+import argparse
+import csv
+import os
+import re
+import struct
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import card_database as db  # noqa: E402
+import ndef_preset  # noqa: E402
+
+
+def parse_uid(text):
+    digits = re.sub(r"0x|[^0-9a-fA-F]", "", text)
+    uid = bytes.fromhex(digits)
+    if not 1 <= len(uid) <= db.MAX_UID_LENGTH:
+        raise ValueError(f"UID {text!r} is not 1 to {db.MAX_UID_LENGTH} bytes")
+    return uid
+
+
+def _field(row, name, default, low, high, empty=None):
+    text = (row.get(name) or "").strip()
+    if not text:
+        return default if empty is None else empty
+    value = int(text, 0)
+    if not low <= value <= high:
+        raise ValueError(f"{name} {value} is not in {low}-{high}")
+    return value
+
+
+def pack_record(row):
+    uid = parse_uid(row["uid"])
+    defaults = db.Preset()
+    record = bytearray(db.RECORD_SIZE)
+    record[0] = len(uid)
+    record[1:1 + len(uid)] = uid
+    record[8] = _field(row, "channel", defaults.channel + 1, 1, 16) - 1
+    record[9] = _field(row, "on_off_cc", defaults.on_off_cc, 0, 127)
+    record[10] = _field(row, "program", 0, 0, 127, empty=db.NO_PROGRAM)
+    record[11] = _field(row, "fx1", 0, 0, 127, empty=db.KEEP_VALUE)
+    record[12] = _field(row, "fx2", 0, 0, 127, empty=db.KEEP_VALUE)
+    record[13] = _field(row, "led_theme", defaults.led_theme, 0, 255)
+    return uid, bytes(record)
+
+
+def preset_ndef(record):
+    """NDEF TLV with the preset record for the preset fields of a packed ``record``."""
+    payload = bytes((ndef_preset.PRESET_VERSION,)) + record[8:14]
+    type_ = ndef_preset.PRESET_TYPE
+    # MB, ME, SR, TNF external
+    message = bytes((0xD4, len(type_), len(payload))) + type_ + payload
+    return bytes((0x03, len(message))) + message + b"\xfe"
+
+
+def build(rows):
+    records = []
+    seen = set()
+    for line, row in enumerate(rows, 2):
+        try:
+            uid, record = pack_record(row)
+        except (KeyError, ValueError) as e:
+            raise ValueError(f"line {line}: {e}") from None
+        if uid in seen:
+            raise ValueError(f"line {line}: UID {uid.hex()} listed twice")
+        seen.add(uid)
+        records.append(record)
+    if len(records) > 0x7FFF:
+        raise ValueError("too many cards")
+    header = db.MAGIC + struct.pack("<BBH", db.VERSION, db.RECORD_SIZE, len(records))
+    return header + b"".join(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("csv")
+    parser.add_argument("-o", "--output", default="cards.bin")
+    parser.add_argument("--ndef", action="store_true",
+                        help="print the NDEF message to write on each card instead")
+    args = parser.parse_args()
+    with open(args.csv, newline="") as f:
+        rows = list(csv.DictReader(f))
+    if args.ndef:
+        for row in rows:
+            uid, record = pack_record(row)
+            print(uid.hex(":"), preset_ndef(record).hex())
+        return
+    data = build(rows)
+    with open(args.output, "wb") as f:
+        f.write(data)
+    count = (len(data) - db.HEADER_SIZE) // db.RECORD_SIZE
+    print(f"{count} cards, {len(data)} bytes -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
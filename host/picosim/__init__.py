@@ -0,0 +1,22 @@
+"""
+Host-side stand-in for the controller hardware.
+
+Runs the unmodified firmware under CPython so loop latency, MIDI timing and
+bus traffic can be measured and compared without a Pico::
+
+    from picosim import Simulator
+
+    sim = Simulator()
+    sim.midi.clock(bpm=120, at=1.0, duration=5)
+    sim.encoder.turn(12, at=2.0, duration=0.3)
+    sim.pot.sweep(0, 65535, at=3.0, duration=1.0)
+    sim.nfc.tap(b"\\x04\\x12\\x34\\x56\\x78\\x9a\\xbc", at=4.0, hold=1.5)
+    print(sim.run(duration=8))
+
+The Adafruit libraries the firmware imports are the CPython releases of the
+versions bundled in ``lib/`` (see ``host/requirements.txt``); only the
+hardware modules are replaced, by the ones in ``picosim/modules``.
+"""
+
+from picosim.devices import Card
+from picosim.simulator import Report, Simulator, percentile
@@ -0,0 +1,579 @@
+"""
+Models of the peripherals wired to the controller.
+
+Each model owns the state a real part would have and exposes scripting
+methods that take times in seconds since boot (``at=``), so a scenario can be
+written up front and replayed identically on every run.
+"""
+
+# ##########################################################
+# Rotary encoder
+#
+
+
+class QuadratureEncoder:
+    """Mechanical encoder; each detent produces ``transitions_per_detent`` edges."""
+
+    def __init__(self, world, pin_a, pin_b, transitions_per_detent=2):
+        self.world = world
+        self.pin_a = pin_a
+        self.pin_b = pin_b
+        self.transitions_per_detent = transitions_per_detent
+        self.transitions = 0
+        self.detents_turned = 0
+
+    def turn(self, detents, at, duration=0.0):
+        """Turn by ``detents`` (negative is anticlockwise), spread evenly over ``duration``."""
+        steps = abs(detents) * self.transitions_per_detent
+        if steps == 0:
+            return
+        sign = 1 if detents > 0 else -1
+        interval = duration / steps
+
+        def step(t):
+            self.transitions += sign
+            if self.transitions % self.transitions_per_detent == 0:
+                self.detents_turned += sign
+
+        for i in range(steps):
+            self.world.at(at + interval * (i + 1), step)
+
+
+# ##########################################################
+# Footswitches
+#
+
+
+class Footswitches:
+    """
+    Momentary switches closing to ground. With ``pins`` each switch is on
+    a pin of its own; without, they are the ``count`` inputs of a 74HC165
+    chain that keypad.ShiftRegisterKeys reads from ``closed``.
+    """
+
+    def __init__(self, world, count=None, pins=None):
+        self.world = world
+        self.pins = pins
+        self.count = len(pins) if pins is not None else count
+        self.closed = [False] * self.count
+        self.presses = 0
+
+    def press(self, key, at, hold=0.1):
+        """Close switch ``key`` at ``at`` and open it ``hold`` seconds later."""
+        def down(t):
+            self.closed[key] = True
+            self.presses += 1
+            if self.pins is not None:
+                self.pins[key].force(False, t)
+
+        def up(t):
+            self.closed[key] = False
+            if self.pins is not None:
+                self.pins[key].force(None, t)
+
+        self.world.at(at, down)
+        self.world.at(at + hold, up)
+
+
+# ##########################################################
+# Analog input
+#
+
+
+class AnalogSource:
+    """Voltage on an ADC pin, as a 12-bit RP2040 reading plus optional noise."""
+
+    def __init__(self, world, pin, value=32768, noise=0.0):
+        self.world = world
+        self.pin = pin
+        self.noise = noise  # standard deviation, in 12-bit ADC counts
+        self._segments = [(0.0, value, 0.0, value)]
+        self._played = None
+        self.reads = 0
+
+    def hold(self, value, at=0.0):
+        self._segments.append((at, value, at, value))
+
+    def sweep(self, start_value, end_value, at, duration):
+        """Move linearly from ``start_value`` to ``end_value`` (16-bit scale)."""
+        self._segments.append((at, start_value, at + duration, end_value))
+
+    def play(self, readings, reads_each, at=0.0):
+        """
+        From ``at`` on, return each of ``readings``, 16-bit as the firmware
+        sees them and without noise, for ``reads_each`` reads in turn,
+        however long the firmware takes to make them; the last one then
+        holds. Replays recorded burst means exactly.
+        """
+        self._played = (at, list(readings), reads_each)
+        self._played_index = 0
+        self._played_reads = 0
+
+    def value_at(self, t):
+        current = self._segments[0][1]
+        for start, v0, end, v1 in self._segments:
+            if t < start:
+                break
+            if t >= end:
+                current = v1
+            else:
+                current = v0 + (v1 - v0) * (t - start) / (end - start)
+        return current
+
+    def sample(self):
+        self.reads += 1
+        if self._played is not None and self.world.now() >= self._played[0]:
+            _, readings, reads_each = self._played
+            if self._played_reads == reads_each and self._played_index + 1 < len(readings):
+                self._played_index += 1
+                self._played_reads = 0
+            self._played_reads += 1
+            return readings[self._played_index]
+        raw = self.value_at(self.world.now()) / 16
+        if self.noise:
+            raw += self.world.random.gauss(0, self.noise)
+        raw = min(4095, max(0, int(round(raw))))
+        # CircuitPython scales the 12-bit reading to 16 bits.
+        return (raw << 4) | (raw >> 8)
+
+
+# ##########################################################
+# NeoPixels
+#
+
+
+class NeoPixelStrip:
+    """Records what reaches the strip and charges the bit-banged wire time."""
+
+    BIT_TIME = 1.25e-6
+    LATCH_TIME = 80e-6
+
+    def __init__(self, world, pin):
+        self.world = world
+        self.pin = pin
+        self.shows = 0
+        self.changed_frames = 0
+        self.last_frame = None
+        self.frames = None  # set to a list to keep every frame
+
+    def write(self, buf):
+        frame = bytes(buf)
+        self.world.stall(len(frame) * 8 * self.BIT_TIME + self.LATCH_TIME)
+        self.shows += 1
+        if frame != self.last_frame:
+            self.changed_frames += 1
+        self.last_frame = frame
+        if self.frames is not None:
+            self.frames.append((self.world.now(), frame))
+
+
+# ##########################################################
+# I2C peripherals
+#
+
+
+class I2CSink:
+    """A write-only I2C device, such as the SSD1306 OLED controller."""
+
+    def __init__(self):
+        self.writes = 0
+        self.bytes_written = 0
+
+    def i2c_write(self, data):
+        self.writes += 1
+        self.bytes_written += len(data)
+
+    def i2c_read_into(self, buf):
+        for i in range(len(buf)):
+            buf[i] = 0
+
+
+class I2CSwitch:
+    """
+    TCA9548A I2C switch: its control register's bits open downstream
+    channels onto the bus, so devices at the same address can share it.
+    """
+
+    def __init__(self, channels=8):
+        self.channels = [{} for _ in range(channels)]
+        self.selected = 0
+        self.selects = 0
+
+    def attach(self, channel, address, device):
+        self.channels[channel][address] = device
+        return device
+
+    def route(self, address):
+        """The device at ``address`` on an open channel, or ``None``."""
+        for number, devices in enumerate(self.channels):
+            if self.selected >> number & 1 and address in devices:
+                return devices[address]
+        return None
+
+    def i2c_write(self, data):
+        if not data:
+            return  # address probe
+        self.selected = data[-1]
+        self.selects += 1
+
+    def i2c_read_into(self, buf):
+        for i in range(len(buf)):
+            buf[i] = self.selected
+
+
+class Card:
+    """An ISO14443A tag with a UID and NTAG2xx page memory."""
+
+    def __init__(self, uid, atqa=b"\x00\x44", sak=0x00, pages=135):
+        self.uid = bytes(uid)
+        self.atqa = bytes(atqa)
+        self.sak = sak
+        self.memory = bytearray(pages * 4)
+        self.memory[0:3] = self.uid[0:3]
+        self.memory[4:8] = self.uid[3:7].ljust(4, b"\x00")
+
+
+_ACK = b"\x00\x00\xff\x00\xff\x00"
+_ERROR_FRAME = b"\x00\x00\xff\x01\xff\x7f\x81\x00"
+
+_COMMAND_GETFIRMWAREVERSION = 0x02
+_COMMAND_SAMCONFIGURATION = 0x14
+_COMMAND_RFCONFIGURATION = 0x32
+_COMMAND_POWERDOWN = 0x16
+_COMMAND_INDATAEXCHANGE = 0x40
+_COMMAND_INLISTPASSIVETARGET = 0x4A
+_COMMAND_INRELEASE = 0x52
+
+_NTAG_READ = 0x30
+_NTAG_WRITE = 0xA2
+
+
+class PN532:
+    """
+    PN532 in I2C mode, modelled at the frame level.
+
+    The IRQ line goes low whenever an ACK or response frame is waiting to be
+    read and returns high once the host has read it, so a ``countio.Counter``
+    on the IRQ pin sees exactly the edges the real part produces.
+    """
+
+    ACK_DELAY = 0.0008
+    COMMAND_TIME = 0.001
+    DETECT_TIME = 0.005
+    PAGE_READ_TIME = 0.003
+
+    def __init__(self, world, irq_pin=None):
+        self.world = world
+        self.irq_pin = irq_pin
+        self.field = []  # cards currently in range, in arrival order
+        self.commands = []  # (t, command) log
+        self._pending = None  # frame waiting to be read
+        self._ready_at = None
+        self._next = None  # (command, params) to run once the ACK is read
+        self._waiting_for_card = None  # (max_targets, t_armed)
+        self._generation = 0
+        if irq_pin is not None:
+            irq_pin.force(True)
+
+    # Scripting
+
+    def place(self, card, at):
+        def arrive(t):
+            if card not in self.field:
+                self.field.append(card)
+            self._card_arrived(t)
+
+        self.world.at(at, arrive)
+
+    def remove(self, card, at):
+        def leave(t):
+            if card in self.field:
+                self.field.remove(card)
+
+        self.world.at(at, leave)
+
+    def tap(self, card, at, hold=1.0):
+        """Place ``card`` on the reader at ``at`` and take it away after ``hold`` seconds."""
+        if not isinstance(card, Card):
+            card = Card(card)
+        self.place(card, at)
+        self.remove(card, at + hold)
+        return card
+
+    # I2C
+
+    def i2c_write(self, data):
+        if not data:
+            return  # address probe
+        t = self.world.now()
+        frame = _parse_frame(data)
+        self._generation += 1
+        self._waiting_for_card = None
+        self._next = None
+        self._pending = None
+        self._set_irq(True, t)
+        if frame is None:
+            self._respond(_ERROR_FRAME, t + self.ACK_DELAY)
+            return
+        command, params = frame[1], bytes(frame[2:])
+        self.commands.append((t, command))
+        self._next = (command, params)
+        self._respond(_ACK, t + self.ACK_DELAY)
+
+    def i2c_read_into(self, buf):
+        self.world.advance()
+        ready = self._pending is not None and self._ready_at <= self.world.now()
+        for i in range(len(buf)):
+            buf[i] = 0
+        buf[0] = 0x01 if ready else 0x00
+        if not ready or len(buf) == 1:
+            return
+        frame = self._pending
+        n = min(len(frame), len(buf) - 1)
+        buf[1:1 + n] = frame[:n]
+        self._pending = None
+        t = self.world.now()
+        self._set_irq(True, t)
+        if frame == _ACK and self._next is not None:
+            command, params = self._next
+            self._next = None
+            self._execute(command, params, t)
+
+    # Internals
+
+    def _respond(self, frame, at):
+        generation = self._generation
+
+        def ready(t):
+            if generation != self._generation:
+                return
+            self._pending = frame
+            self._ready_at = t
+            self._set_irq(False, t)
+
+        self.world.at(at, ready)
+
+    def _respond_data(self, command, data, at):
+        self._respond(_build_frame(bytes((0xD5, command + 1)) + bytes(data)), at)
+
+    def _set_irq(self, level, t):
+        if self.irq_pin is not None:
+            self.irq_pin.force(level, t)
+
+    def _execute(self, command, params, t):
+        done = t + self.COMMAND_TIME
+        if command == _COMMAND_GETFIRMWAREVERSION:
+            self._respond_data(command, b"\x32\x01\x06\x07", done)
+        elif command in (_COMMAND_SAMCONFIGURATION, _COMMAND_RFCONFIGURATION):
+            self._respond_data(command, b"", done)
+        elif command in (_COMMAND_POWERDOWN, _COMMAND_INRELEASE):
+            self._respond_data(command, b"\x00", done)
+        elif command == _COMMAND_INLISTPASSIVETARGET:
+            self._waiting_for_card = (max(1, min(2, params[0])), t)
+            self._card_arrived(t)
+        elif command == _COMMAND_INDATAEXCHANGE:
+            self._respond_data(command, self._exchange(params), t + self.PAGE_READ_TIME)
+        else:
+            self._respond(_ERROR_FRAME, done)
+
+    def _card_arrived(self, t):
+        if self._waiting_for_card is None or not self.field:
+            return
+        waiting = self._waiting_for_card
+        max_targets, armed = waiting
+        self._waiting_for_card = None
+        generation = self._generation
+
+        def listed(t):
+            # Anticollision lists whatever is in the field once it is done
+            if generation != self._generation:
+                return
+            cards = self.field[:max_targets]
+            if not cards:
+                self._waiting_for_card = waiting
+                return
+            data = bytearray((len(cards),))
+            for number, card in enumerate(cards, 1):
+                data.append(number)
+                data.extend(card.atqa)
+                data.append(card.sak)
+                data.append(len(card.uid))
+                data.extend(card.uid)
+            self._respond_data(_COMMAND_INLISTPASSIVETARGET, data, t)
+
+        self.world.at(max(t, armed) + self.DETECT_TIME, listed)
+
+    def _exchange(self, params):
+        target, payload = params[0], params[1:]
+        if not 1 <= target <= len(self.field):
+            return b"\x01"  # timeout: the card has left the field
+        card = self.field[target - 1]
+        if payload[0] == _NTAG_READ:
+            start = payload[1] * 4
+            memory = card.memory + card.memory[:16]  # reads wrap around
+            return b"\x00" + bytes(memory[start:start + 16])
+        if payload[0] == _NTAG_WRITE:
+            start = payload[1] * 4
+            card.memory[start:start + 4] = payload[2:6]
+            return b"\x00"
+        return b"\x01"
+
+
+def _build_frame(data):
+    length = len(data)
+    frame = bytearray(b"\x00\x00\xff")
+    frame.append(length & 0xFF)
+    frame.append((~length + 1) & 0xFF)
+    frame.extend(data)
+    frame.append(-sum(data) & 0xFF)
+    frame.append(0x00)
+    return bytes(frame)
+
+
+def _parse_frame(data):
+    """Return the TFI+command+params of a host frame, or ``None`` if it is malformed."""
+    offset = data.find(b"\x00\xff")
+    if offset < 0 or offset + 4 > len(data):
+        return None
+    offset += 2
+    length = data[offset]
+    if (length + data[offset + 1]) & 0xFF:
+        return None
+    body = data[offset + 2:offset + 2 + length]
+    if len(body) != length or length < 2 or body[0] != 0xD4:
+        return None
+    return body
+
+
+# ##########################################################
+# USB MIDI host
+#
+
+_CLOCK = 0xF8
+_START = 0xFA
+_STOP = 0xFC
+
+
+def _data_length(status):
+    if status < 0xF0:
+        return 1 if 0xC0 <= status < 0xE0 else 2
+    return {0xF1: 1, 0xF2: 2, 0xF3: 1}.get(status, 0)
+
+
+class MidiHost:
+    """
+    The DAW on the other end of the USB cable.
+
+    Messages the host sends are queued with their send time and only move
+    into the device's receive FIFO when there is room, like TinyUSB NAKing
+    the host. Each MIDI message occupies one 4-byte USB-MIDI packet.
+    """
+
+    def __init__(self, world, fifo_packets=16):
+        self.world = world
+        self.fifo_packets = fifo_packets
+        self.fifo = bytearray()
+        self._fifo_messages = []
+        self._outgoing = []  # (send_time, message) not yet in the FIFO
+        self.sent = []  # (send_time, message) of everything scripted
+        self.received = []  # (t, message) the firmware wrote to the out port
+        self.writes = 0
+        self.bytes_written = 0
+        self.max_backlog = 0.0
+
+    # Scripting
+
+    def send(self, message, at):
+        message = bytes(message)
+        self.sent.append((at, message))
+        self.world.at(at, lambda t: self._queue(t, message))
+
+    def clock(self, bpm, at, duration, jitter=0.0, start=False, stop=False):
+        """Send 24 PPQN clock for ``duration`` seconds; ``jitter`` is a standard deviation in seconds."""
+        interval = 60 / (bpm * 24)
+        if start:
+            self.send((_START,), at)
+        count = int(duration / interval)
+        for i in range(count):
+            t = at + i * interval
+            if jitter:
+                t = max(at, t + self.world.random.gauss(0, jitter))
+            self.send((_CLOCK,), t)
+        if stop:
+            self.send((_STOP,), at + count * interval)
+
+    # Device side
+
+    def _queue(self, t, message):
+        self._outgoing.append((t, message))
+        self._fill()
+
+    def _fill(self):
+        now = self.world.now()
+        while self._outgoing and len(self._fifo_messages) < self.fifo_packets:
+            t, message = self._outgoing.pop(0)
+            self.max_backlog = max(self.max_backlog, now - t)
+            self._fifo_messages.append(len(message))
+            self.fifo.extend(message)
+
+    def read(self, nbytes):
+        self.world.advance()
+        self._fill()
+        if not self.fifo:
+            return b""
+        # Whole packets only, as the USB-MIDI class driver hands them out.
+        taken = 0
+        messages = 0
+        for length in self._fifo_messages:
+            if taken + length > nbytes:
+                break
+            taken += length
+            messages += 1
+        if taken == 0:
+            return b""
+        del self._fifo_messages[:messages]
+        data = bytes(self.fifo[:taken])
+        del self.fifo[:taken]
+        self._fill()
+        return data
+
+    def write(self, data):
+        """One port write; split into messages with running status expanded."""
+        now = self.world.now()
+        self.writes += 1
+        self.bytes_written += len(data)
+        status = 0
+        i = 0
+        while i < len(data):
+            if data[i] & 0x80:
+                status = data[i]
+                if status >= 0xF8:
+                    self.received.append((now, bytes((status,))))
+                    i += 1
+                    continue
+                if status == 0xF0:
+                    end = data.find(b"\xf7", i)
+                    end = len(data) if end < 0 else end + 1
+                    self.received.append((now, bytes(data[i:end])))
+                    i = end
+                    continue
+                i += 1
+            length = _data_length(status)
+            self.received.append((now, bytes((status,)) + bytes(data[i:i + length])))
+            i += length
+
+    def arrival_times(self, status):
+        return [t for t, message in self.sent if message[0] == status]
+
+    def beat_times(self, ppqn=24):
+        """Send times of the clocks that start a beat, counted from each Start."""
+        beats = []
+        count = 0
+        for t, message in sorted(self.sent, key=lambda sent: sent[0]):
+            if message[0] == _START:
+                count = 0
+            elif message[0] == _CLOCK:
+                if count % ppqn == 0:
+                    beats.append(t)
+                count += 1
+        return beats
@@ -0,0 +1,32 @@
+"""Stand-in for ``analogio`` reading the simulated ADC sources."""
+
+from picosim import world as _world
+from picosim.devices import AnalogSource
+
+_board = _world.current()
+
+
+class AnalogIn:
+    reference_voltage = 3.3
+
+    def __init__(self, pin):
+        _board.claim(pin)
+        self._pin = pin
+        source = _board.analog.get(pin.number)
+        if source is None:
+            source = _board.analog[pin.number] = AnalogSource(_board, pin)
+        self._source = source
+
+    def deinit(self):
+        _board.unclaim(self._pin)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.deinit()
+
+    @property
+    def value(self):
+        _board.advance()
+        return self._source.sample()
@@ -0,0 +1,17 @@
+"""Stand-in for the Raspberry Pi Pico ``board`` module."""
+
+from microcontroller import pin as _pin
+
+board_id = "raspberry_pi_pico"
+
+for _n in range(29):
+    globals()[f"GP{_n}"] = getattr(_pin, f"GPIO{_n}")
+
+SMPS_MODE = _pin.GPIO23
+VBUS_SENSE = _pin.GPIO24
+LED = _pin.GPIO25
+A0 = _pin.GPIO26
+A1 = _pin.GPIO27
+A2 = _pin.GPIO28
+A3 = _pin.GPIO29
+VOLTAGE_MONITOR = _pin.GPIO29
@@ -0,0 +1,61 @@
+"""Stand-in for ``busio``: I2C only, routed to the simulated bus devices."""
+
+from picosim import world as _world
+
+_board = _world.current()
+
+
+class I2C:
+    def __init__(self, scl, sda, *, frequency=100000, timeout=255):
+        _board.claim(scl, sda)
+        self._pins = (scl, sda)
+        self._bus = _board.i2c_bus(scl, sda)
+        self._bus.frequency = frequency
+        self._locked = False
+
+    @property
+    def frequency(self):
+        return self._bus.frequency
+
+    def deinit(self):
+        _board.unclaim(*self._pins)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.deinit()
+
+    def try_lock(self):
+        if self._locked:
+            return False
+        self._locked = True
+        return True
+
+    def unlock(self):
+        self._locked = False
+
+    def _check_lock(self):
+        if not self._locked:
+            raise RuntimeError("Function requires lock")
+
+    def scan(self):
+        self._check_lock()
+        return sorted(self._bus.devices)
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        self._check_lock()
+        self._bus.write(address, bytes(buffer[start:end]))
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        self._check_lock()
+        if end is None:
+            end = len(buffer)
+        data = bytearray(end - start)
+        self._bus.read_into(address, data)
+        buffer[start:end] = data
+
+    def writeto_then_readfrom(self, address, buffer_out, buffer_in, *, out_start=0,
+                              out_end=None, in_start=0, in_end=None):
+        self.writeto(address, buffer_out, start=out_start, end=out_end)
+        self.readfrom_into(address, buffer_in, start=in_start, end=in_end)
@@ -0,0 +1,48 @@
+"""Stand-in for ``countio`` counting edges on a simulated pin."""
+
+from picosim import world as _world
+
+_board = _world.current()
+
+
+class Edge:
+    RISE = "RISE"
+    FALL = "FALL"
+    RISE_AND_FALL = "RISE_AND_FALL"
+
+
+class Counter:
+    def __init__(self, pin, *, edge=Edge.FALL, pull=None):
+        _board.claim(pin)
+        self._pin = pin
+        self._edge = edge
+        self._count = 0
+        if pull is not None:
+            pin.set_pull(pull == "UP")
+        pin.add_listener(self._on_edge)
+
+    def _on_edge(self, level, t):
+        if self._edge == Edge.RISE_AND_FALL or (level == (self._edge == Edge.RISE)):
+            self._count += 1
+
+    @property
+    def count(self):
+        _board.advance()
+        return self._count
+
+    @count.setter
+    def count(self, value):
+        self._count = value
+
+    def reset(self):
+        self._count = 0
+
+    def deinit(self):
+        self._pin.remove_listener(self._on_edge)
+        _board.unclaim(self._pin)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.deinit()
@@ -0,0 +1,99 @@
+"""Stand-in for ``digitalio`` backed by the simulated pins."""
+
+from picosim import world as _world
+
+_board = _world.current()
+
+
+class Direction:
+    INPUT = "INPUT"
+    OUTPUT = "OUTPUT"
+
+
+class Pull:
+    UP = "UP"
+    DOWN = "DOWN"
+
+
+class DriveMode:
+    PUSH_PULL = "PUSH_PULL"
+    OPEN_DRAIN = "OPEN_DRAIN"
+
+
+class DigitalInOut:
+    def __init__(self, pin):
+        _board.claim(pin)
+        self._pin = pin
+        self._direction = Direction.INPUT
+        self._pull = None
+        self._drive_mode = DriveMode.PUSH_PULL
+        pin.release()
+
+    def deinit(self):
+        if self._pin is None:
+            return
+        self._pin.release()
+        self._pin.set_pull(None)
+        _board.unclaim(self._pin)
+        self._pin = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.deinit()
+
+    def switch_to_output(self, value=False, drive_mode=DriveMode.PUSH_PULL):
+        self._direction = Direction.OUTPUT
+        self._drive_mode = drive_mode
+        self._pull = None
+        self._pin.set_pull(None)
+        self._pin.drive(value)
+
+    def switch_to_input(self, pull=None):
+        self._direction = Direction.INPUT
+        self._pin.release()
+        self.pull = pull
+
+    @property
+    def direction(self):
+        return self._direction
+
+    @direction.setter
+    def direction(self, value):
+        if value == Direction.OUTPUT:
+            self.switch_to_output()
+        else:
+            self.switch_to_input()
+
+    @property
+    def value(self):
+        _board.advance()
+        if self._direction == Direction.OUTPUT:
+            return self._pin.driven
+        return self._pin.level
+
+    @value.setter
+    def value(self, value):
+        if self._direction != Direction.OUTPUT:
+            raise AttributeError("Cannot set value when direction is input.")
+        self._pin.drive(value)
+
+    @property
+    def pull(self):
+        return self._pull
+
+    @pull.setter
+    def pull(self, pull):
+        if self._direction == Direction.OUTPUT:
+            raise AttributeError("Pull not used when direction is output.")
+        self._pull = pull
+        self._pin.set_pull(None if pull is None else pull == Pull.UP)
+
+    @property
+    def drive_mode(self):
+        return self._drive_mode
+
+    @drive_mode.setter
+    def drive_mode(self, mode):
+        self._drive_mode = mode
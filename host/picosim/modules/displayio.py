@@ -0,0 +1,403 @@
+"""
+Stand-in for ``displayio``.
+
+Nothing is rasterised. What matters for timing is which screen area changes
+and when the supervisor pushes it over the bus, so every mutation of a shown
+group marks its bounding box dirty and the display refreshes that box from
+the supervisor background hook, at most ``native_frames_per_second`` times a
+second, exactly as CircuitPython's auto-refresh does.
+"""
+
+from picosim import world as _world
+
+_board = _world.current()
+
+
+def _union(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def release_displays():
+    for display in tuple(_board.displays):
+        display._release()
+
+
+class Bitmap:
+    def __init__(self, width, height, value_count):
+        self.width = width
+        self.height = height
+        self._data = bytearray(width * height)
+        self._users = []
+
+    def _index(self, index):
+        if isinstance(index, tuple):
+            return index[1] * self.width + index[0]
+        return index
+
+    def __getitem__(self, index):
+        return self._data[self._index(index)]
+
+    def __setitem__(self, index, value):
+        self._data[self._index(index)] = value
+        self._changed()
+
+    def fill(self, value):
+        for i in range(len(self._data)):
+            self._data[i] = value
+        self._changed()
+
+    def _changed(self):
+        for user in self._users:
+            user._touch()
+
+
+class Palette:
+    def __init__(self, color_count, *, dither=False):
+        self._colors = [0] * color_count
+        self._transparent = [False] * color_count
+        self._users = []
+
+    def __len__(self):
+        return len(self._colors)
+
+    def __getitem__(self, index):
+        return self._colors[index]
+
+    def __setitem__(self, index, value):
+        self._colors[index] = value
+        self._changed()
+
+    def make_transparent(self, index):
+        self._transparent[index] = True
+        self._changed()
+
+    def make_opaque(self, index):
+        self._transparent[index] = False
+        self._changed()
+
+    def is_transparent(self, index):
+        return self._transparent[index]
+
+    def _changed(self):
+        for user in self._users:
+            user._touch()
+
+
+class _Layer:
+    _parent = None
+    _hidden = False
+
+    @property
+    def hidden(self):
+        return self._hidden
+
+    @hidden.setter
+    def hidden(self, value):
+        self._touch()
+        self._hidden = bool(value)
+        self._touch()
+
+    def _touch(self):
+        if self._parent is not None:
+            self._parent._mark(self._box())
+
+
+class TileGrid(_Layer):
+    def __init__(self, bitmap, *, pixel_shader, width=1, height=1, tile_width=None,
+                 tile_height=None, default_tile=0, x=0, y=0):
+        self.bitmap = bitmap
+        self.pixel_shader = pixel_shader
+        self.width = width
+        self.height = height
+        self.tile_width = bitmap.width if tile_width is None else tile_width
+        self.tile_height = bitmap.height if tile_height is None else tile_height
+        self._tiles = [default_tile] * (width * height)
+        self._x = x
+        self._y = y
+        self.flip_x = False
+        self.flip_y = False
+        self.transpose_xy = False
+        bitmap._users.append(self)
+        if hasattr(pixel_shader, "_users"):
+            pixel_shader._users.append(self)
+
+    def _box(self):
+        return (self._x, self._y, self._x + self.width * self.tile_width,
+                self._y + self.height * self.tile_height)
+
+    @property
+    def x(self):
+        return self._x
+
+    @x.setter
+    def x(self, value):
+        self._touch()
+        self._x = value
+        self._touch()
+
+    @property
+    def y(self):
+        return self._y
+
+    @y.setter
+    def y(self, value):
+        self._touch()
+        self._y = value
+        self._touch()
+
+    def _index(self, index):
+        if isinstance(index, tuple):
+            return index[1] * self.width + index[0]
+        return index
+
+    def __getitem__(self, index):
+        return self._tiles[self._index(index)]
+
+    def __setitem__(self, index, value):
+        self._tiles[self._index(index)] = value
+        self._touch()
+
+
+class Group(_Layer):
+    def __init__(self, *, scale=1, x=0, y=0):
+        self._layers = []
+        self._scale = scale
+        self._x = x
+        self._y = y
+        self._display = None
+
+    def _box(self):
+        box = None
+        for layer in self._layers:
+            box = _union(box, self._transform(layer._box()))
+        return box
+
+    def _transform(self, box):
+        if box is None:
+            return None
+        s = self._scale
+        return (self._x + box[0] * s, self._y + box[1] * s,
+                self._x + box[2] * s, self._y + box[3] * s)
+
+    def _mark(self, box):
+        if self._display is not None:
+            self._display._invalidate(self._transform(box))
+        elif self._parent is not None:
+            self._parent._mark(self._transform(box))
+
+    def _touch(self):
+        if self._display is not None:
+            self._display._invalidate(self._box())
+        else:
+            super()._touch()
+
+    @property
+    def x(self):
+        return self._x
+
+    @x.setter
+    def x(self, value):
+        self._touch()
+        self._x = value
+        self._touch()
+
+    @property
+    def y(self):
+        return self._y
+
+    @y.setter
+    def y(self, value):
+        self._touch()
+        self._y = value
+        self._touch()
+
+    @property
+    def scale(self):
+        return self._scale
+
+    @scale.setter
+    def scale(self, value):
+        self._touch()
+        self._scale = value
+        self._touch()
+
+    def __len__(self):
+        return len(self._layers)
+
+    def __getitem__(self, index):
+        return self._layers[index]
+
+    def __setitem__(self, index, layer):
+        old = self._layers[index]
+        self._mark(old._box())
+        old._parent = None
+        layer._parent = self
+        self._layers[index] = layer
+        self._mark(layer._box())
+
+    def __delitem__(self, index):
+        self.pop(index)
+
+    def append(self, layer):
+        self.insert(len(self._layers), layer)
+
+    def insert(self, index, layer):
+        if layer._parent is not None:
+            raise ValueError("Layer already in a group")
+        layer._parent = self
+        self._layers.insert(index, layer)
+        self._mark(layer._box())
+
+    def index(self, layer):
+        return self._layers.index(layer)
+
+    def pop(self, i=-1):
+        layer = self._layers.pop(i)
+        self._mark(layer._box())
+        layer._parent = None
+        return layer
+
+    def remove(self, layer):
+        self.pop(self._layers.index(layer))
+
+
+class I2CDisplay:
+    def __init__(self, i2c_bus, *, device_address, reset=None):
+        self._i2c = i2c_bus
+        self._address = device_address
+
+    def reset(self):
+        pass
+
+    def send(self, command, data):
+        """Send a command byte and its parameters, as the displayio core does."""
+        self._write(bytes((0x00, command)) + bytes(data))
+
+    def _send_pixels(self, data):
+        self._write(b"\x40" + bytes(data))
+
+    def _write(self, data):
+        while not self._i2c.try_lock():
+            pass
+        try:
+            self._i2c.writeto(self._address, data)
+        finally:
+            self._i2c.unlock()
+
+    def _is_locked(self):
+        return self._i2c._locked
+
+
+class FourWire:
+    def __init__(self, spi_bus, *, command, chip_select, reset=None, baudrate=24000000):
+        raise NotImplementedError("SPI displays are not simulated")
+
+
+class Display:
+    def __init__(self, display_bus, init_sequence, *, width, height, colstart=0, rowstart=0,
+                 rotation=0, color_depth=16, grayscale=False, pixels_in_byte_share_row=True,
+                 set_column_command=0x2A, set_row_command=0x2B, auto_refresh=True,
+                 native_frames_per_second=60, **kwargs):
+        self.bus = display_bus
+        self.width = width
+        self.height = height
+        self.rotation = rotation
+        self._color_depth = color_depth
+        self._pixels_in_byte_share_row = pixels_in_byte_share_row
+        self._set_column_command = set_column_command
+        self._set_row_command = set_row_command
+        self.auto_refresh = auto_refresh
+        self._frame_time = 1 / native_frames_per_second
+        self._last_refresh = -1.0
+        self._dirty = None
+        self.refreshes = 0
+        self.refresh_bytes = 0
+        self.refresh_log = []  # (t, bytes) per refresh
+        self.brightness = 1.0
+
+        i = 0
+        while i < len(init_sequence):
+            command = init_sequence[i]
+            length = init_sequence[i + 1] & 0x7F
+            delay = init_sequence[i + 1] & 0x80
+            display_bus.send(command, init_sequence[i + 2:i + 2 + length])
+            i += 2 + length
+            if delay:
+                i += 1
+
+        # At boot the display mirrors the serial console.
+        self._root_group = None
+        self._terminal = Group()
+        self._terminal.append(TileGrid(Bitmap(width, height, 2), pixel_shader=Palette(2)))
+        self.root_group = self._terminal
+
+        _board.displays.append(self)
+        _board.add_background(self._background)
+
+    @property
+    def root_group(self):
+        return self._root_group
+
+    @root_group.setter
+    def root_group(self, group):
+        if group is None:
+            group = self._terminal
+        if self._root_group is not None:
+            self._root_group._display = None
+        self._root_group = group
+        group._display = self
+        self._invalidate((0, 0, self.width, self.height))
+
+    def show(self, group):
+        self.root_group = group
+
+    def refresh(self, *, target_frames_per_second=None, minimum_frames_per_second=0):
+        self._refresh(_board.now())
+        return True
+
+    def _release(self):
+        _board.remove_background(self._background)
+        if self in _board.displays:
+            _board.displays.remove(self)
+
+    def _invalidate(self, box):
+        if box is not None:
+            self._dirty = _union(self._dirty, box)
+
+    def _background(self, now):
+        if (self.auto_refresh and self._dirty is not None
+                and now - self._last_refresh >= self._frame_time
+                and not self.bus._is_locked()):
+            self._refresh(now)
+
+    def _refresh(self, now):
+        self._last_refresh = now
+        box = self._dirty
+        self._dirty = None
+        if box is None:
+            return
+        x0, y0 = max(0, int(box[0])), max(0, int(box[1]))
+        x1, y1 = min(self.width, int(box[2])), min(self.height, int(box[3]))
+        if x0 >= x1 or y0 >= y1:
+            return
+        if self._color_depth == 1 and not self._pixels_in_byte_share_row:
+            # Monochrome controllers such as the SSD1306 pack 8 rows per byte.
+            page0, page1 = y0 // 8, (y1 + 7) // 8
+            self.bus.send(self._set_column_command, bytes((x0, x1 - 1)))
+            self.bus.send(self._set_row_command, bytes((page0, page1 - 1)))
+            row = bytes(x1 - x0)
+            for _ in range(page0, page1):
+                self.bus._send_pixels(row)
+            nbytes = (x1 - x0) * (page1 - page0)
+        else:
+            nbytes = (x1 - x0) * (y1 - y0) * self._color_depth // 8
+            self.bus.send(self._set_column_command, bytes((x0, x1 - 1)))
+            self.bus.send(self._set_row_command, bytes((y0, y1 - 1)))
+            self.bus._send_pixels(bytes(nbytes))
+        self.refreshes += 1
+        self.refresh_bytes += nbytes
+        self.refresh_log.append((now, nbytes))
@@ -0,0 +1,46 @@
+"""Stand-in for ``fontio``."""
+
+import displayio
+
+
+class FontProtocol:
+    """Only referenced from annotations, which CPython evaluates."""
+
+
+class Glyph:
+    def __init__(self, bitmap, tile_index, width, height, dx, dy, shift_x, shift_y):
+        self.bitmap = bitmap
+        self.tile_index = tile_index
+        self.width = width
+        self.height = height
+        self.dx = dx
+        self.dy = dy
+        self.shift_x = shift_x
+        self.shift_y = shift_y
+
+
+class BuiltinFont:
+    """Fixed-width font laid out like CircuitPython's 6x12 terminal font."""
+
+    _FIRST = 0x20
+    _LAST = 0x7E
+
+    def __init__(self, width=6, height=12):
+        self._width = width
+        self._height = height
+        count = self._LAST - self._FIRST + 1
+        self.bitmap = displayio.Bitmap(width * count, height, 2)
+        self._glyphs = {}
+
+    def get_bounding_box(self):
+        return (self._width, self._height)
+
+    def get_glyph(self, codepoint):
+        if not self._FIRST <= codepoint <= self._LAST:
+            codepoint = ord("?")
+        glyph = self._glyphs.get(codepoint)
+        if glyph is None:
+            glyph = self._glyphs[codepoint] = Glyph(
+                self.bitmap, codepoint - self._FIRST, self._width, self._height,
+                0, 0, self._width, 0)
+        return glyph
@@ -0,0 +1,134 @@
+"""
+Stand-in for ``keypad``: keys scanned every ``interval`` in the background,
+as the supervisor scans them on the board, into a queue of events.
+"""
+
+from picosim import world as _world
+from picosim.devices import Footswitches
+from supervisor import ticks_ms
+
+_board = _world.current()
+
+
+class Event:
+    def __init__(self, key_number=0, pressed=True, timestamp=None):
+        self.key_number = key_number
+        self.pressed = pressed
+        self.timestamp = timestamp
+
+    @property
+    def released(self):
+        return not self.pressed
+
+    def __eq__(self, other):
+        return self.key_number == other.key_number and self.pressed == other.pressed
+
+    def __hash__(self):
+        return hash((self.key_number, self.pressed))
+
+    def __repr__(self):
+        return f"<Event: key_number {self.key_number} {'pressed' if self.pressed else 'released'}>"
+
+
+class EventQueue:
+    def __init__(self, max_events):
+        self._max_events = max_events
+        self._events = []
+        self._overflowed = False
+
+    def _put(self, key_number, pressed, timestamp):
+        if len(self._events) >= self._max_events:
+            self._overflowed = True
+            return
+        self._events.append((key_number, pressed, timestamp))
+
+    def get(self):
+        _board.advance()
+        if not self._events:
+            return None
+        return Event(*self._events.pop(0))
+
+    def get_into(self, event):
+        _board.advance()
+        if not self._events:
+            return False
+        event.key_number, event.pressed, event.timestamp = self._events.pop(0)
+        return True
+
+    def clear(self):
+        self._events.clear()
+        self._overflowed = False
+
+    @property
+    def overflowed(self):
+        return self._overflowed
+
+    def __len__(self):
+        _board.advance()
+        return len(self._events)
+
+    def __bool__(self):
+        return len(self) > 0
+
+
+class _Scanner:
+    def __init__(self, pins, key_count, interval, max_events):
+        _board.claim(*pins)
+        self._pins = pins
+        self.key_count = key_count
+        self.events = EventQueue(max_events)
+        self._interval = interval
+        self._last_scan = None
+        self._pressed = [False] * key_count
+        _board.add_background(self._scan)
+
+    def _scan(self, now):
+        if self._last_scan is not None and now - self._last_scan < self._interval:
+            return
+        self._last_scan = now
+        timestamp = ticks_ms()
+        for key_number in range(self.key_count):
+            pressed = self._read(key_number)
+            if pressed != self._pressed[key_number]:
+                self._pressed[key_number] = pressed
+                self.events._put(key_number, pressed, timestamp)
+
+    def reset(self):
+        """Take every key as released, so the next scan reports those held down."""
+        self._pressed = [False] * self.key_count
+        self._last_scan = None
+
+    def deinit(self):
+        _board.remove_background(self._scan)
+        _board.unclaim(*self._pins)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.deinit()
+
+
+class Keys(_Scanner):
+    def __init__(self, pins, *, value_when_pressed, pull=True, interval=0.020, max_events=64):
+        self._value_when_pressed = value_when_pressed
+        if pull:
+            for pin in pins:
+                pin.set_pull(not value_when_pressed)
+        super().__init__(tuple(pins), len(pins), interval, max_events)
+
+    def _read(self, key_number):
+        return self._pins[key_number].level == self._value_when_pressed
+
+
+class ShiftRegisterKeys(_Scanner):
+    def __init__(self, *, clock, data, latch, value_to_latch=True, key_count, value_when_pressed,
+                 interval=0.020, max_events=64):
+        switches = _board.shift_registers.get(data.number)
+        if switches is None:
+            switches = _board.shift_registers[data.number] = Footswitches(_board, count=key_count)
+        self._switches = switches
+        super().__init__((clock, data, latch), key_count, interval, max_events)
+
+    def _read(self, key_number):
+        return key_number < self._switches.count and self._switches.closed[key_number]
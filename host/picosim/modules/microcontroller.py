@@ -0,0 +1,30 @@
+"""Stand-in for ``microcontroller`` on the simulated RP2040."""
+
+from picosim import world as _world
+
+_board = _world.current()
+
+Pin = _world.Pin
+
+
+class _Pins:
+    pass
+
+
+pin = _Pins()
+for _n in range(_world.World.NUM_PINS):
+    setattr(pin, f"GPIO{_n}", _board.pin(_n))
+
+
+class Processor:
+    frequency = 125_000_000
+    temperature = 27.0
+    voltage = 3.3
+    uid = bytearray(b"\xe6\x60\xc0\x62\x13\x28\x70\x35")
+
+
+cpu = Processor()
+
+
+def delay_us(delay):
+    _board.stall(delay / 1_000_000)
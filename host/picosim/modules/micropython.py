@@ -0,0 +1,13 @@
+"""Stand-in for the ``micropython`` builtin module."""
+
+
+def const(value):
+    return value
+
+
+def native(fn):
+    return fn
+
+
+def viper(fn):
+    return fn
@@ -0,0 +1,52 @@
+"""Stand-in for ``neopixel`` writing to a simulated strip."""
+
+import adafruit_pixelbuf
+
+from picosim import world as _world
+from picosim.devices import NeoPixelStrip
+
+_board = _world.current()
+
+RGB = "RGB"
+GRB = "GRB"
+RGBW = "RGBW"
+GRBW = "GRBW"
+
+
+class NeoPixel(adafruit_pixelbuf.PixelBuf):
+    def __init__(self, pin, n, *, bpp=3, brightness=1.0, auto_write=True, pixel_order=None):
+        if not pixel_order:
+            pixel_order = GRB if bpp == 3 else GRBW
+        elif isinstance(pixel_order, tuple):
+            pixel_order = "".join(RGBW[order] for order in pixel_order)
+        _board.claim(pin)
+        self.pin = pin
+        strip = _board.strips.get(pin.number)
+        if strip is None:
+            strip = _board.strips[pin.number] = NeoPixelStrip(_board, pin)
+        self._strip = strip
+        super().__init__(n, brightness=brightness, byteorder=pixel_order, auto_write=auto_write)
+
+    def deinit(self):
+        self.fill(0)
+        self.show()
+        _board.unclaim(self.pin)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.deinit()
+
+    def __repr__(self):
+        return "[" + ", ".join([str(x) for x in self]) + "]"
+
+    @property
+    def n(self):
+        return len(self)
+
+    def write(self):
+        self.show()
+
+    def _transmit(self, buffer):
+        self._strip.write(buffer)
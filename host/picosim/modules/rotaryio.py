@@ -0,0 +1,47 @@
+"""Stand-in for ``rotaryio`` counting the simulated encoder's transitions."""
+
+from picosim import world as _world
+from picosim.devices import QuadratureEncoder
+
+_board = _world.current()
+
+
+class IncrementalEncoder:
+    def __init__(self, pin_a, pin_b, divisor=4):
+        _board.claim(pin_a, pin_b)
+        self._pins = (pin_a, pin_b)
+        encoder = _board.encoders.get(pin_a.number)
+        if encoder is None:
+            encoder = _board.encoders[pin_a.number] = QuadratureEncoder(_board, pin_a, pin_b)
+        self._encoder = encoder
+        self._seen = encoder.transitions
+        self._quarter_count = 0
+        self._position = 0
+        self.divisor = divisor
+
+    def deinit(self):
+        _board.unclaim(*self._pins)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.deinit()
+
+    @property
+    def position(self):
+        _board.advance()
+        transitions = self._encoder.transitions
+        self._quarter_count += transitions - self._seen
+        self._seen = transitions
+        while self._quarter_count >= self.divisor:
+            self._quarter_count -= self.divisor
+            self._position += 1
+        while self._quarter_count <= -self.divisor:
+            self._quarter_count += self.divisor
+            self._position -= 1
+        return self._position
+
+    @position.setter
+    def position(self, value):
+        self._position = value
@@ -0,0 +1,97 @@
+"""
+Stand-in for ``rp2pio``: a state machine that only takes writes.
+
+No PIO program is executed. Timing assumes 52 cycles per word, as neopio's
+piopixl8 program takes per byte (one bit for each of eight strands), so a
+write of ``n`` bytes holds the FIFO for ``n * 52 / frequency`` seconds.
+Every buffer written is kept in ``frames``, as the state machine read it;
+a background write whose buffer changed while it was being sent is
+counted in ``torn``.
+"""
+
+from picosim import world as _world
+
+_board = _world.current()
+
+_CYCLES_PER_WORD = 52
+
+
+class StateMachine:
+    def __init__(self, program, frequency, *, init=None, first_out_pin=None, out_pin_count=1,
+                 first_set_pin=None, set_pin_count=1, first_sideset_pin=None, sideset_pin_count=1,
+                 auto_pull=False, out_shift_right=True, pull_threshold=32, **kwargs):
+        pins = set()
+        for first, count in ((first_out_pin, out_pin_count), (first_set_pin, set_pin_count),
+                             (first_sideset_pin, sideset_pin_count)):
+            if first is not None:
+                pins.update(_board.pin(first.number + i) for i in range(count))
+        _board.claim(*pins)
+        self._pins = pins
+        self.frequency = frequency
+        self.frames = []
+        self.torn = 0
+        self.writes = 0
+        self.background_writes = 0
+        self._current = None  # (buffer, snapshot, end)
+        self._pending = None
+
+    def _duration(self, buf):
+        return len(buf) * _CYCLES_PER_WORD / self.frequency
+
+    def write(self, buffer, *, start=0, end=None, swap=False):
+        self._wait()
+        data = bytes(memoryview(buffer)[start:end])
+        self.writes += 1
+        _board.stall(self._duration(data))
+        self.frames.append(data)
+
+    def background_write(self, once=None, *, loop=None, swap=False):
+        if loop is not None:
+            raise NotImplementedError("looping background writes are not simulated")
+        self._update()
+        self.background_writes += 1
+        if self._current is None:
+            self._start(once, _board.now())
+        elif self._pending is None:
+            self._pending = once
+        else:
+            # Both DMA slots busy: the call blocks until one frees up.
+            self._wait()
+            self._start(once, _board.now())
+
+    def stop_background_write(self):
+        self._current = None
+        self._pending = None
+
+    @property
+    def writing(self):
+        self._update()
+        return self._current is not None
+
+    @property
+    def pending(self):
+        self._update()
+        return (self._current is not None) + (self._pending is not None)
+
+    def _start(self, buffer, t):
+        self._current = (buffer, bytes(buffer), t + self._duration(buffer))
+
+    def _update(self):
+        now = _board.now()
+        while self._current is not None and now >= self._current[2]:
+            buffer, snapshot, end = self._current
+            if bytes(buffer) != snapshot:
+                self.torn += 1
+            self.frames.append(snapshot)
+            self._current = None
+            if self._pending is not None:
+                self._start(self._pending, end)
+                self._pending = None
+
+    def _wait(self):
+        while self.writing:
+            pass
+
+    def deinit(self):
+        self._wait()
+        _board.unclaim(*self._pins)
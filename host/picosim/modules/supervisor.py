@@ -0,0 +1,28 @@
+"""Stand-in for ``supervisor``: the tick counter and the serial console's input state."""
+
+from picosim import world as _world
+
+_board = _world.current()
+
+_TICKS_PERIOD = 1 << 29
+# CircuitPython starts the counter shortly before it wraps so that wraparound
+# bugs show up in the first minutes instead of after days.
+_TICKS_START = _TICKS_PERIOD - 65536
+
+
+def ticks_ms():
+    # Whole ms of uptime plus whole ms since the start, so an uptime only
+    # ever shifts the counter and never changes where a millisecond ends
+    return (round(_board.uptime * 1000) + _board.now_ms() + _TICKS_START) % _TICKS_PERIOD
+
+
+class _Runtime:
+    serial_connected = True
+
+    @property
+    def serial_bytes_available(self):
+        _board.advance()
+        return len(_board.serial_in)
+
+
+runtime = _Runtime()
@@ -0,0 +1,5 @@
+"""Stand-in for ``terminalio``."""
+
+import fontio
+
+FONT = fontio.BuiltinFont()
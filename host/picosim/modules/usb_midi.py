@@ -0,0 +1,31 @@
+"""Stand-in for ``usb_midi`` connected to the simulated USB host."""
+
+from picosim import world as _world
+
+_board = _world.current()
+
+
+class PortIn:
+    def read(self, nbytes=None):
+        data = _board.midi.read(64 if nbytes is None else nbytes)
+        return data or None
+
+    def readinto(self, buf, nbytes=None):
+        if nbytes is None:
+            nbytes = len(buf)
+        data = _board.midi.read(nbytes)
+        if not data:
+            return None
+        buf[0:len(data)] = data
+        return len(data)
+
+
+class PortOut:
+    def write(self, buf, nbytes=None):
+        if nbytes is None:
+            nbytes = len(buf)
+        _board.midi.write(bytes(buf[0:nbytes]))
+        return nbytes
+
+
+ports = (PortIn(), PortOut())
@@ -0,0 +1,49 @@
+"""Scripted performances shared by the host benchmarks."""
+
+from picosim.devices import Card
+
+CARD_A = Card(b"\x04\x12\x34\x56\x78\x9a\xbc")
+CARD_B = Card(b"\x04\x65\x43\x21\x0f\xed\xcb")
+
+
+def gig(sim, duration, bpm=120, start=1.5):
+    """
+    A busy stretch of a set: DAW clock throughout, a card placed and later
+    swapped, the FX1 encoder nudged and then spun hard, and the FX2 pot swept
+    with realistic ADC noise.
+    """
+    sim.midi.clock(bpm=bpm, at=start, duration=duration - start, start=True)
+    sim.pot.noise = 2.0
+    sim.pot.hold(32768)
+    sim.nfc.place(CARD_A, at=start + 0.5)
+    sim.encoder.turn(3, at=start + 1.0, duration=0.6)
+    sim.encoder.turn(-20, at=start + 2.0, duration=0.25)
+    sim.pot.sweep(32768, 60000, at=start + 3.0, duration=1.5)
+    sim.nfc.remove(CARD_A, at=start + 5.0)
+    sim.nfc.place(CARD_B, at=start + 5.2)
+    sim.encoder.turn(40, at=start + 6.0, duration=0.4)
+    sim.pot.sweep(60000, 1000, at=start + 7.0, duration=0.5)
+
+
+def clock_only(sim, duration, bpm=120, start=1.5):
+    """The board left alone with the DAW playing: only MIDI clock comes in."""
+    sim.midi.clock(bpm=bpm, at=start, duration=duration - start, start=True)
+
+
+def knob_sweep(sim, duration, bpm=120, start=1.5):
+    """
+    Clock playing and a card on the reader while both knobs are worked hard:
+    the FX1 encoder spun back and forth and the FX2 pot swept end to end.
+    """
+    sim.midi.clock(bpm=bpm, at=start, duration=duration - start, start=True)
+    sim.pot.noise = 2.0
+    sim.pot.hold(1000)
+    sim.nfc.place(CARD_A, at=start - 1.0)
+    t = start
+    direction = 1
+    while t + 1.0 <= duration:
+        sim.encoder.turn(24 * direction, at=t, duration=0.5)
+        ends = (1000, 60000) if direction > 0 else (60000, 1000)
+        sim.pot.sweep(*ends, at=t, duration=1.0)
+        direction = -direction
+        t += 1.0
@@ -0,0 +1,332 @@
+"""
+Boot the controller firmware against the simulated board.
+
+`Simulator` wires the peripherals the way the controller is built (PN532 on
+GP5/GP4 with IRQ on GP17, SSD1306 on GP7/GP6, encoder on GP13/GP14, pot on
+GP28, NeoPixels on GP16, beat LED on GP25), then executes ``code.py``
+unchanged. With ``nfc_slots`` the PN532s are that many card slots behind
+a TCA9548A instead, slot n on channel n with its IRQ on NFC_IRQ_PINS[n],
+as nfc_pool expects. The firmware's own ``asyncio.run(main())`` is redirected onto an
+instrumented event loop that stops after the requested duration.
+
+With ``manual_clock`` the board's time only moves when ``world.step`` is
+called, so a check does not depend on how fast the host is. ``run`` then
+steps it itself: the event loop's clock is the board's, and where the loop
+would sleep the clock jumps straight to its next timer. Firmware code takes
+no board time except for the bus transfers the devices charge, so the same
+script and inputs give the same run every time.
+"""
+
+import asyncio
+import collections
+import contextlib
+import math
+import os
+import runpy
+import selectors
+import sys
+import time
+
+from picosim import world as _world
+from picosim.devices import (AnalogSource, I2CSink, I2CSwitch, MidiHost, NeoPixelStrip, PN532,
+                             QuadratureEncoder)
+
+HOST_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(HOST_DIR)
+MODULES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "modules")
+
+_CLOCK = 0xF8
+# GPIO numbers of nfc_pool.IRQ_PINS
+NFC_IRQ_PINS = (17, 19, 21, 9, 11)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class LoopStats:
+    """Per-pass CPU time of the event loop, split from time spent idle in select."""
+
+    def __init__(self):
+        self.warmup = 0.0
+        self.passes = 0
+        self.busy = []
+        self.idle_time = 0.0
+        self.elapsed = 0.0
+
+
+class _TimedSelector(selectors.DefaultSelector):
+    def __init__(self, stats, world):
+        super().__init__()
+        self._stats = stats
+        self._world = world
+        self.waited = 0.0
+
+    def select(self, timeout=None):
+        if self._world._background and (timeout is None or timeout > 0.005):
+            # Keep the supervisor's background work (display refresh) ticking while idle.
+            timeout = 0.005
+        start = time.perf_counter()
+        try:
+            if self._world.manual_clock:
+                return self._step(timeout)
+            if timeout is None or timeout <= 0:
+                return super().select(timeout)
+            # The host may oversleep by several milliseconds, far more than the
+            # firmware's own waits; sleep short and spin the rest, as World.stall does.
+            end = start + timeout
+            if timeout > 0.002:
+                events = super().select(timeout - 0.001)
+                if events:
+                    return events
+            while True:
+                events = super().select(0)
+                if events or time.perf_counter() >= end:
+                    return events
+        finally:
+            self.waited = time.perf_counter() - start
+
+    def _step(self, timeout):
+        # Nothing waits on real files, so a sleep is the clock moving on:
+        # to the timer, or with none to the next scripted event
+        events = super().select(0)
+        if events or timeout is not None and timeout <= 0:
+            return events
+        world = self._world
+        if timeout is None:
+            due = world.next_event()
+            if due is None:
+                raise RuntimeError("the firmware is waiting with nothing left to wake it")
+            timeout = due - world.now()
+        # Rounded up, or the loop would find its timer a fraction of a microsecond off
+        world.step(max(1, math.ceil(timeout * 1e6)) / 1e6)
+        return events
+
+
+class _SimLoop(asyncio.SelectorEventLoop):
+    def __init__(self, stats, world):
+        self._sim_selector = _TimedSelector(stats, world)
+        super().__init__(self._sim_selector)
+        self._sim_stats = stats
+        self._sim_world = world
+
+    def time(self):
+        if self._sim_world.manual_clock:
+            return self._sim_world.now()
+        return super().time()
+
+    def _run_once(self):
+        stats = self._sim_stats
+        start = time.perf_counter()
+        self._sim_world.advance()
+        super()._run_once()
+        elapsed = time.perf_counter() - start
+        idle = self._sim_selector.waited
+        self._sim_selector.waited = 0.0
+        if self._sim_world.now() < stats.warmup:
+            return
+        stats.passes += 1
+        stats.busy.append(elapsed - idle)
+        stats.idle_time += idle
+        stats.elapsed += elapsed
+
+
+class _Console:
+    """
+    Serial console: counts what the firmware prints and keeps the tail, and
+    is its stdin, fed by `type`.
+    """
+
+    def __init__(self, world, echo=False):
+        self.world = world
+        self.lines = 0
+        self.bytes = 0
+        self.tail = collections.deque(maxlen=200)
+        self._echo = echo
+        self._partial = ""
+
+    def write(self, text):
+        self.bytes += len(text)
+        if self._echo:
+            sys.__stdout__.write(text)
+        text = self._partial + text
+        *lines, self._partial = text.split("\n")
+        self.lines += len(lines)
+        self.tail.extend(lines)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def type(self, text, at):
+        """Someone types ``text`` into the serial console at ``at``."""
+        self.world.at(at, lambda t: self.world.serial_in.extend(text.encode()))
+
+    def read(self, size=-1):
+        self.world.advance()
+        pending = self.world.serial_in
+        if size < 0:
+            size = len(pending)
+        text = pending[:size].decode()
+        del pending[:size]
+        return text
+
+
+class Report:
+    def __init__(self, sim, duration):
+        world = sim.world
+        stats = sim.stats
+        self.duration = duration - stats.warmup
+        self.passes = stats.passes
+        self.pass_busy = stats.busy
+        self.duty_cycle = 1 - stats.idle_time / stats.elapsed if stats.elapsed else 0.0
+        self.clock_arrivals = sim.midi.arrival_times(_CLOCK)
+        self.midi_backlog = sim.midi.max_backlog
+        self.midi_out = sim.midi.received
+        self.midi_writes = sim.midi.writes
+        self.midi_bytes_out = sim.midi.bytes_written
+        beats = [t for t in sim.midi.beat_times() if t >= stats.warmup]
+        self.beat_latencies = _beat_latencies(
+            beats, [t for t, level in sim.beat_led.history if level])
+        self.pixel_beat_latencies = _beat_latencies(
+            beats, [t for t, _ in sim.pixels.frames or ()])
+        self.display_refreshes = sum(d.refreshes for d in world.displays)
+        self.display_bytes = sum(d.refresh_bytes for d in world.displays)
+        self.pixel_shows = sum(s.shows for s in world.strips.values())
+        self.pixel_changed = sum(s.changed_frames for s in world.strips.values())
+        self.i2c_busy = {f"GP{bus.scl.number}/GP{bus.sda.number}": bus.busy_time
+                         for bus in world.i2c_buses.values()}
+        self.console_lines = sim.console.lines
+
+    def summary(self):
+        busy_ms = [b * 1000 for b in self.pass_busy]
+        latency_ms = [v * 1000 for v in self.beat_latencies]
+        pixel_ms = [v * 1000 for v in self.pixel_beat_latencies]
+        return {
+            "loop passes/s": self.passes / self.duration,
+            "pass time p50 ms": percentile(busy_ms, 0.5),
+            "pass time p99 ms": percentile(busy_ms, 0.99),
+            "pass time max ms": max(busy_ms, default=0.0),
+            "duty cycle %": self.duty_cycle * 100,
+            "midi clocks in": len(self.clock_arrivals),
+            "midi in backlog max ms": self.midi_backlog * 1000,
+            "beat led flashes": len(self.beat_latencies),
+            "beat led latency p50 ms": percentile(latency_ms, 0.5),
+            "beat led latency max ms": max(latency_ms, default=0.0),
+            "neopixel beat latency p50 ms": percentile(pixel_ms, 0.5),
+            "neopixel beat latency max ms": max(pixel_ms, default=0.0),
+            "midi messages out": len(self.midi_out),
+            "midi writes out": self.midi_writes,
+            "midi bytes out": self.midi_bytes_out,
+            "display refreshes": self.display_refreshes,
+            "display refreshes/s": self.display_refreshes / self.duration,
+            "display bytes": self.display_bytes,
+            "neopixel shows": self.pixel_shows,
+            "neopixel changed frames": self.pixel_changed,
+            "console lines": self.console_lines,
+            **{f"i2c {name} busy ms": busy * 1000 for name, busy in self.i2c_busy.items()},
+        }
+
+    def __str__(self):
+        return "\n".join(f"{key:>28}: {value:10.2f}" for key, value in self.summary().items())
+
+
+def _beat_latencies(beats, changes):
+    """Delay from each beat's first clock to the next change, if one comes before the next beat."""
+    latencies = []
+    i = 0
+    for n, beat in enumerate(beats):
+        while i < len(changes) and changes[i] < beat:
+            i += 1
+        if i < len(changes) and (n + 1 == len(beats) or changes[i] < beats[n + 1]):
+            latencies.append(changes[i] - beat)
+    return latencies
+
+
+class Simulator:
+    def __init__(self, seed=0, echo=False, uptime=0.0, nfc_slots=None, manual_clock=False):
+        world = self.world = _world.World(seed, uptime, manual_clock)
+        pin = world.pin
+        self.midi = world.midi = MidiHost(world)
+        nfc_bus = world.i2c_bus(pin(5), pin(4))
+        if nfc_slots is None:
+            self.nfc_switch = None
+            self.nfc_slots = [nfc_bus.attach(0x24, PN532(world, irq_pin=pin(17)))]
+        else:
+            self.nfc_switch = nfc_bus.attach(0x70, I2CSwitch())
+            self.nfc_slots = [self.nfc_switch.attach(n, 0x24, PN532(world, irq_pin=pin(NFC_IRQ_PINS[n])))
+                              for n in range(nfc_slots)]
+        self.nfc = self.nfc_slots[0]
+        self.oled = world.i2c_bus(pin(7), pin(6)).attach(0x3C, I2CSink())
+        self.encoder = world.encoders[13] = QuadratureEncoder(world, pin(13), pin(14))
+        self.pot = world.analog[28] = AnalogSource(world, pin(28))
+        self.beat_led = pin(25)
+        self.beat_led.traced = True
+        self.pixels = world.strips[16] = NeoPixelStrip(world, pin(16))
+        self.pixels.frames = []
+        self.stats = LoopStats()
+        self.console = _Console(world, echo)
+
+    def run(self, duration, script=None, warmup=0.0):
+        """
+        Boot ``script`` (``code.py`` by default) and let it run for ``duration`` seconds.
+
+        Loop statistics ignore the first ``warmup`` seconds, so the one-off
+        cost of booting does not hide the steady state.
+        """
+        self.stats.warmup = warmup
+        if script is None:
+            script = os.path.join(REPO_DIR, "code.py")
+        real_run = asyncio.run
+
+        def run_firmware(main):
+            with asyncio.Runner(loop_factory=lambda: _SimLoop(self.stats, self.world)) as runner:
+                return runner.run(self._supervise(main, duration))
+
+        with self.installed():
+            asyncio.run = run_firmware
+            try:
+                runpy.run_path(script, run_name="__main__")
+            finally:
+                asyncio.run = real_run
+        return Report(self, duration)
+
+    async def _supervise(self, main, duration):
+        firmware = asyncio.ensure_future(main)
+        done, _ = await asyncio.wait({firmware}, timeout=max(0.0, duration - self.world.now()))
+        firmware.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await firmware
+        if firmware in done:
+            firmware.result()
+
+    @contextlib.contextmanager
+    def installed(self):
+        """
+        Make the stand-in modules and the firmware sources importable.
+
+        ``run()`` uses this around ``code.py``; benchmarks use it directly to
+        drive a single firmware module. Everything imported inside is
+        discarded on exit so the next run starts from a fresh board.
+        """
+        saved_path = list(sys.path)
+        saved_modules = set(sys.modules)
+        sys.path.insert(0, MODULES_DIR)
+        sys.path.append(REPO_DIR)
+        saved_stdin = sys.stdin
+        _world.activate(self.world)
+        self.world.reset_clock()
+        sys.stdin = self.console
+        try:
+            with contextlib.redirect_stdout(self.console):
+                yield
+        finally:
+            sys.stdin = saved_stdin
+            sys.path[:] = saved_path
+            for name in set(sys.modules) - saved_modules:
+                if name.partition(".")[0] not in sys.stdlib_module_names:
+                    del sys.modules[name]
+            _world.activate(None)
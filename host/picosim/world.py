@@ -0,0 +1,275 @@
+"""
+Simulated board state shared by the stand-in CircuitPython modules.
+
+The stand-ins in ``picosim/modules`` never keep hardware state themselves:
+every pin level, bus device, encoder count and MIDI byte lives on the active
+`World`. Scripted inputs are queued on the world's event heap with a time in
+seconds since boot and are applied lazily whenever firmware code touches the
+simulated hardware, so what the firmware observes is exact even though
+nothing runs between its accesses.
+"""
+
+import heapq
+import random
+import time
+
+_current = None
+
+
+def current():
+    """The world the stand-in modules talk to."""
+    if _current is None:
+        raise RuntimeError("no simulated board is active")
+    return _current
+
+
+def activate(world):
+    global _current
+    _current = world
+
+
+class Pin:
+    """One RP2040 GPIO. Level is the logical value seen on the wire."""
+
+    def __init__(self, world, number):
+        self.world = world
+        self.number = number
+        self.name = f"GP{number}"
+        self.driven = None  # value written by firmware when used as an output
+        self.external = None  # value forced by a simulated device or person
+        self.pull = None
+        self.history = []  # (t, level) transitions, only recorded when traced
+        self.traced = False
+        self._listeners = []
+        self._level = True
+
+    def __repr__(self):
+        return f"board.{self.name}"
+
+    @property
+    def level(self):
+        return self._level
+
+    def add_listener(self, fn):
+        self._listeners.append(fn)
+
+    def remove_listener(self, fn):
+        if fn in self._listeners:
+            self._listeners.remove(fn)
+
+    def drive(self, value, t=None):
+        """Firmware writes the pin."""
+        self.driven = bool(value)
+        self._settle(t)
+
+    def release(self, t=None):
+        self.driven = None
+        self._settle(t)
+
+    def set_pull(self, value, t=None):
+        self.pull = value
+        self._settle(t)
+
+    def force(self, value, t=None):
+        """A simulated device or person sets the line. ``None`` lets it float."""
+        self.external = None if value is None else bool(value)
+        self._settle(t)
+
+    def _settle(self, t):
+        if self.driven is not None:
+            level = self.driven
+        elif self.external is not None:
+            level = self.external
+        elif self.pull is not None:
+            level = self.pull
+        else:
+            level = self._level
+        if level == self._level:
+            return
+        self._level = level
+        if t is None:
+            t = self.world.now()
+        if self.traced:
+            self.history.append((t, level))
+        for fn in tuple(self._listeners):
+            fn(level, t)
+
+
+class I2CBus:
+    """Devices hanging off one SCL/SDA pair, with wire time charged per byte."""
+
+    def __init__(self, world, scl, sda):
+        self.world = world
+        self.scl = scl
+        self.sda = sda
+        self.devices = {}
+        self.frequency = 100000
+        self.bytes_transferred = 0
+        self.busy_time = 0.0
+
+    def attach(self, address, device):
+        self.devices[address] = device
+        return device
+
+    def transfer_cost(self, nbytes):
+        # Address byte plus payload, 9 clocks each (8 data + ACK).
+        return (nbytes + 1) * 9 / self.frequency
+
+    def device(self, address):
+        device = self.devices.get(address)
+        if device is None:
+            # Behind an I2C switch with its channel open
+            for switch in self.devices.values():
+                if hasattr(switch, "route"):
+                    device = switch.route(address)
+                    if device is not None:
+                        break
+        return device
+
+    def write(self, address, data):
+        device = self.device(address)
+        self._charge(len(data))
+        if device is None:
+            raise OSError(19, "No such device")
+        device.i2c_write(bytes(data))
+
+    def read_into(self, address, buf):
+        device = self.device(address)
+        self._charge(len(buf))
+        if device is None:
+            raise OSError(19, "No such device")
+        device.i2c_read_into(buf)
+
+    def _charge(self, nbytes):
+        cost = self.transfer_cost(nbytes)
+        self.bytes_transferred += nbytes + 1
+        self.busy_time += cost
+        self.world.stall(cost)
+
+
+class World:
+    """Everything a running firmware can observe, plus the clock it runs on."""
+
+    NUM_PINS = 30
+
+    def __init__(self, seed=0, uptime=0.0, manual_clock=False):
+        self.random = random.Random(seed)
+        self.t0 = time.monotonic()
+        # With a manual clock time stands still, in whole microseconds, until
+        # `step` moves it on, however long the host takes in between
+        self._manual_us = 0 if manual_clock else None
+        # Seconds the board had been on when the run starts; only the tick
+        # counter sees it, scripted times still count from the start
+        self.uptime = uptime
+        self.pins = [Pin(self, n) for n in range(self.NUM_PINS)]
+        self.claimed = set()
+        self.i2c_buses = {}
+        self.encoders = {}
+        self.shift_registers = {}  # by data pin number
+        self.analog = {}
+        self.strips = {}
+        self.displays = []
+        self.midi = None
+        self.serial_in = bytearray()  # typed on the serial console, not yet read
+        self._events = []
+        self._seq = 0
+        self._background = []
+        self._in_background = False
+
+    # Clock
+
+    def now(self):
+        """Seconds since the simulated board powered on."""
+        if self._manual_us is not None:
+            return self._manual_us / 1e6
+        return time.monotonic() - self.t0
+
+    def now_ms(self):
+        """Whole milliseconds since the simulated board powered on."""
+        if self._manual_us is not None:
+            return self._manual_us // 1000
+        return int((time.monotonic() - self.t0) * 1000)
+
+    @property
+    def manual_clock(self):
+        return self._manual_us is not None
+
+    def reset_clock(self):
+        self.t0 = time.monotonic()
+        if self._manual_us is not None:
+            self._manual_us = 0
+
+    def step(self, seconds):
+        """Move a manual clock on by ``seconds`` and apply what fell due."""
+        self._manual_us += round(seconds * 1e6)
+        self.advance()
+
+    def stall(self, seconds):
+        """Block the CPU as a synchronous peripheral transfer would."""
+        if seconds <= 0:
+            return
+        if self._manual_us is not None:
+            self._manual_us += round(seconds * 1e6)
+            return
+        end = time.perf_counter() + seconds
+        if seconds > 0.002:
+            time.sleep(seconds - 0.001)
+        while time.perf_counter() < end:
+            pass
+
+    # Events
+
+    def at(self, t, fn):
+        """Run ``fn(t)`` once the simulated clock reaches ``t``."""
+        self._seq += 1
+        heapq.heappush(self._events, (t, self._seq, fn))
+
+    def next_event(self):
+        """When the next scripted event falls due, or None with none left."""
+        return self._events[0][0] if self._events else None
+
+    def advance(self):
+        """Apply every scripted event that is due, then background work."""
+        now = self.now()
+        events = self._events
+        while events and events[0][0] <= now:
+            t, _, fn = heapq.heappop(events)
+            fn(t)
+        if self._background and not self._in_background:
+            self._in_background = True
+            try:
+                for fn in self._background:
+                    fn(now)
+            finally:
+                self._in_background = False
+
+    def add_background(self, fn):
+        """Register work the CircuitPython supervisor would run between bytecodes."""
+        self._background.append(fn)
+
+    def remove_background(self, fn):
+        if fn in self._background:
+            self._background.remove(fn)
+
+    # Pins and buses
+
+    def pin(self, number):
+        return self.pins[number]
+
+    def claim(self, *pins):
+        for pin in pins:
+            if pin in self.claimed:
+                raise ValueError(f"{pin.name} in use")
+        for pin in pins:
+            self.claimed.add(pin)
+
+    def unclaim(self, *pins):
+        for pin in pins:
+            self.claimed.discard(pin)
+
+    def i2c_bus(self, scl, sda):
+        key = (scl.number, sda.number)
+        bus = self.i2c_buses.get(key)
+        if bus is None:
+            bus = self.i2c_buses[key] = I2CBus(self, scl, sda)
+        return bus
@@ -0,0 +1,242 @@
+"""
+Replay a trace recorded by the firmware's TraceRecorder through code.py on
+the simulated board and compare the MIDI it sends with the recorded MIDI.
+
+    python host/replay_trace.py record trace.txt --duration 12
+    python host/replay_trace.py replay trace.txt
+
+A trace is the serial console output of the "t" command: lines starting
+"trace:", anything else is ignored, so a whole terminal log can be given.
+``record`` makes one by playing the gig scenario on the simulator.
+
+Replaying puts the recorded inputs back where they came in: MIDI in bytes
+on the USB port, encoder deltas on the encoder, every ADC burst on the pot
+for the filter to read in the same order, cards on the reader just before
+their UID was read and off it the presence timeout before they were taken
+as gone. Recorded and replayed MIDI out are aligned message by message;
+timing is replayed minus recorded. A trace that never dropped a record is
+replayed from code.py's start; one that wrapped starts REPLAY_LEAD seconds
+after boot, from a firmware state that may not match the device's.
+
+The replay runs on the simulator's manual clock, so the same trace always
+gives the same MIDI out, however busy the host is; ``record`` uses it too.
+The timing column shows how far the replayed firmware's own schedule has
+drifted from the recording's, e.g. where a card read held the loop for
+longer. Any message that differs from the recorded is a failure: it exits 1.
+"""
+
+import argparse
+import difflib
+import sys
+
+from picosim import Simulator, percentile
+from picosim.devices import Card
+from picosim.scenarios import gig
+
+TRACE_MIDI_IN = 1
+TRACE_MIDI_OUT = 2
+TRACE_ENCODER = 3
+TRACE_ADC = 4
+TRACE_NFC_IRQ = 5
+TRACE_NFC_UID = 6
+TRACE_NFC_REMOVED = 7
+KINDS = {TRACE_MIDI_IN: "midi in", TRACE_MIDI_OUT: "midi out", TRACE_ENCODER: "encoder",
+         TRACE_ADC: "adc", TRACE_NFC_IRQ: "nfc irq", TRACE_NFC_UID: "nfc uid",
+         TRACE_NFC_REMOVED: "nfc removed"}
+
+_TICKS_MASK = (1 << 29) - 1
+# nfc_reader.PRESENCE_TIMEOUT_MS, in seconds
+PRESENCE_TIMEOUT = 0.5
+# effect_control.OVERSAMPLE
+ADC_OVERSAMPLE = 8
+REPLAY_LEAD = 2.0
+# Inputs were recorded when the firmware read them, so MIDI and cards go
+# back in a little before, as the port and the reader's listen command
+# would have delivered them. Each pot burst is handed to the filter's
+# next burst of reads whenever that comes. Encoder deltas are spread over
+# the time since the read before, up to ENCODER_SPREAD, so acceleration
+# sees the same spin.
+MIDI_IN_LEAD = 0.0005
+NFC_LEAD = 0.01
+ENCODER_SPREAD = 0.1
+# ADC controls in trace_id order
+POTS = ("pot",)
+
+
+class Trace:
+    def __init__(self, lines):
+        data = bytearray()
+        header = None
+        for line in lines:
+            line = line.strip()
+            if not line.startswith("trace: "):
+                continue
+            body = line[len("trace: "):]
+            if body.startswith("begin"):
+                header = [int(field) for field in body.split()[1:]]
+                data = bytearray()
+            elif body != "end":
+                data.extend(bytes.fromhex(body))
+        if header is None:
+            raise ValueError("no trace in the input")
+        self.created_tick, self.first_tick, self.count, self.dropped = header
+        self.records = list(_decode(bytes(data), self.first_tick))
+
+    def seconds(self, tick):
+        """Seconds after power-on of the replay that ``tick`` is replayed at."""
+        if self.dropped:
+            return REPLAY_LEAD + ((tick - self.first_tick) & _TICKS_MASK) / 1000
+        # The recorder was made as code.py started, which is power-on for the simulator
+        return ((tick - self.created_tick) & _TICKS_MASK) / 1000
+
+    def midi(self, kind):
+        """(seconds, message) of the MIDI recorded in direction ``kind``."""
+        return _messages((self.seconds(tick), payload) for tick, k, payload in self.records if k == kind)
+
+
+def _decode(data, first_tick):
+    i = 0
+    tick = first_tick
+    first = True
+    while i < len(data):
+        kind = data[i] >> 4
+        length = data[i] & 0x0F
+        i += 1
+        delta = 0
+        shift = 0
+        while True:
+            byte = data[i]
+            i += 1
+            delta |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                break
+        if not first:
+            tick = (tick + delta) & _TICKS_MASK
+        first = False
+        yield tick, kind, data[i:i + length]
+        i += length
+
+
+def _messages(chunks):
+    # Whole messages from a byte stream, timed by the chunk their status came in
+    messages = []
+    current = None
+    for t, chunk in chunks:
+        for byte in chunk:
+            if byte >= 0xF8:
+                messages.append((t, bytes((byte,))))
+            elif byte & 0x80 and byte != 0xF7:
+                current = bytearray((byte,))
+                messages.append((t, current))
+            elif current is not None:
+                current.append(byte)
+    return [(t, bytes(message)) for t, message in messages]
+
+
+def record(args):
+    sim = Simulator(seed=args.seed, manual_clock=True)
+    gig(sim, args.duration, bpm=args.bpm)
+    sim.console.type("t", at=args.duration - 1.5)
+    lines = []
+    console_write = sim.console.write
+
+    def write(text):
+        if text.startswith("trace:"):
+            lines.append(text)
+        return console_write(text)
+
+    sim.console.write = write
+    sim.run(args.duration)
+    with open(args.trace, "w") as f:
+        f.writelines(line if line.endswith("\n") else line + "\n" for line in lines)
+    print(f"{len(lines)} lines written to {args.trace}")
+
+
+def replay(args):
+    with open(args.trace) as f:
+        trace = Trace(f)
+    counts = {}
+    for _, kind, _ in trace.records:
+        counts[kind] = counts.get(kind, 0) + 1
+
+    sim = Simulator(seed=args.seed, manual_clock=True)
+    bursts = {name: [] for name in POTS}
+    card = None
+    last_read = 0.0
+    for tick, kind, payload in trace.records:
+        t = trace.seconds(tick)
+        if kind == TRACE_ENCODER:
+            delta = int.from_bytes(payload, "big")
+            spread = min(ENCODER_SPREAD, t - last_read)
+            sim.encoder.turn(delta - 0x10000 if delta & 0x8000 else delta, at=t - spread, duration=spread)
+            last_read = t
+        elif kind == TRACE_ADC:
+            bursts[POTS[payload[0]]].append((t, int.from_bytes(payload[1:], "big")))
+        elif kind == TRACE_NFC_UID:
+            if card is not None:
+                sim.nfc.remove(card, at=t - NFC_LEAD)
+            card = Card(bytes(payload))
+            sim.nfc.place(card, at=t - NFC_LEAD)
+        elif kind == TRACE_NFC_REMOVED and card is not None:
+            sim.nfc.remove(card, at=max(0.0, t - PRESENCE_TIMEOUT))
+            card = None
+    for name, readings in bursts.items():
+        if readings:
+            pot = getattr(sim, name)
+            pot.noise = 0.0
+            pot.hold(readings[0][1])
+            # Every burst is in a whole trace; one that wrapped starts with its first
+            pot.play([reading for _, reading in readings], ADC_OVERSAMPLE,
+                     at=readings[0][0] if trace.dropped else 0.0)
+    for t, message in trace.midi(TRACE_MIDI_IN):
+        sim.midi.send(message, at=t - MIDI_IN_LEAD)
+    expected = trace.midi(TRACE_MIDI_OUT)
+    end = trace.seconds(trace.records[-1][0]) + 1.0 if trace.records else 1.0
+    sim.run(end)
+
+    start = expected[0][0] - 0.1 if trace.dropped and expected else 0.0
+    replayed = [(t, bytes(message)) for t, message in sim.midi.received if t >= start]
+    matcher = difflib.SequenceMatcher(None, [m for _, m in expected], [m for _, m in replayed],
+                                      autojunk=False)
+    diffs = []
+    for block in matcher.get_matching_blocks():
+        for k in range(block.size):
+            diffs.append((replayed[block.b + k][0] - expected[block.a + k][0]) * 1000)
+
+    out = sys.stdout
+    print(f"trace: {len(trace.records)} records, {trace.dropped} dropped, "
+          f"{trace.seconds(trace.records[-1][0]) - trace.seconds(trace.records[0][0]):.1f} s", file=out)
+    for kind, name in KINDS.items():
+        print(f"{name:>28}: {counts.get(kind, 0):10d}", file=out)
+    print(f"{'midi out recorded':>28}: {len(expected):10d}", file=out)
+    print(f"{'midi out replayed':>28}: {len(replayed):10d}", file=out)
+    print(f"{'matching':>28}: {len(diffs):10d}", file=out)
+    print(f"{'timing diff p50 ms':>28}: {percentile(diffs, 0.5):10.2f}", file=out)
+    print(f"{'timing diff |max| ms':>28}: {max((abs(d) for d in diffs), default=0.0):10.2f}", file=out)
+    for tag, a0, a1, b0, b1 in matcher.get_opcodes():
+        if tag != "equal":
+            print(f"  {tag}: recorded {[m.hex() for _, m in expected[a0:a1]]} "
+                  f"replayed {[m.hex() for _, m in replayed[b0:b1]]}", file=out)
+    if len(diffs) != len(expected) or len(replayed) != len(expected):
+        print("FAILED: the replayed MIDI out differs from the recorded", file=out)
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+    rec = commands.add_parser("record", help="play the gig scenario and save the firmware's trace")
+    rec.add_argument("trace")
+    rec.add_argument("--duration", type=float, default=12.0)
+    rec.add_argument("--bpm", type=float, default=120.0)
+    rec.add_argument("--seed", type=int, default=0)
+    rep = commands.add_parser("replay", help="replay a saved trace and compare the MIDI out")
+    rep.add_argument("trace")
+    rep.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    record(args) if args.command == "record" else replay(args)
+
+
+if __name__ == "__main__":
+    main()
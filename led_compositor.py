@@ -0,0 +1,164 @@
+from adafruit_ticks import ticks_add, ticks_diff, ticks_ms
+
+from neopio import write_frame
+
+# Layer alpha is out of 256: 0 hidden, 256 opaque
+OPAQUE = 256
+
+
+class FrameLayer():
+    """The bottom layer: a whole frame of wire bytes, as led_frames makes them."""
+
+    def __init__(self) -> None:
+        self.frame = None
+        self.changed = False
+
+    def set(self, frame):
+        if frame is not self.frame:
+            self.frame = frame
+            self.changed = True
+
+    def blend(self, out):
+        if self.frame is None:
+            for i in range(len(out)):
+                out[i] = 0
+        else:
+            out[:] = self.frame
+
+
+class FlashLayer():
+    """
+    The whole strip brightened by ``level`` (0-255, wire units), fading
+    by ``decay`` every ``step_ms``.
+    """
+
+    def __init__(self, step_ms, decay) -> None:
+        self.step_ms = step_ms
+        self.decay = decay
+        self.level = 0
+        self.next_step = 0
+        self.changed = False
+
+    def flash(self, level):
+        self.level = level
+        self.next_step = ticks_add(ticks_ms(), self.step_ms)
+        self.changed = True
+
+    def update(self, now):
+        if self.level and ticks_diff(now, self.next_step) >= 0:
+            self.level = max(0, self.level - self.decay)
+            self.next_step = ticks_add(now, self.step_ms)
+            self.changed = True
+
+    def next_update(self):
+        return self.next_step if self.level else None
+
+    def blend(self, out):
+        level = self.level
+        if not level:
+            return
+        for i in range(len(out)):
+            value = out[i] + level
+            out[i] = value if value < 255 else 255
+
+
+class MeterLayer():
+    """
+    Bar graphs over runs of pixels, e.g. the FX levels.
+
+    Each bar covers ``count`` pixels from ``first`` in ``direction`` (1 or
+    -1) and is drawn in ``color``, three wire bytes. The bars stay up for
+    ``hold_ms`` after the last change and then fade out over ``fade_ms``,
+    a step every ``step_ms``.
+    """
+
+    def __init__(self, hold_ms, fade_ms, step_ms) -> None:
+        self.hold_ms = hold_ms
+        self.fade_ms = fade_ms
+        self.step_ms = step_ms
+        self.bars = []
+        self.alpha = 0
+        self.shown_until = 0
+        self.changed = False
+
+    def add_bar(self, first, count, direction, color, maximum=127):
+        # [first, count, direction, color, maximum, value]
+        self.bars.append([first, count, direction, color, maximum, 0])
+        return len(self.bars) - 1
+
+    def set(self, bar, value):
+        self.bars[bar][5] = value
+        self.alpha = OPAQUE
+        self.shown_until = ticks_add(ticks_ms(), self.hold_ms)
+        self.changed = True
+
+    def update(self, now):
+        if not self.alpha:
+            return
+        left = ticks_diff(self.shown_until, now) + self.fade_ms
+        alpha = OPAQUE if left >= self.fade_ms else max(0, left * OPAQUE // self.fade_ms)
+        if alpha != self.alpha:
+            self.alpha = alpha
+            self.changed = True
+
+    def next_update(self):
+        if not self.alpha:
+            return None
+        now = ticks_ms()
+        return self.shown_until if ticks_diff(self.shown_until, now) > 0 else ticks_add(now, self.step_ms)
+
+    def blend(self, out):
+        alpha = self.alpha
+        if not alpha:
+            return
+        for first, count, direction, color, maximum, value in self.bars:
+            # Lit length in 1/256ths of a pixel
+            lit = value * count * 256 // maximum
+            pixel = first
+            for _ in range(count):
+                if lit <= 0:
+                    break
+                a = alpha if lit >= 256 else alpha * lit >> 8
+                lit -= 256
+                j = pixel * 3
+                for k in range(3):
+                    out[j + k] += (color[k] - out[j + k]) * a >> 8
+                pixel += direction
+
+
+class LedCompositor():
+    """
+    Layers blended into one preallocated buffer, bottom first, and sent to
+    the strip in a single transmit.
+
+    Layers only change their own state and set ``changed``; `render` puts
+    the frame together and sends it when any of them did, so layers running
+    at different rates still cost one write per frame. All blending is
+    integer math on bytearrays.
+    """
+
+    def __init__(self, pixels) -> None:
+        self.pixels = pixels
+        self.out = bytearray(len(pixels) * 3)
+        self.layers = []
+        self.frames = 0
+
+    def add(self, layer):
+        self.layers.append(layer)
+        return layer
+
+    def render(self) -> bool:
+        changed = False
+        for layer in self.layers:
+            if layer.changed:
+                changed = True
+                layer.changed = False
+        if not changed:
+            return False
+        out = self.out
+        for layer in self.layers:
+            layer.blend(out)
+        # Frames are wire bytes already; skip pixelbuf and send them as they are
+        write_frame(self.pixels, out)
+        self.frames += 1
+        return True
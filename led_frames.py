@@ -0,0 +1,150 @@
+from adafruit_led_animation.animation.pulse import Pulse
+from adafruit_led_animation.animation.comet import Comet
+from adafruit_led_animation.sequence import AnimationSequence
+from adafruit_fancyled.adafruit_fancyled import gamma_adjust
+
+# Tables are sampled and played back at this fixed rate, the speed
+# LedManager's animations run at
+FRAME_TIME_MS = 50
+
+# Tempo-locked tables have one frame per sub-beat of MIDI clock over a 4/4 bar
+PPQN = 24
+SUB_BEAT_TICKS = 3
+STEPS_PER_BEAT = PPQN // SUB_BEAT_TICKS
+BEATS_PER_BAR = 4
+
+_gamma = None
+
+
+class _Canvas(list):
+    """Takes the place of the strip while an animation is drawn into a table."""
+
+    auto_write = False
+
+    def fill(self, color):
+        for i in range(len(self)):
+            self[i] = color
+
+    def show(self):
+        pass
+
+
+class _Frames():
+    def __init__(self, pixels) -> None:
+        self.frames = []
+        self.seen = {}
+        order = pixels.byteorder
+        self.offsets = (order.index("R"), order.index("G"), order.index("B"))
+        self.brightness = pixels.brightness
+
+    def add(self, canvas):
+        # The bytes the strip would send for canvas, brightness applied as pixelbuf does
+        frame = bytearray(len(canvas) * 3)
+        r, g, b = self.offsets
+        brightness = self.brightness
+        for i, color in enumerate(canvas):
+            if isinstance(color, int):
+                color = ((color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF)
+            frame[i * 3 + r] = int(color[0] * brightness)
+            frame[i * 3 + g] = int(color[1] * brightness)
+            frame[i * 3 + b] = int(color[2] * brightness)
+        frame = bytes(frame)
+        self.frames.append(self.seen.setdefault(frame, frame))
+
+
+def wire_color(color, pixels) -> bytes:
+    """``color`` as the three bytes ``pixels`` sends for it, brightness applied."""
+    frames = _Frames(pixels)
+    frames.add((color,))
+    return frames.frames[0]
+
+
+def build_frames(anim, pixels) -> tuple:
+    """
+    One cycle of ``anim`` as a tuple of frames, one every FRAME_TIME_MS.
+
+    Each frame is the bytes ``pixels`` (an RGB NeoPixel) would send for it,
+    so playing a frame is a single transmit. Identical frames are the same
+    object, so a player can tell an unchanged frame with ``is``. Pulse,
+    Comet and AnimationSequences of them are supported.
+    """
+    frames = _Frames(pixels)
+    _draw_frames(anim, _Canvas([0] * len(pixels)), frames)
+    return tuple(frames.frames)
+
+
+def _gamma_table():
+    # Built once, with fancyled's default gamma, so no frame needs float math
+    global _gamma
+    if _gamma is None:
+        _gamma = bytes(int(gamma_adjust(i / 255) * 255 + 0.5) for i in range(256))
+    return _gamma
+
+
+def _rgb(color):
+    if isinstance(color, int):
+        return ((color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF)
+    return color
+
+
+def _dimmed(color, level):
+    # ``color`` at ``level`` out of 255
+    return (color[0] * level // 255, color[1] * level // 255, color[2] * level // 255)
+
+
+def beat_frames(color, pixels) -> tuple:
+    """
+    One bar of ``color`` breathing in time, a frame per SUB_BEAT_TICKS clocks.
+
+    Levels go through a gamma table, frames are as `build_frames` makes them.
+    """
+    color = _rgb(color)
+    gamma = _gamma_table()
+    frames = _Frames(pixels)
+    canvas = _Canvas([0] * len(pixels))
+    steps = STEPS_PER_BEAT * BEATS_PER_BAR
+    half = steps // 2
+    for step in range(steps):
+        level = gamma[255 * (step if step <= half else steps - step) // half]
+        canvas.fill(_dimmed(color, level))
+        frames.add(canvas)
+    return tuple(frames.frames)
+
+
+def _draw_frames(anim, canvas, frames):
+    if isinstance(anim, AnimationSequence):
+        for member in anim._members:
+            if anim.auto_clear:
+                canvas.fill(0)
+            _draw_frames(member, canvas, frames)
+    elif isinstance(anim, Pulse):
+        # Same ramp as adafruit_led_animation's pulse_generator, through the
+        # gamma table beat_frames uses
+        color = _rgb(anim.color)
+        gamma = _gamma_table()
+        period = int(anim._period * 1000)
+        half_period = period // 2
+        for i in range(period // FRAME_TIME_MS):
+            pos = i * FRAME_TIME_MS
+            if pos > half_period:
+                pos = period - pos
+            canvas.fill(_dimmed(color, gamma[255 * pos // half_period]))
+            frames.add(canvas)
+    elif isinstance(anim, Comet):
+        # Comet.draw only depends on its own position, so let it draw the table
+        hold = max(1, round(anim._speed_ms / FRAME_TIME_MS))
+        pixel_object = anim.pixel_object
+        anim.pixel_object = canvas
+        anim.reset()
+        anim.cycle_complete = False
+        try:
+            while not anim.cycle_complete:
+                anim.draw()
+                for _ in range(hold):
+                    frames.add(canvas)
+        finally:
+            anim.pixel_object = pixel_object
+            anim.cycle_complete = False
+            anim.reset()
+    else:
+        raise ValueError("no frame table for " + type(anim).__name__)
@@ -4,9 +4,14 @@ from adafruit_led_animation.animation.pulse import Pulse
 from adafruit_led_animation.animation.comet import Comet
 from adafruit_led_animation.animation.rainbowchase import RainbowChase
 
+from adafruit_led_animation import monotonic_ms
+from adafruit_ticks import ticks_add, ticks_diff, ticks_ms
 from adafruit_led_animation.sequence import AnimationSequence
 
-from adafruit_led_animation.color import AMBER, GREEN, PURPLE
+from adafruit_led_animation.color import AMBER, AQUA, BLUE, CYAN, GREEN, MAGENTA, ORANGE, PINK, PURPLE, RED
+
+from led_compositor import FlashLayer, FrameLayer, LedCompositor, MeterLayer
+from led_frames import FRAME_TIME_MS, PPQN, SUB_BEAT_TICKS, beat_frames, build_frames, wire_color
 
 POSSIBLE_LED_STATES = {
     "IDLE": "IDLE",
@@ -14,8 +19,41 @@ POSSIBLE_LED_STATES = {
     "LIVE": "LIVE"
 }
 
+# Tempo-locked animations go back to their own timing when no clock
+# has come in for this long
+CLOCK_TIMEOUT_MS = 500
+
+# Beat flash, as a fraction of full brightness, fading out in FLASH_STEPS
+FLASH_DOWNBEAT = 1.0
+FLASH_BEAT = 0.6
+FLASH_STEP_MS = 25
+FLASH_STEPS = 6
+
+# FX level meters: FX1 fills the first half of the strip, FX2 the second
+# from the far end. Up for a while after a change, then faded out.
+METER_HOLD_MS = 1500
+METER_FADE_MS = 500
+METER_FX1_COLOR = CYAN
+METER_FX2_COLOR = MAGENTA
+
+# Colour of the LIVE animation, chosen per card by the preset's LED theme
+LED_THEMES = (GREEN, AQUA, BLUE, PINK, RED, ORANGE)
+
 
 class LedManager():
+    """
+    The NeoPixel strip's animation for each controller state.
+
+    With ``frame_tables`` (the default) an animation is not computed as it
+    plays: the first time a state is entered its animation is rendered
+    once into a table of ready-to-send frames (see led_frames), which is
+    then played back by index every FRAME_TIME_MS. A frame identical to the
+    one on the strip is not sent again. The frames are the bottom layer of
+    a compositor (see led_compositor), under a beat flash and the FX level
+    meters (`show_levels`); whatever changes, one frame is sent. Without,
+    the adafruit_led_animation objects animate themselves as usual.
+    """
+
     possible_states = [
         "IDLE",
         "TRANSITION",
@@ -23,7 +61,7 @@ class LedManager():
     ]
     state = "IDLE"
 
-    def __init__(self) -> None:
+    def __init__(self, frame_tables=True, tempo_locked=False) -> None:
         self.pixel_pin = board.GP16
         self.num_pixels = 10
 
@@ -52,9 +90,140 @@ class LedManager():
 
         self.anim_for_state = self.anim_idle
 
+        self.frame_tables = frame_tables
+        # Animation -> its frames, built on first use
+        self.tables = {}
+        self.frames = None
+        self.frames_start = 0
+
+        self.compositor = LedCompositor(self.pixels)
+        self.state_layer = self.compositor.add(FrameLayer())
+        full = int(255 * self.pixels.brightness)
+        self.flash_layer = self.compositor.add(FlashLayer(FLASH_STEP_MS, max(1, full // FLASH_STEPS)))
+        self.flash_levels = (int(full * FLASH_DOWNBEAT), int(full * FLASH_BEAT))
+        self.meter_layer = self.compositor.add(MeterLayer(METER_HOLD_MS, METER_FADE_MS, FRAME_TIME_MS))
+        half = self.num_pixels // 2
+        self.meter_fx1 = self.meter_layer.add_bar(0, half, 1, wire_color(METER_FX1_COLOR, self.pixels))
+        self.meter_fx2 = self.meter_layer.add_bar(self.num_pixels - 1, self.num_pixels - half, -1,
+                                                  wire_color(METER_FX2_COLOR, self.pixels))
+
+        self.tempo_locked = frame_tables and tempo_locked
+        self.tempo_tables = {}
+        self.tempo_frames = None
+        self.clock_step = -1
+        self.clock_timestamp = None
+
+        if frame_tables:
+            self._start_frames()
+
     def animate(self):
-        self.anim_for_state.animate()
+        if not self.frame_tables:
+            self.anim_for_state.animate()
+            return
+        now = ticks_ms()
+        if not self.clock_running():  # otherwise clock() sets the frame
+            frames = self.frames
+            elapsed = ticks_diff(now, self.frames_start)
+            cycle = len(frames) * FRAME_TIME_MS
+            if elapsed >= cycle:
+                # Moved up by whole cycles, so it never falls out of ticks_diff's range
+                self.frames_start = ticks_add(self.frames_start, elapsed - elapsed % cycle)
+                elapsed %= cycle
+            self.state_layer.set(frames[elapsed // FRAME_TIME_MS])
+        self.flash_layer.update(now)
+        self.meter_layer.update(now)
+        self.compositor.render()
+
+    def _start_frames(self):
+        anim = self.anim_for_state
+        frames = self.tables.get(anim)
+        if frames is None:
+            frames = self.tables[anim] = build_frames(anim, self.pixels)
+        self.frames = frames
+        self.frames_start = ticks_ms()
+        if self.tempo_locked:
+            frames = self.tempo_tables.get(anim)
+            if frames is None:
+                if anim is self.anim_transition:
+                    frames = self.frames
+                else:
+                    frames = beat_frames(anim.color, self.pixels)
+                self.tempo_tables[anim] = frames
+            self.tempo_frames = frames
+            if self.clock_running():
+                self._set_step(self.clock_step)
+                self.compositor.render()
+
+    def clock(self, position: int, on_beat=False):
+        """
+        Show the frame for clock tick ``position`` of the song (see
+        MidiMessenger.clock_position), with the beat flash if ``on_beat``.
+        """
+        if not self.frame_tables:
+            return
+        if self.tempo_locked:
+            self.clock_timestamp = ticks_ms()
+            step = position // SUB_BEAT_TICKS
+            if step != self.clock_step:
+                self.clock_step = step
+                self._set_step(step)
+        if on_beat:
+            self.flash_layer.flash(self.flash_levels[0 if position // PPQN % 4 == 0 else 1])
+        self.compositor.render()
+
+    def show_levels(self, fx1: int, fx2: int):
+        """Bring up the FX level meters; drawn on the next `animate`."""
+        if not self.frame_tables:
+            return
+        self.meter_layer.set(self.meter_fx1, fx1)
+        self.meter_layer.set(self.meter_fx2, fx2)
+
+    def stop_clock(self):
+        self.clock_timestamp = None
+        self.clock_step = -1
+
+    def clock_running(self) -> bool:
+        if self.clock_timestamp is None:
+            return False
+        if ticks_diff(ticks_ms(), self.clock_timestamp) < CLOCK_TIMEOUT_MS:
+            return True
+        # Forgotten, as a timestamp days old would come back round as recent
+        self.clock_timestamp = None
+        return False
+
+    def _set_step(self, step):
+        frames = self.tempo_frames
+        self.state_layer.set(frames[step % len(frames)])
+
+    def next_frame_ms(self) -> int:
+        """Milliseconds until the running animation draws its next frame."""
+        if self.frame_tables:
+            now = ticks_ms()
+            if self.clock_running():
+                # Only to notice the clock going away
+                due = ticks_add(self.clock_timestamp, CLOCK_TIMEOUT_MS)
+            else:
+                due = ticks_add(now, FRAME_TIME_MS - ticks_diff(now, self.frames_start) % FRAME_TIME_MS)
+            for layer in (self.flash_layer, self.meter_layer):
+                layer_due = layer.next_update()
+                if layer_due is not None and ticks_diff(layer_due, due) < 0:
+                    due = layer_due
+            return max(0, ticks_diff(due, now))
+        anim = self.anim_for_state
+        if isinstance(anim, AnimationSequence):
+            anim = anim.current_animation
+        # The library keeps its own times in monotonic_ms
+        return max(0, anim._next_update - monotonic_ms())
     
+    def set_theme(self, theme: int):
+        color = LED_THEMES[theme % len(LED_THEMES)]
+        if color != self.anim_live.color:
+            self.anim_live.color = color
+            self.tables.pop(self.anim_live, None)
+            self.tempo_tables.pop(self.anim_live, None)
+            if self.frame_tables and self.anim_for_state is self.anim_live:
+                self._start_frames()
+
     def transition(self, to_sate: str):
         self.state = to_sate
         self.anim_for_state.reset()
@@ -68,6 +237,9 @@ class LedManager():
         elif self.state is POSSIBLE_LED_STATES["LIVE"]:
             self.anim_for_state = self.anim_live
 
+        if self.frame_tables:
+            self._start_frames()
+
 
 
     
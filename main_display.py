@@ -2,19 +2,39 @@ import displayio
 import busio
 import board
 import terminalio
+from adafruit_ticks import ticks_ms, ticks_add, ticks_diff
 from adafruit_displayio_ssd1306 import SSD1306
 from adafruit_display_text import label
 
+# At most this many refreshes a second; each one holds the loop for the
+# whole I2C transfer of the changed rows
+MAX_REFRESH_RATE = 10
+# The SSD1306 is good for fast mode; busio defaults to 100 kHz
+I2C_FREQUENCY = 400000
+
+_AREAS = ("state", "fx_1", "fx_2")
+_PREFIXES = ("State: ", "FX 1: ", "FX 2: ")
+
 class MainDisplay():
-    def __init__(self):
+    """
+    The SSD1306 with one text line per area.
+
+    `set_text_area_value` only records the value; `refresh` redraws the
+    areas whose value actually changed and pushes them in one refresh, no
+    more than ``max_refresh_rate`` times a second. Auto refresh is off, so
+    nothing goes over the bus between calls to `refresh`.
+    """
+
+    def __init__(self, max_refresh_rate=MAX_REFRESH_RATE):
         displayio.release_displays()
 
         screen_width = 128
         screen_height = 64
 
-        i2c_1 = busio.I2C(board.GP7, board.GP6)
+        i2c_1 = busio.I2C(board.GP7, board.GP6, frequency=I2C_FREQUENCY)
         display_bus = displayio.I2CDisplay(i2c_1, device_address=0x3C)
         display = SSD1306(display_bus, width=screen_width, height=screen_height)
+        self.display = display
 
         # This is necessary to avoid debug messages being showin on the display.
         display.root_group.hidden = True
@@ -35,10 +55,56 @@ class MainDisplay():
         self.fx_2_area.text = "FX 2: ---"
         splash.append(self.fx_2_area)
 
+        display.refresh()
+        display.auto_refresh = False
+
+        self.labels = (self.state_area, self.fx_1_area, self.fx_2_area)
+        # None: nothing to show / not shown yet
+        self.shown = [None] * len(_AREAS)
+        self.pending = [None] * len(_AREAS)
+        self.frame_ms = 1000 // max_refresh_rate
+        self.last_refresh = ticks_add(ticks_ms(), -self.frame_ms)
+        self.refreshes = 0
+        self.updates = 0
+        # Longest a refresh has held the loop, in ms
+        self.refresh_duration = 0
+
     def set_text_area_value(self, area, value):
-        if area == "state":
-            self.state_area.text = f"State: {value}"
-        if area == "fx_1":
-            self.fx_1_area.text = f"FX 1: {value}"
-        if area == "fx_2":
-            self.fx_2_area.text = f"FX 2: {value}"
\ No newline at end of file
+        i = _AREAS.index(area)
+        self.updates += 1
+        if value == self.shown[i]:
+            self.pending[i] = None  # back to what is on screen
+        else:
+            self.pending[i] = value
+
+    def has_pending(self) -> bool:
+        for value in self.pending:
+            if value is not None:
+                return True
+        return False
+
+    def next_refresh_tick(self):
+        """The ``adafruit_ticks`` ms the next refresh may go out at."""
+        return ticks_add(self.last_refresh, self.frame_ms)
+
+    def refresh(self):
+        """Redraw the changed areas in a single refresh; False if there was nothing to draw."""
+        changed = False
+        for i in range(len(_AREAS)):
+            value = self.pending[i]
+            if value is None:
+                continue
+            self.pending[i] = None
+            self.shown[i] = value
+            self.labels[i].text = f"{_PREFIXES[i]}{value}"
+            changed = True
+        if not changed:
+            return False
+        start = ticks_ms()
+        self.display.refresh()
+        self.last_refresh = ticks_ms()
+        took = ticks_diff(self.last_refresh, start)
+        if took > self.refresh_duration:
+            self.refresh_duration = took
+        self.refreshes += 1
+        return True
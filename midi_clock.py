@@ -0,0 +1,148 @@
+from adafruit_ticks import ticks_ms, ticks_add, ticks_diff
+
+from midi_messenger import MIDI_CLOCK, MIDI_START, MIDI_STOP, MIDI_PPQN
+
+DEFAULT_BPM = 120
+MIN_BPM = 20
+MAX_BPM = 300
+
+# Milliseconds per clock tick are 60000 / (bpm * MIDI_PPQN); tempo is kept
+# in tenths of a BPM so that is TICK_MS_TENTHS / tenths, in integers.
+TICK_MS_TENTHS = 600000 // MIDI_PPQN
+
+# Ticks that fell due while the loop was held up are sent back to back,
+# this many per write, until the clock has caught up. Ticks more than
+# MAX_BEHIND late are dropped instead; the grid stays where it was.
+MAX_CATCH_UP = MIDI_PPQN // 4
+MAX_BEHIND = MIDI_PPQN
+
+# Console commands: start, stop, and tempo as "<bpm>b"
+COMMAND_CLOCK_START = "s"
+COMMAND_CLOCK_STOP = "x"
+COMMAND_CLOCK_TEMPO = "b"
+
+
+class MidiClock():
+    """
+    MIDI clock master: 24 PPQN timing clock and transport out at ``bpm``.
+
+    Nothing goes out until `start`; from then on clock runs continuously,
+    also while stopped, so followers keep the tempo. Start and Stop are
+    sent right ahead of the next tick.
+
+    Each tick has a deadline in ``adafruit_ticks`` milliseconds, and the
+    next deadline is this one plus the tick length, never the time the
+    tick was actually sent. The tick length is rarely a whole number of
+    milliseconds; its remainder is carried from tick to tick, Bresenham
+    style, so every deadline is the exact grid rounded down to the
+    millisecond and no error builds up however long the clock runs. All
+    of it is small-int arithmetic that does not allocate.
+
+    `send_due` sends whatever is due and `ms_to_next` says how long until
+    the next deadline, for the task driving it to sleep. `playing`,
+    `transport_changed`, `clock_position` and `on_beat` mean what they do
+    on MidiMessenger, for the ticks sent by the last `send_due`.
+    """
+
+    def __init__(self, midi_messenger, bpm=DEFAULT_BPM) -> None:
+        self.midi_messenger = midi_messenger
+        self.out_buf = bytearray(MAX_CATCH_UP + 1)
+        self.running = False
+        self.playing = None
+        self.transport_changed = False
+        self.clock_position = -1
+        self.on_beat = False
+        self.pending_transport = 0
+
+        self.next_tick = 0
+        self.remainder = 0
+        self.set_bpm(bpm)
+
+        self.ticks_sent = 0
+        self.ticks_dropped = 0
+        self.late_ms_max = 0
+
+    def set_bpm(self, bpm):
+        """Change the tempo from the next tick on."""
+        if not MIN_BPM <= bpm <= MAX_BPM:
+            raise ValueError("Out of range")
+        self.bpm = bpm
+        tenths = int(bpm * 10 + 0.5)
+        self.tenths = tenths
+        self.tick_ms = TICK_MS_TENTHS // tenths
+        self.tick_remainder = TICK_MS_TENTHS % tenths
+        self.remainder = 0
+
+    def start(self):
+        """Start clock if it is not running yet, and send Start before the next tick."""
+        if not self.running:
+            self.running = True
+            self.next_tick = ticks_ms()
+            self.remainder = 0
+        self.pending_transport = MIDI_START
+
+    def stop(self):
+        """Send Stop before the next tick; clock keeps running."""
+        if self.running:
+            self.pending_transport = MIDI_STOP
+
+    def ms_to_next(self) -> int:
+        """Milliseconds until the next tick is due, 0 if it is; -1 before `start`."""
+        if not self.running:
+            return -1
+        wait = ticks_diff(self.next_tick, ticks_ms())
+        return wait if wait > 0 else 0
+
+    def send_due(self) -> int:
+        """Send every tick whose deadline has passed in one write. Returns how many."""
+        self.transport_changed = False
+        self.on_beat = False
+        if not self.running:
+            return 0
+        now = ticks_ms()
+        late = ticks_diff(now, self.next_tick)
+        if late < 0:
+            return 0
+        if late > self.late_ms_max:
+            self.late_ms_max = late
+
+        buf = self.out_buf
+        n = 0
+        if self.pending_transport:
+            buf[0] = self.pending_transport
+            n = 1
+            if self.pending_transport == MIDI_START:
+                self.clock_position = -1
+                self.playing = True
+            else:
+                self.playing = False
+            self.pending_transport = 0
+            self.transport_changed = True
+
+        if late >= MAX_BEHIND * self.tick_ms:
+            while ticks_diff(now, self.next_tick) >= MAX_CATCH_UP * self.tick_ms:
+                self._advance()
+                self.ticks_dropped += 1
+
+        ticks = 0
+        while ticks < MAX_CATCH_UP and ticks_diff(now, self.next_tick) >= 0:
+            buf[n] = MIDI_CLOCK
+            n += 1
+            ticks += 1
+            if self.playing:
+                self.clock_position += 1
+                if self.clock_position % MIDI_PPQN == 0:
+                    self.on_beat = True
+            self._advance()
+
+        self.midi_messenger.send_realtime(buf, n)
+        self.ticks_sent += ticks
+        return ticks
+
+    def _advance(self):
+        step = self.tick_ms
+        self.remainder += self.tick_remainder
+        if self.remainder >= self.tenths:
+            self.remainder -= self.tenths
+            step += 1
+        self.next_tick = ticks_add(self.next_tick, step)
@@ -1,7 +1,7 @@
 import usb_midi
+from adafruit_ticks import ticks_ms, ticks_diff
 from adafruit_midi import MIDI
-from adafruit_midi.control_change import ControlChange
-from adafruit_midi.timing_clock import TimingClock
+from adafruit_midi.midi_message import MIDIMessage
 
 
 CONTROL_ON_OFF = 1
@@ -11,29 +11,305 @@ CONTROL_FX2 = 3
 VALUE_ON = 1
 VALUE_OFF = 0
 
+# System realtime status bytes. They are one byte long and may appear
+# anywhere in the stream, even in the middle of another message.
+MIDI_CLOCK = 0xF8
+MIDI_START = 0xFA
+MIDI_CONTINUE = 0xFB
+MIDI_STOP = 0xFC
+MIDI_REALTIME = 0xF8
+# Clock ticks per quarter note
+MIDI_PPQN = 24
+
+# Default ceiling on outgoing control changes per second, and how many may
+# go out back to back after a quiet spell.
+MAX_MESSAGE_RATE = 100
+MAX_MESSAGE_BURST = 4
+
+MIDI_CONTROL_CHANGE = 0xB0
+MIDI_PROGRAM_CHANGE = 0xC0
+MIDI_SYSEX = 0xF0
+MIDI_SYSEX_END = 0xF7
+
+# Room for 16 three-byte messages; a longer burst is written in pieces.
+OUT_BUFFER_SIZE = 48
+
+# One full-speed USB packet
+IN_BUFFER_SIZE = 64
+# Upper bound on bytes handled per receive_realtime() call, so a flood of
+# input cannot hold the CPU away from the other tasks.
+MAX_BYTES_PER_RECEIVE = 256
+
+
 class MidiMessenger():
-    def __init__(self) -> None:
+    """
+    USB MIDI in and out for the controller.
+
+    Outgoing control changes are queued per channel and controller number
+    and the last queued value wins, so a fast encoder spin or a jittery pot
+    sends the newest value instead of a backlog of stale ones. Each goes
+    out on the channel it was queued for, `out_channel` unless given.
+    `send_pending` writes the queue out at no more than ``max_rate``
+    messages per second (None for no limit). Instrument on/off goes first,
+    on every channel and control it was queued for, even when the budget
+    is spent. Program changes are not coalesced or limited and go out
+    ahead of the queue on the next `send_pending`.
+
+    Messages are encoded straight into a reusable buffer and each
+    `send_pending` call makes a single write. With ``running_status`` the
+    status byte is left out when it repeats within that write, which suits
+    byte-stream outputs. It is off by default because USB-MIDI carries every
+    message in its own event packet, and the TinyUSB stack under
+    ``usb_midi`` does not expand running status.
+    """
+
+    def __init__(self, on_message=None, max_rate=MAX_MESSAGE_RATE, max_burst=MAX_MESSAGE_BURST,
+                 running_status=False) -> None:
+        self.midi_in = usb_midi.ports[0]
+        self.midi_out = usb_midi.ports[1]
         self.midi = MIDI(
-            midi_in=usb_midi.ports[0],
+            midi_in=self.midi_in,
             in_channel=0,
-            midi_out=usb_midi.ports[1],
+            midi_out=self.midi_out,
             out_channel= 0
         )
-    
-    def send_instrument_on(self):
-        self.midi.send(ControlChange(CONTROL_ON_OFF, VALUE_ON))
+        self.out_channel = 0
+        # Control number of instrument on/off, the card's preset can change it
+        self.on_off_control = CONTROL_ON_OFF
+
+        # Called with each parsed non-realtime message. When None, those
+        # bytes are dropped without being parsed.
+        self.on_message = on_message
+
+        self.in_buf = bytearray(IN_BUFFER_SIZE)
+        self.message_bytes = bytearray()
+
+        self.playing = None
+        self.transport_changed = False
+        self.clock_ticks = 0
+        # Tick of the song the last clock was, counted from Start (-1 before
+        # its first clock) and held while stopped; free running until a
+        # Start is seen. clock_position // MIDI_PPQN is the beat.
+        self.clock_position = -1
+        self.on_beat = False
+
+        self.max_rate = max_rate
+        self.max_burst = max_burst
+        self.tokens = max_burst
+        self.tokens_timestamp = ticks_ms()
+        # Queued values by channel << 7 | control, and the keys among them
+        # queued as instrument on/off, in the order they were queued
+        self.pending_cc = {}
+        self.pending_on_off = []
+        self.messages_sent = 0
+        self.messages_coalesced = 0
+
+        self.running_status = running_status
+        self.out_buf = bytearray(OUT_BUFFER_SIZE)
+        self.out_len = 0
+        self.out_status = 0
+        self.bytes_sent = 0
+
+        # A TraceRecorder, when MIDI in and out should be traced
+        self.trace = None
+
+    def send_instrument_on(self, control=None, channel=None):
+        """
+        Instrument on, on ``control`` if given, else on `on_off_control`,
+        and on ``channel`` if given, else on `out_channel`.
+        """
+        self._queue_on_off(control, channel, VALUE_ON)
 
-    def send_instrument_off(self):
-        self.midi.send(ControlChange(CONTROL_ON_OFF, VALUE_OFF))
+    def send_instrument_off(self, control=None, channel=None):
+        self._queue_on_off(control, channel, VALUE_OFF)
+
+    def _queue_on_off(self, control, channel, value):
+        if control is None:
+            control = self.on_off_control
+        if channel is None:
+            channel = self.out_channel
+        self.queue_control_change(control, value, channel)
+        key = channel << 7 | control
+        if key not in self.pending_on_off:
+            self.pending_on_off.append(key)
+
+    def send_program_change(self, program: int):
+        if not 0 <= program <= 127:
+            raise ValueError("Out of range")
+        if self.out_len > OUT_BUFFER_SIZE - 2:
+            self._flush_out()
+        status = MIDI_PROGRAM_CHANGE | self.out_channel
+        buf = self.out_buf
+        n = self.out_len
+        if not self.running_status or status != self.out_status:
+            buf[n] = status
+            n += 1
+            self.out_status = status
+        buf[n] = program
+        self.out_len = n + 1
+        self.messages_sent += 1
+
+    def send_sysex(self, data):
+        """
+        Write a system exclusive message straight away, ``data`` being the
+        7-bit bytes between F0 and F7. Anything queued in the out buffer
+        goes first.
+        """
+        self._flush_out()
+        message = bytearray((MIDI_SYSEX,))
+        message.extend(data)
+        message.append(MIDI_SYSEX_END)
+        self.midi_out.write(message)
+        self.bytes_sent += len(message)
+        if self.trace is not None:
+            self.trace.midi_out(message, len(message))
+
+    def send_realtime(self, data, length):
+        """
+        Write ``length`` system realtime bytes from ``data`` straight away.
+        They may go anywhere in the stream, so whatever is queued stays
+        queued.
+        """
+        self.midi_out.write(data, length)
+        self.bytes_sent += length
+        if self.trace is not None:
+            self.trace.midi_out(data, length)
 
     def send_instrument_fx1(self, value: int):
-        self.midi.send(ControlChange(CONTROL_FX1, value))
-    
+        self.queue_control_change(CONTROL_FX1, value)
+
     def send_instrument_fx2(self, value: int):
-        self.midi.send(ControlChange(CONTROL_FX2, value))
+        self.queue_control_change(CONTROL_FX2, value)
+
+    def queue_control_change(self, control: int, value: int, channel=None):
+        if channel is None:
+            channel = self.out_channel
+        if not 0 <= control <= 127 or not 0 <= value <= 127 or not 0 <= channel <= 15:
+            raise ValueError("Out of range")
+        key = channel << 7 | control
+        if key in self.pending_cc:
+            self.messages_coalesced += 1
+        self.pending_cc[key] = value
+
+    def send_pending(self) -> int:
+        """Write queued control changes the rate limit allows. Returns how many were sent."""
+        if not self.pending_cc:
+            self._flush_out()
+            return 0
+
+        if self.max_rate is not None:
+            now = ticks_ms()
+            elapsed = ticks_diff(now, self.tokens_timestamp)
+            self.tokens = min(self.max_burst, self.tokens + elapsed * self.max_rate / 1000)
+            self.tokens_timestamp = now
+
+        sent = 0
+        if self.pending_on_off:
+            # Instrument on/off goes out even when the budget is spent.
+            for key in self.pending_on_off:
+                self._send_control_change(key, self.pending_cc.pop(key))
+                sent += 1
+            self.pending_on_off.clear()
+        while self.pending_cc and (self.max_rate is None or self.tokens >= 1):
+            key = next(iter(self.pending_cc))
+            self._send_control_change(key, self.pending_cc.pop(key))
+            sent += 1
+        self._flush_out()
+        return sent
+
+    def _send_control_change(self, key, value):
+        if self.out_len > OUT_BUFFER_SIZE - 3:
+            self._flush_out()
+        buf = self.out_buf
+        n = self.out_len
+        status = MIDI_CONTROL_CHANGE | key >> 7
+        if not self.running_status or status != self.out_status:
+            buf[n] = status
+            n += 1
+            self.out_status = status
+        buf[n] = key & 0x7F
+        buf[n + 1] = value
+        self.out_len = n + 2
+        self.messages_sent += 1
+        if self.max_rate is not None:
+            self.tokens -= 1
+
+    def _flush_out(self):
+        if self.out_len:
+            self.midi_out.write(self.out_buf, self.out_len)
+            if self.trace is not None:
+                self.trace.midi_out(self.out_buf, self.out_len)
+            self.bytes_sent += self.out_len
+            self.out_len = 0
+            # Each write starts with a full status byte.
+            self.out_status = 0
+
+    def receive_realtime(self) -> int:
+        """
+        Drain everything waiting on the USB MIDI input in one pass.
+
+        Clock, start, continue and stop are handled straight from the raw
+        bytes without creating message objects. `playing` tracks the
+        transport and `transport_changed` is set when this call saw a start,
+        continue or stop. `clock_position` follows the clock while playing,
+        and `on_beat` is set when this call saw the first tick of a beat.
+        Other messages go through adafruit_midi parsing only if `on_message`
+        is set.
+
+        Returns the number of clock ticks received.
+        """
+        buf = self.in_buf
+        ticks = 0
+        position = self.clock_position
+        on_beat = False
+        self.transport_changed = False
+        received = 0
+        while received < MAX_BYTES_PER_RECEIVE:
+            count = self.midi_in.readinto(buf)
+            if not count:
+                break
+            received += count
+            if self.trace is not None:
+                self.trace.midi_in(buf, count)
+            for i in range(count):
+                byte = buf[i]
+                if byte == MIDI_CLOCK:
+                    ticks += 1
+                    if self.playing is not False:
+                        position += 1
+                        if position % MIDI_PPQN == 0:
+                            on_beat = True
+                elif byte >= MIDI_REALTIME:
+                    if byte == MIDI_START or byte == MIDI_CONTINUE:
+                        if byte == MIDI_START:
+                            position = -1
+                        self.playing = True
+                        self.transport_changed = True
+                    elif byte == MIDI_STOP:
+                        self.playing = False
+                        self.transport_changed = True
+                elif self.on_message is not None:
+                    self.message_bytes.append(byte)
+            if count < len(buf):
+                break
+
+        if self.message_bytes:
+            self._dispatch_messages()
+
+        self.clock_ticks += ticks
+        self.clock_position = position
+        self.on_beat = on_beat
+        return ticks
 
-    def is_timing_clock_event(self, midi_message):
-        if isinstance(midi_message, TimingClock):
-            return True
-        else:
-            return False
\ No newline at end of file
+    def _dispatch_messages(self):
+        while self.message_bytes:
+            msg, end, skipped = MIDIMessage.from_message_bytes(self.message_bytes, self.midi.in_channel)
+            if end == 0:
+                break  # incomplete, wait for the rest
+            del self.message_bytes[:end]
+            if msg is not None:
+                self.on_message(msg)
+        if len(self.message_bytes) > IN_BUFFER_SIZE:
+            # Most likely a long SysEx, which is not handled: drop it rather
+            # than let the buffer grow.
+            self.message_bytes = bytearray()
@@ -0,0 +1,177 @@
+from card_database import Preset, uid_key
+
+# A preset written on the card itself: an NDEF message in the NTAG user
+# memory (from page 4) with a short NFC Forum external type record
+#
+#   type     "nfcmusic:preset"
+#   payload  version (1), channel 0-15, on/off control, program, FX1, FX2,
+#            LED theme; program/FX use card_database.NO_PROGRAM/KEEP_VALUE
+#
+# Any NDEF writer app that can make a custom external record can write it.
+PRESET_TYPE = b"nfcmusic:preset"
+PRESET_VERSION = 1
+PRESET_PAYLOAD_LENGTH = 7
+
+# Bytes of NDEF area read at most, four 16 byte NTAG reads
+MAX_NDEF_LENGTH = 64
+# Cards remembered, least recently placed forgotten first
+CACHE_SIZE = 16
+
+_TLV_NULL = 0x00
+_TLV_NDEF = 0x03
+_TLV_TERMINATOR = 0xFE
+_TNF_EXTERNAL = 0x04
+_FLAG_ME = 0x40
+_FLAG_SR = 0x10
+_FLAG_IL = 0x08
+
+
+def ndef_end(data, length) -> int:
+    """
+    Where the NDEF message TLV in ``data`` (read from page 4) ends.
+
+    Returns the offset just past it, 0 if there is no NDEF message within
+    MAX_NDEF_LENGTH, or -1 if more bytes are needed to tell.
+    """
+    i = 0
+    while i < length:
+        tag = data[i]
+        if tag == _TLV_NULL:
+            i += 1
+            continue
+        if tag == _TLV_TERMINATOR:
+            return 0
+        if i + 1 >= length:
+            return -1
+        size = data[i + 1]
+        if size == 0xFF:
+            return 0  # three byte length, far too long for a preset
+        end = i + 2 + size
+        if end > MAX_NDEF_LENGTH:
+            return 0
+        if tag == _TLV_NDEF:
+            return end if end <= length else -1
+        i = end
+    return -1
+
+
+def parse_preset(data, length, preset: Preset) -> bool:
+    """Fill ``preset`` from the first preset record in ``data``; False if there is none."""
+    end = ndef_end(data, length)
+    if end <= 0:
+        return False
+    i = _message_start(data)
+    while i < end:
+        header = data[i]
+        if not header & _FLAG_SR or i + 3 > end:
+            return False  # long records are never presets
+        type_length = data[i + 1]
+        payload_length = data[i + 2]
+        i += 3
+        id_length = 0
+        if header & _FLAG_IL:
+            id_length = data[i]
+            i += 1
+        type_start = i
+        payload_start = type_start + type_length + id_length
+        if payload_start + payload_length > end:
+            return False
+        if (header & 0x07 == _TNF_EXTERNAL and payload_length >= PRESET_PAYLOAD_LENGTH
+                and data[payload_start] == PRESET_VERSION
+                and type_length == len(PRESET_TYPE)
+                and _same(data, type_start, PRESET_TYPE, type_length)):
+            preset.channel = data[payload_start + 1] & 0x0F
+            preset.on_off_cc = data[payload_start + 2] & 0x7F
+            preset.program = data[payload_start + 3]
+            preset.fx1 = data[payload_start + 4]
+            preset.fx2 = data[payload_start + 5]
+            preset.led_theme = data[payload_start + 6]
+            return True
+        if header & _FLAG_ME:
+            return False
+        i = payload_start + payload_length
+    return False
+
+
+def _message_start(data):
+    # Only called once ndef_end has found the NDEF TLV
+    i = 0
+    while data[i] != _TLV_NDEF:
+        i += 1 if data[i] == _TLV_NULL else 2 + data[i + 1]
+    return i + 2
+
+
+def _same(data, start, expected, length):
+    for i in range(length):
+        if data[start + i] != expected[i]:
+            return False
+    return True
+
+
+class CachedCard():
+    def __init__(self) -> None:
+        self.key = -1
+        self.uid = bytearray(10)
+        self.uid_length = 0
+        self.ndef = bytearray(MAX_NDEF_LENGTH)
+        self.ndef_length = 0
+        self.preset = Preset()
+        self.has_preset = False
+        self.used = 0
+
+    def matches(self, ndef, length) -> bool:
+        return length == self.ndef_length and _same(self.ndef, 0, ndef, length)
+
+
+class PresetCache():
+    """
+    What was last read off the cards that were on the reader recently.
+
+    A fixed set of ``size`` entries is allocated up front and the least
+    recently placed card is overwritten, so the cache never grows and
+    using it allocates nothing. Entries keep the raw NDEF bytes so a
+    re-read can be compared against them.
+    """
+
+    def __init__(self, size=CACHE_SIZE) -> None:
+        self.entries = [CachedCard() for _ in range(size)]
+        self.clock = 0
+        self.hits = 0
+        self.misses = 0
+
+    def find(self, uid, length):
+        entry = self.peek(uid, length)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.clock += 1
+        entry.used = self.clock
+        return entry
+
+    def peek(self, uid, length):
+        """The entry for a UID without counting it as a use, None if absent."""
+        key = uid_key(uid, length)
+        for entry in self.entries:
+            if entry.key == key and entry.uid_length == length and _same(entry.uid, 0, uid, length):
+                return entry
+        return None
+
+    def store(self, uid, length, ndef, ndef_length) -> CachedCard:
+        entry = self.peek(uid, length)
+        if entry is None:
+            entry = self.entries[0]
+            for candidate in self.entries:
+                if candidate.used < entry.used:
+                    entry = candidate
+            entry.key = uid_key(uid, length)
+            for i in range(length):
+                entry.uid[i] = uid[i]
+            entry.uid_length = length
+        for i in range(ndef_length):
+            entry.ndef[i] = ndef[i]
+        entry.ndef_length = ndef_length
+        entry.has_preset = parse_preset(ndef, ndef_length, entry.preset)
+        self.clock += 1
+        entry.used = self.clock
+        return entry
@@ -14,7 +14,6 @@
 """
 
 import adafruit_pioasm
-import bitops
 import microcontroller
 import adafruit_pixelbuf
 import rp2pio
@@ -61,6 +60,63 @@ RGBW = "RGBW"
 GRBW = "GRBW"
 """Green Red Blue White"""
 
+def bit_transpose(input, output, width=8):
+    """
+    Pure-Python `bitops.bit_transpose`, for boards built without ``bitops``.
+
+    ``input`` holds ``width`` equal runs, one per strand. Output byte
+    ``8 * i + b`` gathers bit ``7 - b`` of byte ``i`` of every run, strand
+    ``s`` in bit ``7 - s``; bits past ``width`` are zero.
+    """
+    stride = len(input) // width
+    for i in range(stride):
+        j = 8 * i
+        for b in range(8):
+            bit = 0x80 >> b
+            byte = 0
+            for s in range(width):
+                if input[i + s * stride] & bit:
+                    byte |= 0x80 >> s
+            output[j + b] = byte
+    return output
+
+
+def _transpose_strand(input, output, width, strand):
+    # Rewrite just strand's bit plane of output, as bit_transpose would
+    stride = len(input) // width
+    mask = 0x80 >> strand
+    clear = 0xFF ^ mask
+    base = strand * stride
+    for i in range(stride):
+        value = input[base + i]
+        j = 8 * i
+        for b in range(8):
+            if value & (0x80 >> b):
+                output[j + b] |= mask
+            else:
+                output[j + b] &= clear
+
+
+def write_frame(pixels, buffer):
+    """
+    Send ``buffer`` to ``pixels`` as it is, without going through the pixel buffer.
+
+    ``buffer`` holds the strip's wire bytes, in its byte order with brightness
+    applied, as `show` would send them. Any ``adafruit_pixelbuf`` strip will
+    do, NeoPIO or ``neopixel``; this is the one place their ``_transmit`` is
+    called from outside, and anything without it raises TypeError.
+    """
+    transmit = getattr(pixels, "_transmit", None)
+    if transmit is None:
+        raise TypeError("pixels cannot be sent a frame of wire bytes")
+    transmit(buffer)
+
+
+try:
+    from bitops import bit_transpose as _native_transpose
+except ImportError:
+    _native_transpose = None
+
 _gpio_order = [getattr(microcontroller.pin, f"GPIO{i}", None) for i in range(32)]
 
 def _pin_directly_follows(a, b):
@@ -83,6 +139,12 @@ class NeoPIO(adafruit_pixelbuf.PixelBuf):
     :param bool auto_write: True if the neopixels should immediately change when set. If False,
       `show` must be called explicitly.
     :param str pixel_order: Set the pixel color channel order. GRBW is set by default.
+    :param bool double_buffer: True to send each frame with a background write from one of two
+      transposed buffers, so `show` only waits for the previous frame to finish going out while
+      the next one is transposed. Uses twice the transposed buffer memory.
+
+    A frame identical to the last one sent is not sent again. Without ``bitops``, only the
+    strands that changed since a buffer was last filled are transposed again.
 
     Example for Raspberry Pi Pico:
 
@@ -112,7 +174,7 @@ class NeoPIO(adafruit_pixelbuf.PixelBuf):
 
     def __init__(
         self, data, clock, strobe, n, *, num_strands=8, bpp=3, brightness=1.0,
-        auto_write=True, pixel_order=None
+        auto_write=True, pixel_order=None, double_buffer=False
     ):
         if not _pin_directly_follows(data, clock):
             raise ValueError("clock pin must directly follow data pin")
@@ -132,8 +194,21 @@ class NeoPIO(adafruit_pixelbuf.PixelBuf):
             n, brightness=brightness, byteorder=pixel_order, auto_write=auto_write
         )
 
-        self._transposed = bytearray(bpp*n*8//num_strands)
+        # Each transposed buffer keeps a copy of the frame it holds, so an
+        # unchanged frame or strand is never transposed or sent again
+        buffers = 2 if double_buffer else 1
+        self._buffers = [bytearray(bpp*n*8//num_strands) for _ in range(buffers)]
+        self._sources = [bytearray(bpp*n) for _ in range(buffers)]
+        self._transposed = self._buffers[0]
         self._num_strands = num_strands
+        # Which strands differ from the buffer's copy, refilled by each show
+        self._dirty = bytearray(num_strands)
+        self._double_buffer = double_buffer
+        self._next = 0
+        self._shown = None
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.strands_transposed = 0
 
         self._sm = rp2pio.StateMachine(
             _assembled,
@@ -155,6 +230,7 @@ class NeoPIO(adafruit_pixelbuf.PixelBuf):
         """Blank out the neopixels and release the state machine."""
         self.fill(0)
         self.show()
+        self._wait()
         self._sm.deinit()
 
     def __enter__(self):
@@ -180,6 +256,49 @@ class NeoPIO(adafruit_pixelbuf.PixelBuf):
         """
         return self._num_strands
 
+    def _wait(self):
+        while self._double_buffer and self._sm.writing:
+            pass
+
     def _transmit(self, buffer):
-        bitops.bit_transpose(buffer, self._transposed, self._num_strands)
-        self._sm.write(self._transposed)
+        shown = self._shown
+        if shown is not None and self._sources[shown] == buffer:
+            self.frames_skipped += 1
+            return
+        # With two buffers this is the one not on the wire: its write ended
+        # before the one now going out was started
+        k = self._next
+        out = self._buffers[k]
+        source = self._sources[k]
+        strands = self._num_strands
+        if _native_transpose is not None:
+            _native_transpose(buffer, out, strands)
+            self.strands_transposed += strands
+        else:
+            # Compared byte by byte in place; slicing would copy every strand
+            stride = len(buffer) // strands
+            dirty = self._dirty
+            changed = 0
+            for strand in range(strands):
+                i = strand * stride
+                end = i + stride
+                while i < end and buffer[i] == source[i]:
+                    i += 1
+                dirty[strand] = i < end
+                changed += dirty[strand]
+            if changed == strands:
+                bit_transpose(buffer, out, strands)
+            elif changed:
+                for strand in range(strands):
+                    if dirty[strand]:
+                        _transpose_strand(buffer, out, strands, strand)
+            self.strands_transposed += changed
+        source[:] = buffer
+        if self._double_buffer:
+            self._wait()
+            self._sm.background_write(once=out)
+            self._next = 1 - k
+        else:
+            self._sm.write(out)
+        self._shown = k
+        self.frames_sent += 1
@@ -0,0 +1,134 @@
+import board
+import busio
+from adafruit_ticks import ticks_ms, ticks_diff
+
+from nfc_reader import NfcReader, PRESENCE_TIMEOUT_MS
+
+# TCA9548A I2C switch with A0-A2 low, and its downstream channels. Every
+# PN532 answers at the same address, so several readers on one bus each
+# sit behind a channel of their own.
+MUX_ADDRESS = 0x70
+MUX_CHANNELS = 8
+
+# countio counts on a PWM slice's B pin and the RP2040 has one counter per
+# slice, so each slot's IRQ needs an odd GPIO on a slice of its own. These
+# are the ones this board has left over, in the order slots get them.
+IRQ_PINS = (board.GP17, board.GP19, board.GP21, board.GP9, board.GP11)
+
+
+class I2CMux():
+    """TCA9548A: opens one downstream channel at a time; `select` only writes on a change."""
+
+    def __init__(self, i2c, address=MUX_ADDRESS) -> None:
+        self.i2c = i2c
+        self.address = address
+        self.channel = None
+        self._buf = bytearray(1)
+
+    def select(self, channel):
+        if channel == self.channel:
+            return
+        if not 0 <= channel < MUX_CHANNELS:
+            raise ValueError("Out of range")
+        self._buf[0] = 1 << channel
+        while not self.i2c.try_lock():
+            pass
+        try:
+            self.i2c.writeto(self.address, self._buf)
+        finally:
+            self.i2c.unlock()
+        self.channel = channel
+
+
+class NfcReaderPool():
+    """
+    Several card slots, each a PN532 with its own IRQ line and its own
+    NfcReader: state machine, UID, preset and presence timer. A card on one
+    slot never affects another.
+
+    ``slots`` gives each slot's (channel, irq pin, ...): the channel of the
+    TCA9548A at ``mux_address`` its PN532 sits behind, or None for a single
+    PN532 straight on the bus; anything after those is the caller's.
+    ``i2c`` defaults to GP5/GP4. The callbacks are NfcReader's, called with
+    the slot's reader; its ``slot`` is the index in ``slots``. Each slot
+    takes up to ``max_targets`` stacked cards.
+
+    Readers are stepped round-robin, one per `poll`, and only those whose
+    IRQ counter moved or whose `NfcReader.next_deadline` passed; the rest
+    cost a counter read. One step is one short I2C transaction however
+    many slots there are, and a slot that keeps raising its IRQ cannot
+    starve the others. Call `poll` when `irq_pending` or when
+    `next_deadline` has passed, as with a single NfcReader.
+    """
+
+    def __init__(self, slots, on_card_detected, on_card_removed, presence_timeout=PRESENCE_TIMEOUT_MS,
+                 preset_cache=None, on_preset_changed=None, i2c=None, mux_address=MUX_ADDRESS,
+                 max_targets=1, on_card_swapped=None):
+        if i2c is None:
+            i2c = busio.I2C(board.GP5, board.GP4)
+        self.mux = None
+        self.channels = [slot[0] for slot in slots]
+        if any(channel is not None for channel in self.channels):
+            if None in self.channels:
+                raise ValueError("Every slot needs a channel")
+            self.mux = I2CMux(i2c, mux_address)
+
+        self.readers = []
+        for slot in range(len(slots)):
+            if self.mux is not None:
+                self.mux.select(self.channels[slot])
+            self.readers.append(NfcReader(
+                self._slot_callback(on_card_detected, slot),
+                self._slot_callback(on_card_removed, slot),
+                presence_timeout=presence_timeout,
+                preset_cache=preset_cache,
+                on_preset_changed=self._slot_callback(on_preset_changed, slot),
+                i2c=i2c,
+                irq=slots[slot][1],
+                slot=slot,
+                max_targets=max_targets,
+                on_card_swapped=self._slot_callback(on_card_swapped, slot)
+            ))
+        # Where the next round-robin pass starts
+        self.next_slot = 0
+
+    def _slot_callback(self, callback, slot):
+        if callback is None:
+            return None
+        return lambda: callback(self.readers[slot])
+
+    def irq_pending(self) -> bool:
+        for reader in self.readers:
+            if reader.interrupt.count > 0:
+                return True
+        return False
+
+    def next_deadline(self):
+        """The earliest of the readers' `NfcReader.next_deadline`; None if only IRQs matter."""
+        deadline = None
+        for reader in self.readers:
+            d = reader.next_deadline()
+            if d is not None and (deadline is None or ticks_diff(d, deadline) < 0):
+                deadline = d
+        return deadline
+
+    def poll(self) -> bool:
+        """Step the next reader with an IRQ or a deadline due. Returns False if none was."""
+        readers = self.readers
+        count = len(readers)
+        now = ticks_ms()
+        slot = self.next_slot
+        for _ in range(count):
+            reader = readers[slot]
+            due = reader.interrupt.count > 0
+            if not due:
+                deadline = reader.next_deadline()
+                due = deadline is not None and ticks_diff(now, deadline) >= 0
+            if due:
+                self.next_slot = slot + 1 if slot + 1 < count else 0
+                if self.mux is not None:
+                    self.mux.select(self.channels[slot])
+                reader.poll()
+                return True
+            slot = slot + 1 if slot + 1 < count else 0
+        return False
@@ -1,45 +1,398 @@
 import board
 import busio
 import countio
-import time
+from adafruit_ticks import ticks_ms, ticks_add, ticks_diff
+from adafruit_pn532.adafruit_pn532 import BusyError
 from adafruit_pn532.i2c import PN532_I2C
+from ndef_preset import MAX_NDEF_LENGTH, ndef_end
+
+# A card that has not been seen for this many ms is taken as removed
+PRESENCE_TIMEOUT_MS = 500
+# Resend the listen command if the PN532 has not acknowledged it by then
+ACK_TIMEOUT_MS = 50
+
+_ACK = b"\x00\x00\xFF\x00\xFF\x00"
+_PN532TOHOST = 0xD5
+_COMMAND_INLISTPASSIVETARGET = 0x4A
+_COMMAND_INDATAEXCHANGE = 0x40
+# InListPassiveTarget at 106 kbps type A (Mifare / NTAG), for up to
+# MAX_TARGETS cards at once
+MAX_TARGETS = 2
+_BAUD_TYPE_A = 0x00
+# Room for a 7 byte UID plus an ATS per card, as get_passive_target allows
+_TARGET_RESPONSE_LENGTH = 30
+# SEL_RES bit saying the card sent an ATS after its UID
+_SEL_RES_ATS = 0x20
+# NTAG READ answers with four pages; the NDEF area starts at page 4
+_NTAG_READ = 0x30
+_NTAG_FIRST_NDEF_PAGE = 4
+_PAGE_RESPONSE_LENGTH = 17
+# ISO14443A UIDs are 4, 7 or 10 bytes
+MAX_UID_LENGTH = 10
+
+# Reader states
+STATE_SEND = 0  # next step writes a command
+STATE_WAIT_ACK = 1  # command written, waiting for the PN532 to acknowledge it
+STATE_LISTENING = 2  # acknowledged, waiting for the card to answer
+
+# Why the NDEF pages are being read
+READ_NONE = 0
+READ_COLD = 1  # card not in the cache, detection waits for its preset
+READ_VERIFY = 2  # cached preset already applied, checking the card still matches
+
+
+class NfcTarget():
+    """
+    One card in the reader's field. ``number`` is its index in
+    `NfcReader.targets`; ``tg`` the PN532's target number for it in the
+    last listen that found it.
+    """
+
+    def __init__(self, number) -> None:
+        self.number = number
+        self.uid = bytearray(MAX_UID_LENGTH)
+        self.uid_length = 0  # 0 while no card
+        self.preset = None
+        self.last_seen = 0
+        self.tg = number + 1
+        self.read = READ_NONE  # why its NDEF pages are to be read
+        self.listed = False  # found by the last listen
+        # Took over from an announced card that has not been announced gone
+        self.swapping = False
 
 class NfcReader():
-    
-    def __init__(self, on_card_detected, on_card_removed):
+    """
+    Card presence on a PN532, without ever waiting on it.
+
+    The driver's listen_for_passive_target and get_passive_target block the
+    loop until the PN532 answers. Instead `poll` takes one step at a time:
+    write the listen command, read the ACK once the IRQ line drops, read
+    the target once it drops again, and start over. Each step is a single
+    short I2C transaction. Call `poll` when `irq_pending` or when
+    `next_deadline` has passed.
+
+    With ``max_targets`` 2 the listen asks for two cards, and two cards
+    stacked on the reader are both found in the one round trip. Each card
+    in the field has an NfcTarget in `targets`, with the UID copied in
+    place so reading a card allocates nothing of its own, and comes and
+    goes on its own. A card counts as removed once it has not answered
+    for ``presence_timeout`` ms. A new card answering while every target
+    is taken takes over from a card that was not listed with it.
+
+    Such a takeover is a swap: one card put on in place of another while
+    the old one still counts as present. With ``on_card_swapped`` it is
+    announced as one transition, the old card never removed; without,
+    the old card is removed and the new one detected. A swap to a card
+    whose preset is still being read is announced once it has been read.
+
+    The callbacks are about `card`, one of `targets`; `card_uid`, valid
+    for `card_uid_length` bytes, and `card_preset` are its. With one
+    target that is always the one card on the reader.
+
+    With a ``preset_cache`` (see ndef_preset) the NDEF pages of a new card
+    are read, four pages a step, and `card_preset` is set from them before
+    ``on_card_detected`` runs (None if the card carries no preset). A card
+    found in the cache is detected straight away with the cached preset
+    and its pages are read afterwards; if they changed, ``on_preset_changed``
+    is called with the new `card_preset`. Cards are read one at a time,
+    `reading` being the one whose pages are being read.
+
+    Without ``i2c`` and ``irq`` it is the controller's reader on GP5/GP4
+    with its IRQ on GP17. NfcReaderPool (see nfc_pool) passes its own bus
+    and IRQ pin for each slot, and ``slot`` is the reader's index there.
+    """
+
+    def __init__(self, on_card_detected, on_card_removed, presence_timeout=PRESENCE_TIMEOUT_MS,
+                 preset_cache=None, on_preset_changed=None, i2c=None, irq=None, slot=0,
+                 max_targets=1, on_card_swapped=None):
+        if not 1 <= max_targets <= MAX_TARGETS:
+            raise ValueError("Out of range")
         self.on_card_detected = on_card_detected
         self.on_card_removed = on_card_removed
+        self.on_preset_changed = on_preset_changed
+        self.on_card_swapped = on_card_swapped
+        self.presence_timeout = presence_timeout
+        self.preset_cache = preset_cache
+        self.slot = slot
 
-        i2c_0 = busio.I2C(board.GP5, board.GP4)
+        if i2c is None:
+            i2c = busio.I2C(board.GP5, board.GP4)
+        if irq is None:
+            irq = board.GP17
 
         self.pn532 = PN532_I2C(
-            i2c_0, 
+            i2c,
             debug=False,
-            irq=board.GP17
+            irq=irq
             )
-        self.interrupt = countio.Counter(board.GP17)
-        
+        self.interrupt = countio.Counter(irq)
+
         self.pn532.SAM_configuration()
-        self.pn532.listen_for_passive_target()
-
-        self.last_card_id = None
-        self.last_card_timestamp = time.monotonic()
-
-    def wait_for_card(self) -> str:
-        if self.interrupt.count > 0:
-            print('must read card', self.interrupt.count)
-            uid = self.pn532.get_passive_target()
-            cardIdString = None
-            if uid is not None:
-                print("UID:", ''.join(hex(i) for i in uid))
-                cardIdString = ''.join(hex(i) for i in uid)
-                if self.last_card_id is None:
-                    self.on_card_detected()
-                self.last_card_id = cardIdString
-            self.pn532.listen_for_passive_target()
+
+        self.targets = [NfcTarget(n) for n in range(max_targets)]
+        self.card = self.targets[0]
+        self._listen_command = bytes((0xD4, _COMMAND_INLISTPASSIVETARGET, max_targets, _BAUD_TYPE_A))
+        self._target_response_length = _TARGET_RESPONSE_LENGTH * max_targets + 2
+        # Where each card not tracked yet starts in the last listen's response
+        self._new_cards = [0] * max_targets
+
+        self.reading = None
+        self.ndef = bytearray(MAX_NDEF_LENGTH)
+        self.ndef_length = 0
+        self._read_command = bytearray((0xD4, _COMMAND_INDATAEXCHANGE, 0x01, _NTAG_READ, 0))
+
+        self.state = STATE_SEND
+        self.command_timestamp = 0
+        # A TraceRecorder, when IRQs and cards should be traced
+        self.trace = None
+        self._send(ticks_ms())
+
+    @property
+    def card_uid(self):
+        return self.card.uid
+
+    @property
+    def card_uid_length(self):
+        return self.card.uid_length
+
+    @property
+    def card_preset(self):
+        return self.card.preset
+
+    def irq_pending(self) -> bool:
+        return self.interrupt.count > 0
+
+    def next_deadline(self):
+        """
+        The tick `poll` must run by even without an IRQ, in
+        ``adafruit_ticks`` ms; None if only the IRQ matters.
+        """
+        if self.state == STATE_SEND:
+            return self.command_timestamp
+        deadline = None
+        if self.state == STATE_WAIT_ACK:
+            deadline = ticks_add(self.command_timestamp, ACK_TIMEOUT_MS)
+        for target in self.targets:
+            if target.uid_length:
+                removal = ticks_add(target.last_seen, self.presence_timeout)
+                if deadline is None or ticks_diff(removal, deadline) < 0:
+                    deadline = removal
+        return deadline
+
+    def poll(self):
+        now = ticks_ms()
+        if self.state == STATE_SEND:
+            self._send(now)
+        elif self.interrupt.count > 0:
             self.interrupt.reset()
-            self.last_card_timestamp = time.monotonic()
-        elif time.monotonic() > self.last_card_timestamp + 0.5 and self.last_card_id is not None:
-            print(f'card {self.last_card_id} lost')
-            self.last_card_id = None
-            self.on_card_removed()
\ No newline at end of file
+            if self.trace is not None:
+                self.trace.nfc_irq()
+            try:
+                if self.state == STATE_WAIT_ACK:
+                    if self.pn532._read_data(len(_ACK)) == _ACK:
+                        self.state = STATE_LISTENING
+                    else:
+                        self.state = STATE_SEND
+                else:
+                    if self.reading is not None:
+                        self._read_pages(now)
+                    else:
+                        self._read_targets(now)
+                    # Send the next command on the next step rather than in this one.
+                    self.state = STATE_SEND
+            except BusyError:
+                pass  # nothing to read yet, wait for the next edge
+            except RuntimeError as e:
+                print('PN532 frame error', e)
+                self.state = STATE_SEND
+        elif self.state == STATE_WAIT_ACK and ticks_diff(now, self.command_timestamp) > ACK_TIMEOUT_MS:
+            self.state = STATE_SEND
+
+        for target in self.targets:
+            if target.uid_length and ticks_diff(now, target.last_seen) > self.presence_timeout:
+                print('card lost')
+                self._card_gone(target)
+
+    def _send(self, now):
+        self.command_timestamp = now
+        if self.reading is None:
+            for target in self.targets:
+                if target.read:
+                    self.reading = target
+                    self.ndef_length = 0
+                    break
+        try:
+            if self.reading is not None:
+                self._read_command[2] = self.reading.tg
+                self._read_command[4] = _NTAG_FIRST_NDEF_PAGE + self.ndef_length // 4
+                self.pn532._write_frame(self._read_command)
+            else:
+                self.pn532._write_frame(self._listen_command)
+        except OSError:
+            return  # PN532 busy, try again on the next step
+        self.state = STATE_WAIT_ACK
+
+    def _read_targets(self, now):
+        response = self.pn532._read_frame(self._target_response_length)
+        if response[0] != _PN532TOHOST or response[1] != _COMMAND_INLISTPASSIVETARGET + 1:
+            raise RuntimeError("unexpected response")
+        targets = self.targets
+        for target in targets:
+            target.listed = False
+        # Cards already tracked are seen again; the rest are new
+        new = 0
+        count = response[2]
+        i = 3
+        for tg in range(1, count + 1):
+            if i + 5 > len(response):
+                break
+            length = response[i + 4]
+            if length > MAX_UID_LENGTH or i + 5 + length > len(response):
+                break
+            target = self._find(response, i + 5, length)
+            if target is None:
+                self._new_cards[new] = i
+                new += 1
+            else:
+                target.listed = True
+                target.last_seen = now
+                target.tg = tg
+            ats = response[i + 3] & _SEL_RES_ATS
+            i += 5 + length
+            if ats and i < len(response):
+                i += response[i]
+        for n in range(new):
+            i = self._new_cards[n]
+            target = self._free_target()
+            if target is None:
+                break
+            self._card_found(target, response, i, now)
+
+    def _find(self, response, start, length):
+        for target in self.targets:
+            if target.uid_length != length:
+                continue
+            uid = target.uid
+            for j in range(length):
+                if uid[j] != response[start + j]:
+                    break
+            else:
+                return target
+        return None
+
+    def _free_target(self):
+        # An empty target, else one whose card was not listed with the new one
+        for target in self.targets:
+            if not target.uid_length:
+                return target
+        for target in self.targets:
+            if not target.listed:
+                return target
+        return None
+
+    def _card_found(self, target, response, i, now):
+        swapping = False
+        if target.uid_length:
+            if self.on_card_swapped is not None and self._announced(target):
+                swapping = True
+                target.preset = None
+                target.read = READ_NONE
+                if self.reading is target:
+                    self.reading = None
+            else:
+                self._card_gone(target)
+        target.swapping = swapping
+        length = response[i + 4]
+        uid = target.uid
+        for j in range(length):
+            uid[j] = response[i + 5 + j]
+        target.uid_length = length
+        target.listed = True
+        target.last_seen = now
+        target.tg = response[i]
+        if self.trace is not None:
+            self.trace.nfc_uid(uid, length)
+
+        if self.preset_cache is None:
+            self._card_ready(target)
+            return
+        entry = self.preset_cache.find(uid, length)
+        if entry is None:
+            target.read = READ_COLD
+            return
+        target.preset = entry.preset if entry.has_preset else None
+        self._card_ready(target)
+        target.read = READ_VERIFY
+
+    def _announce(self, target, callback):
+        self.card = target
+        callback()
+
+    def _card_ready(self, target):
+        if target.swapping:
+            target.swapping = False
+            self._announce(target, self.on_card_swapped)
+        else:
+            self._announce(target, self.on_card_detected)
+
+    def _announced(self, target):
+        # Whether the callbacks know of a card on ``target``: one still in its
+        # first read was not announced, unless it is taking over from one that was
+        return target.read != READ_COLD or target.swapping
+
+    def _card_gone(self, target):
+        announced = self._announced(target)
+        target.swapping = False
+        target.uid_length = 0
+        if self.trace is not None:
+            self.trace.nfc_removed()
+        target.preset = None
+        target.read = READ_NONE
+        if self.reading is target:
+            self.reading = None
+        if announced:
+            self._announce(target, self.on_card_removed)
+
+    def _read_pages(self, now):
+        response = self.pn532._read_frame(_PAGE_RESPONSE_LENGTH + 2)
+        if response[0] != _PN532TOHOST or response[1] != _COMMAND_INDATAEXCHANGE + 1:
+            raise RuntimeError("unexpected response")
+        if response[2] != 0 or len(response) < _PAGE_RESPONSE_LENGTH + 2:
+            self._finish_read(False)  # card gone or not an NTAG
+            return
+        self.reading.last_seen = now
+        ndef = self.ndef
+        start = self.ndef_length
+        count = min(16, MAX_NDEF_LENGTH - start)
+        for i in range(count):
+            ndef[start + i] = response[3 + i]
+        self.ndef_length = start + count
+        end = ndef_end(ndef, self.ndef_length)
+        if end > 0:
+            self.ndef_length = end
+            self._finish_read(True)
+        elif end == 0 or self.ndef_length == MAX_NDEF_LENGTH:
+            self._finish_read(True)
+
+    def _finish_read(self, complete):
+        target = self.reading
+        reading = target.read
+        target.read = READ_NONE
+        self.reading = None
+        if not complete:
+            if reading == READ_COLD:
+                self._card_ready(target)
+            return
+        cache = self.preset_cache
+        uid = target.uid
+        length = target.uid_length
+        if reading == READ_VERIFY:
+            entry = cache.peek(uid, length)
+            if entry is not None and entry.matches(self.ndef, self.ndef_length):
+                return
+        entry = cache.store(uid, length, self.ndef, self.ndef_length)
+        target.preset = entry.preset if entry.has_preset else None
+        if reading == READ_COLD:
+            self._card_ready(target)
+        elif self.on_preset_changed is not None:
+            self._announce(target, self.on_preset_changed)
@@ -1,21 +1,66 @@
 import digitalio
 import rotaryio
+from adafruit_ticks import ticks_ms, ticks_diff
+
+# Acceleration: detents further apart than ACCEL_SLOW_MS count 1, detents
+# ACCEL_FAST_MS apart or closer count ACCEL_MAX_GAIN, linear in between.
+# A flick of 20 detents at 100 detents/s is then 140: all of 0-127.
+ACCEL_SLOW_MS = 60
+ACCEL_FAST_MS = 8
+ACCEL_MAX_GAIN = 8
 
 class RotaryEncoder():
-    def __init__(self, clkPin, dtPin) -> None:
+    def __init__(self, clkPin, dtPin, slow_ms=ACCEL_SLOW_MS, fast_ms=ACCEL_FAST_MS,
+                 max_gain=ACCEL_MAX_GAIN) -> None:
 
         self.encoder = rotaryio.IncrementalEncoder(clkPin, dtPin, divisor=2)
         
         self.prevRotaryVal = 0
         self.prevButtonVal = None
 
-    def listenToRotation(self, ):
-        if self.encoder.position is not self.prevRotaryVal:
-            isRotatingClockwise = self.encoder.position > self.prevRotaryVal
-            self.prevRotaryVal = self.encoder.position
-            return "CLOCKWISE" if isRotatingClockwise else "ANTICLOCKWISE"
-        else:
-            return None
+        self.slow_ms = slow_ms
+        self.fast_ms = fast_ms
+        self.max_gain = max_gain
+        self.last_step = 0
+        self.last_direction = 0
+        # A TraceRecorder, when deltas read should be traced
+        self.trace = None
+
+    def hasRotated(self):
+        return self.encoder.position != self.prevRotaryVal
+
+    def read_delta(self) -> int:
+        """Detents turned since the last read, clockwise positive."""
+        position = self.encoder.position
+        delta = position - self.prevRotaryVal
+        self.prevRotaryVal = position
+        if delta and self.trace is not None:
+            self.trace.encoder(delta)
+        return delta
+
+    def read_accelerated(self) -> int:
+        """
+        `read_delta` scaled by how fast the detents came: slow turns step by
+        one, fast spins by up to ``max_gain``. A change of direction starts
+        again from one.
+        """
+        delta = self.read_delta()
+        if not delta:
+            return 0
+        now = ticks_ms()
+        steps = delta if delta > 0 else -delta
+        direction = 1 if delta > 0 else -1
+        interval = ticks_diff(now, self.last_step) // steps
+        self.last_step = now
+        if direction != self.last_direction:
+            self.last_direction = direction
+            return delta
+        if interval >= self.slow_ms:
+            return delta
+        if interval <= self.fast_ms:
+            return delta * self.max_gain
+        gain = 1 + (self.max_gain - 1) * (self.slow_ms - interval) // (self.slow_ms - self.fast_ms)
+        return delta * gain
 
 
 class RotaryEncoderWithButton():
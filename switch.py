@@ -1,13 +1,13 @@
 import board
 import digitalio
 from adafruit_debouncer import Debouncer
-import time
+from adafruit_ticks import ticks_ms, ticks_diff
 
 ON = "ON"
 OFF = "OFF"
 BLINK = "BLINK"
 
-BLINK_DURATION_S = 0.5
+BLINK_DURATION_MS = 500
 
 
 class Switch:
@@ -38,7 +38,7 @@ class Switch:
             self.led.value = 0
 
         if self.state == BLINK:
-            self.blinkTimestamp = time.monotonic()
+            self.blinkTimestamp = ticks_ms()
             self.prevBlinkState = 1
             self.led.value = 1
 
@@ -46,9 +46,9 @@ class Switch:
 
     def animateBlink(self):
 
-        now = time.monotonic()
+        now = ticks_ms()
 
-        if now > self.blinkTimestamp + BLINK_DURATION_S:
+        if ticks_diff(now, self.blinkTimestamp) > BLINK_DURATION_MS:
             print("blink", now)
             self.blinkTimestamp = now
             self.prevBlinkState = not self.prevBlinkState
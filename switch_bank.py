@@ -0,0 +1,96 @@
+import keypad
+
+from switch import ON, BLINK, BLINK_DURATION_MS
+
+
+class SwitchBank():
+    """
+    A row of footswitches, each with an LED that is ON, OFF or BLINK as
+    with switch.Switch, read through one ``keypad`` scanner.
+
+    ``keys`` is a keypad.Keys, KeyMatrix or ShiftRegisterKeys. CircuitPython
+    scans and debounces the switches in the background and queues what
+    changed, so the loop only takes events off the queue: a pass costs
+    the same for 16 switches as for one. Two 74HC165 on ShiftRegisterKeys
+    read 16 switches with three pins.
+
+    ``leds`` has an output per key, anything with a ``value`` such as a
+    DigitalInOut switched to output, or None for a key without one. LEDs
+    are only written when their level changes. Every blinking LED follows
+    one shared timer on ``wakeup``, all in phase, and the timer only runs
+    while a key blinks.
+
+    ``on_press`` and ``on_release`` are called with the key number. Call
+    `update` when `events_pending`.
+    """
+
+    def __init__(self, keys, leds, wakeup, on_press, on_release=None, state=ON) -> None:
+        self.keys = keys
+        self.leds = leds
+        self.on_press = on_press
+        self.on_release = on_release
+        # Filled by get_into, so taking events off the queue allocates nothing
+        self.event = keypad.Event()
+
+        count = keys.key_count
+        self.states = [None] * count
+        self.levels = [None] * count
+        self.blinking = 0
+        self.blink_level = True
+        self.blink_timer = wakeup.timer(self.blink, period=BLINK_DURATION_MS)
+        for key in range(count):
+            self.set_state(key, state)
+
+    def events_pending(self) -> bool:
+        return len(self.keys.events) > 0
+
+    def update(self) -> int:
+        """Call back for every queued event. Returns how many there were."""
+        events = self.keys.events
+        event = self.event
+        handled = 0
+        while events.get_into(event):
+            handled += 1
+            if event.pressed:
+                self.on_press(event.key_number)
+            elif self.on_release is not None:
+                self.on_release(event.key_number)
+        if events.overflowed:
+            # Presses and releases were lost; start over from the keys held now
+            print("switch events lost")
+            events.clear()
+            self.keys.reset()
+        return handled
+
+    def set_state(self, key, state):
+        previous = self.states[key]
+        if state == previous:
+            return
+        self.states[key] = state
+        if previous == BLINK:
+            self.blinking -= 1
+            if not self.blinking:
+                self.blink_timer.cancel()
+        if state == BLINK:
+            if not self.blinking:
+                self.blink_level = True
+                self.blink_timer.wake_after(BLINK_DURATION_MS)
+            self.blinking += 1
+            self.write(key, self.blink_level)
+        else:
+            self.write(key, state == ON)
+
+    def blink(self):
+        """The shared timer's callback: every blinking LED changes over together."""
+        level = not self.blink_level
+        self.blink_level = level
+        states = self.states
+        for key in range(len(states)):
+            if states[key] == BLINK:
+                self.write(key, level)
+
+    def write(self, key, level):
+        led = self.leds[key]
+        if led is not None and self.levels[key] != level:
+            led.value = level
+            self.levels[key] = level
@@ -0,0 +1,195 @@
+import gc
+import sys
+from adafruit_ticks import ticks_ms, ticks_add, ticks_diff
+from supervisor import runtime
+
+# Step times are counted in buckets by powers of two of milliseconds:
+# bucket 0 is a step within one tick, bucket b one of 2**(b-1) up to 2**b
+# ms, and the last bucket takes everything longer.
+HISTOGRAM_BUCKETS = 12
+
+# gc.mem_free() walks the whole allocation table, around a millisecond on
+# the RP2040, so the heap is only looked at around one step every
+# HEAP_SAMPLE_MS, each task in turn. 0 brackets every step.
+HEAP_SAMPLE_MS = 500
+
+# Console commands
+COMMAND_PRINT = "p"
+COMMAND_SYSEX = "m"
+
+# SysEx dumps use the non-commercial manufacturer ID, then "P"
+SYSEX_ID = 0x7D
+SYSEX_PROFILE = 0x50
+SYSEX_VALUE_BYTES = 4
+
+
+class TaskStats():
+    """What the profiler knows about one task. All fields are ints."""
+
+    def __init__(self, name) -> None:
+        self.name = name
+        self.steps = 0
+        self.busy_ms = 0
+        self.max_ms = 0
+        self.histogram = [0] * HISTOGRAM_BUCKETS
+        self.heap_samples = 0
+        # Lowest gc.mem_free() seen around one of its steps, -1 before any
+        self.mem_free_low = -1
+        # Steps it was sampled in that ended with more free memory than
+        # they started with: a collection ran during the step
+        self.collections = 0
+
+    def record(self, ms):
+        self.steps += 1
+        self.busy_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+        bucket = 0
+        while ms and bucket < HISTOGRAM_BUCKETS - 1:
+            ms >>= 1
+            bucket += 1
+        self.histogram[bucket] += 1
+
+    def percentile(self, percent) -> int:
+        """Upper bound, in ms, of the step time ``percent`` of steps stay under."""
+        wanted = self.steps * percent // 100
+        seen = 0
+        for bucket in range(HISTOGRAM_BUCKETS):
+            seen += self.histogram[bucket]
+            if seen > wanted:
+                return 1 << bucket
+        return 1 << HISTOGRAM_BUCKETS
+
+    def line(self) -> str:
+        heap = f"{self.mem_free_low:7d} {self.collections:4d}" if self.heap_samples else "      -    -"
+        return (f"{self.name:<12}{self.steps:9d}{self.busy_ms:8d}{self.max_ms:6d}"
+                f"{self.percentile(50):6d}{self.percentile(99):6d} {heap}")
+
+
+class _Profiled():
+    """
+    Stands in for a coroutine and times each step of it: it has the
+    send/throw/close a coroutine has, so asyncio runs it as a task.
+    """
+
+    def __init__(self, profiler, stats, coro) -> None:
+        self.profiler = profiler
+        self.stats = stats
+        self.coro = coro
+
+    def send(self, value):
+        return self._step(self.coro.send, value)
+
+    def throw(self, *args):
+        return self._step(self.coro.throw, *args)
+
+    def close(self):
+        return self.coro.close()
+
+    def __await__(self):
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.send(None)
+
+    def _step(self, step, *args):
+        profiler = self.profiler
+        start = ticks_ms()
+        free = None
+        if profiler.heap_target is self.stats or profiler.heap_every_step:
+            if ticks_diff(start, profiler.next_heap_sample) >= 0:
+                free = profiler.mem_free()
+        try:
+            return step(*args)
+        finally:
+            self.stats.record(ticks_diff(ticks_ms(), start))
+            if free is not None:
+                profiler.heap_sampled(self.stats, free)
+
+
+class TaskProfiler():
+    """
+    Per-task loop timing and heap use for the controller's asyncio tasks.
+
+    `wrap` a coroutine before handing it to ``asyncio.create_task`` and
+    every step the task runs, from one await to the next, is timed in
+    ``adafruit_ticks`` milliseconds into that task's `TaskStats`. Timing
+    does not allocate; steps are timed to the tick, so ``busy_ms`` is right
+    on average and short steps fall in the first histogram bucket.
+
+    The heap is sampled around a step every ``heap_sample_ms`` (see
+    HEAP_SAMPLE_MS), going round the tasks; where ``gc.mem_free`` does not
+    exist heap stats are left out. Stats are read as text lines with
+    `report_lines` or as SysEx messages with `sysex_messages`, one task at
+    a time so the caller can yield in between.
+    """
+
+    def __init__(self, heap_sample_ms=HEAP_SAMPLE_MS) -> None:
+        self.tasks = []
+        self.mem_free = getattr(gc, "mem_free", None)
+        self.heap_sample_ms = heap_sample_ms
+        self.heap_every_step = self.mem_free is not None and heap_sample_ms == 0
+        self.heap_target = None
+        self.next_heap_sample = ticks_ms()
+        self.heap_turn = 0
+        self.mem_free_low = -1
+
+    def wrap(self, name, coro):
+        stats = TaskStats(name)
+        self.tasks.append(stats)
+        if self.mem_free is not None and self.heap_target is None and not self.heap_every_step:
+            self.heap_target = stats
+        return _Profiled(self, stats, coro)
+
+    def heap_sampled(self, stats, before):
+        after = self.mem_free()
+        stats.heap_samples += 1
+        if after > before:
+            stats.collections += 1
+        low = before if before < after else after
+        if stats.mem_free_low < 0 or low < stats.mem_free_low:
+            stats.mem_free_low = low
+        if self.mem_free_low < 0 or low < self.mem_free_low:
+            self.mem_free_low = low
+        if not self.heap_every_step:
+            self.heap_turn = (self.heap_turn + 1) % len(self.tasks)
+            self.heap_target = self.tasks[self.heap_turn]
+            self.next_heap_sample = ticks_add(ticks_ms(), self.heap_sample_ms)
+
+    # Reading the stats
+
+    def command_pending(self) -> bool:
+        return bool(runtime.serial_bytes_available)
+
+    def read_commands(self) -> str:
+        """Whatever was typed on the serial console since the last call."""
+        available = runtime.serial_bytes_available
+        return sys.stdin.read(available) if available else ""
+
+    def report_lines(self):
+        yield f"{'task':<12}{'steps':>9}{'busy ms':>8}{'max':>6}{'p50<':>6}{'p99<':>6} {'free lo':>7} {'gcs':>4}"
+        for stats in self.tasks:
+            yield stats.line()
+        if self.mem_free_low >= 0:
+            yield f"heap free low {self.mem_free_low}"
+
+    def sysex_messages(self):
+        """
+        One SysEx body (without F0 and F7) per task: SYSEX_ID, SYSEX_PROFILE,
+        the task's index, its name in ASCII and a 0, then steps, busy_ms,
+        max_ms, p50, p99, mem_free_low (0 when unknown) and collections,
+        each as SYSEX_VALUE_BYTES 7-bit bytes, most significant first.
+        """
+        for index, stats in enumerate(self.tasks):
+            message = bytearray((SYSEX_ID, SYSEX_PROFILE, index))
+            message.extend(stats.name.encode())
+            message.append(0)
+            for value in (stats.steps, stats.busy_ms, stats.max_ms, stats.percentile(50),
+                          stats.percentile(99), max(0, stats.mem_free_low), stats.collections):
+                value = min(value, (1 << 7 * SYSEX_VALUE_BYTES) - 1)
+                for shift in range(7 * (SYSEX_VALUE_BYTES - 1), -1, -7):
+                    message.append((value >> shift) & 0x7F)
+            yield message
@@ -0,0 +1,167 @@
+import binascii
+from adafruit_ticks import ticks_ms, ticks_add, ticks_diff
+
+# Bytes kept; MIDI clock at 120 BPM alone is about 150 bytes a second,
+# each pot's bursts 250
+TRACE_BUFFER_SIZE = 16384
+
+# Record kinds
+TRACE_MIDI_IN = 1  # bytes as read from the port
+TRACE_MIDI_OUT = 2  # bytes as written to the port
+TRACE_ENCODER = 3  # detents read, signed 16 bit
+TRACE_ADC = 4  # control number, then its 16-bit burst mean
+TRACE_NFC_IRQ = 5  # the PN532 IRQ was seen
+TRACE_NFC_UID = 6  # a new card's UID
+TRACE_NFC_REMOVED = 7  # the card was taken as gone
+MAX_PAYLOAD = 15
+
+# Console command that dumps the trace, and bytes per dumped line
+COMMAND_TRACE = "t"
+DUMP_LINE_BYTES = 48
+
+
+class TraceRecorder():
+    """
+    Every input event and MIDI message in and out, with its
+    ``adafruit_ticks`` millisecond time, in a ring buffer of ``size`` bytes.
+    When it is full the oldest records make room.
+
+    A record is a byte of kind << 4 | payload length, the ms since the
+    record before as a varint (7 bits a byte, low bits first, the top bit
+    set on all but the last byte) and the payload, at most MAX_PAYLOAD
+    bytes; longer MIDI chunks are split over several records. The first
+    record's time is ``first_tick`` and its own delta means nothing.
+    Recording writes into the buffer and allocates nothing.
+
+    `dump_lines` copies the buffer and returns it as hex text lines for
+    the serial console; host/replay_trace.py reads them back.
+    """
+
+    def __init__(self, size=TRACE_BUFFER_SIZE) -> None:
+        self.buffer = bytearray(size)
+        self.start = 0
+        self.used = 0
+        self.created_tick = ticks_ms()
+        self.first_tick = 0
+        self.last_tick = 0
+        self.records = 0
+        self.dropped = 0
+
+    # Recording
+
+    def midi_in(self, data, length):
+        self._record_bytes(TRACE_MIDI_IN, data, length)
+
+    def midi_out(self, data, length):
+        self._record_bytes(TRACE_MIDI_OUT, data, length)
+
+    def encoder(self, delta):
+        self._begin(TRACE_ENCODER, 2)
+        delta &= 0xFFFF
+        self._put(delta >> 8)
+        self._put(delta & 0xFF)
+
+    def adc(self, control, reading):
+        self._begin(TRACE_ADC, 3)
+        self._put(control)
+        self._put(reading >> 8)
+        self._put(reading & 0xFF)
+
+    def nfc_irq(self):
+        self._begin(TRACE_NFC_IRQ, 0)
+
+    def nfc_uid(self, uid, length):
+        self._record_bytes(TRACE_NFC_UID, uid, length)
+
+    def nfc_removed(self):
+        self._begin(TRACE_NFC_REMOVED, 0)
+
+    def _record_bytes(self, kind, data, length):
+        i = 0
+        while i < length:
+            n = length - i if length - i < MAX_PAYLOAD else MAX_PAYLOAD
+            self._begin(kind, n)
+            for j in range(i, i + n):
+                self._put(data[j])
+            i += n
+
+    def _begin(self, kind, length):
+        now = ticks_ms()
+        delta = ticks_diff(now, self.last_tick)
+        if delta < 0:
+            # Over three days since the last record, longer than ticks can tell
+            delta = 0
+        self.last_tick = now
+        # header, a varint of up to 5 bytes and the payload
+        while len(self.buffer) - self.used < 6 + length:
+            self._drop_oldest()
+        if not self.used:
+            self.first_tick = now
+            delta = 0
+        self._put(kind << 4 | length)
+        while delta > 0x7F:
+            self._put(0x80 | delta & 0x7F)
+            delta >>= 7
+        self._put(delta)
+        self.records += 1
+
+    def _put(self, byte):
+        buffer = self.buffer
+        i = self.start + self.used
+        if i >= len(buffer):
+            i -= len(buffer)
+        buffer[i] = byte
+        self.used += 1
+
+    def _skip(self, i):
+        # Index of the record after the one at i
+        buffer = self.buffer
+        size = len(buffer)
+        length = buffer[i] & 0x0F
+        i = (i + 1) % size
+        while buffer[i] & 0x80:
+            i = (i + 1) % size
+        return (i + 1 + length) % size
+
+    def _drop_oldest(self):
+        size = len(self.buffer)
+        following = self._skip(self.start)
+        self.used -= (following - self.start) % size
+        self.start = following
+        self.records -= 1
+        self.dropped += 1
+        if self.used:
+            # The new first record's time is the old first's plus its delta
+            buffer = self.buffer
+            i = (following + 1) % size
+            delta = 0
+            shift = 0
+            while True:
+                byte = buffer[i]
+                delta |= (byte & 0x7F) << shift
+                if not byte & 0x80:
+                    break
+                shift += 7
+                i = (i + 1) % size
+            self.first_tick = ticks_add(self.first_tick, delta)
+
+    # Reading out
+
+    def snapshot(self) -> bytes:
+        """The records, oldest first."""
+        end = self.start + self.used
+        if end <= len(self.buffer):
+            return bytes(self.buffer[self.start:end])
+        return bytes(self.buffer[self.start:]) + bytes(self.buffer[:end - len(self.buffer)])
+
+    def dump_lines(self):
+        """
+        "trace: begin <created tick> <first tick> <records> <dropped>", the
+        records as hex lines of "trace: " and DUMP_LINE_BYTES bytes, then
+        "trace: end".
+        """
+        data = self.snapshot()
+        yield f"trace: begin {self.created_tick} {self.first_tick} {self.records} {self.dropped}"
+        for i in range(0, len(data), DUMP_LINE_BYTES):
+            yield "trace: " + binascii.hexlify(data[i:i + DUMP_LINE_BYTES]).decode()
+        yield "trace: end"
@@ -0,0 +1,172 @@
+import asyncio
+from adafruit_ticks import ticks_ms, ticks_add, ticks_diff
+
+# How often an input is looked at unless `Wakeup.watch` is told otherwise.
+# MIDI clock at 300 BPM is one tick every 8.3 ms, so a tick is seen well
+# within a millisecond of arriving.
+CHECK_INTERVAL_MS = 1
+
+# Sleeps at least this long can be cut short by a deadline set meanwhile
+LONG_SLEEP_MS = 10
+
+
+class WakeSource():
+    """
+    Something a task waits for: an input that changed, a deadline that came
+    round, or a nudge from another task through `wake`.
+
+    ``deadline`` is in ``adafruit_ticks`` milliseconds, None for none; it
+    must stay within 2**28 ms (three days) of the present. With a
+    ``period`` the deadline moves on by that many ms each time it passes,
+    counted from the deadline rather than from when it was seen, so a
+    periodic source keeps its rate. ``callback`` is called from the poll
+    task each time the deadline passes, and `expired` is set until the
+    waiting task clears it. Set the deadline with `wake_at` or
+    `wake_after`, so a poll task asleep past it is woken in time.
+
+    ``check`` is called every ``interval`` ms.
+    """
+
+    def __init__(self, hub, check=None, callback=None, period=None, interval=CHECK_INTERVAL_MS) -> None:
+        self.hub = hub
+        self.check = check
+        self.callback = callback
+        self.period = period
+        self.interval = interval
+        self.next_check = ticks_ms()
+        self.deadline = None
+        self.expired = False
+        self.event = asyncio.Event()
+
+    def wake(self):
+        self.event.set()
+
+    def clear(self):
+        self.event.clear()
+
+    def wake_at(self, deadline):
+        """Set the deadline, None for none."""
+        self.deadline = deadline
+        if deadline is not None:
+            self.hub.due(deadline)
+
+    def wake_after(self, ms):
+        """Set the deadline ``ms`` milliseconds from now."""
+        self.wake_at(ticks_add(ticks_ms(), ms))
+
+    def cancel(self):
+        self.deadline = None
+
+    async def wait(self):
+        await self.event.wait()
+        self.event.clear()
+
+
+class Wakeup():
+    """
+    Lets the controller's tasks sleep until there is something for them to do,
+    and keeps every timer the controller has.
+
+    CircuitPython's asyncio cannot wait on pins or USB, so a single task reads
+    every input that was registered with `watch`, each once per its own
+    ``interval``, and wakes the tasks whose input changed or whose
+    ``deadline`` has passed. In between it sleeps until the next check or
+    deadline falls due and the supervisor can idle the CPU. Only an input
+    with no other way of being noticed, such as the USB MIDI port, needs
+    the fast default interval.
+
+    Deadlines are integer ``adafruit_ticks`` milliseconds, never float
+    ``time.monotonic()`` seconds, which on CircuitPython lose millisecond
+    resolution within hours of power-on. `timer` makes a one-shot or
+    periodic timer that runs a callback instead of, or as well as, waking a
+    task.
+
+    A check or callback is called from the poll task and should be as cheap
+    as a register read. A check may consume the input itself, as long as
+    the task it wakes picks up the result from where the check left it.
+    """
+
+    def __init__(self) -> None:
+        self.sources = []
+        # When the poll task next looks, and what rouses it from a long sleep
+        self.next_poll = None
+        self.roused = asyncio.Event()
+
+    def watch(self, check=None, interval=CHECK_INTERVAL_MS) -> WakeSource:
+        """A source woken by `WakeSource.wake`, its deadline, or ``check`` every ``interval`` ms."""
+        source = WakeSource(self, check, interval=interval)
+        self.sources.append(source)
+        return source
+
+    def timer(self, callback=None, period=None) -> WakeSource:
+        """
+        A timer, started with `WakeSource.wake_after`: one-shot, or every
+        ``period`` ms from then on until cancelled.
+        """
+        source = WakeSource(self, callback=callback, period=period)
+        self.sources.append(source)
+        return source
+
+    def due(self, deadline):
+        # A deadline was set; rouse the poll task if it would sleep past it
+        if self.next_poll is None or ticks_diff(deadline, self.next_poll) < 0:
+            self.next_poll = deadline
+            self.roused.set()
+
+    def poll(self) -> int:
+        """
+        One look at every source that is due, as `run` takes each time it
+        wakes; returns the ticks_ms the next one falls due.
+        """
+        now = ticks_ms()
+        next_poll = None
+        for source in self.sources:
+            deadline = source.deadline
+            if deadline is not None and ticks_diff(now, deadline) >= 0:
+                if source.period:
+                    deadline = ticks_add(deadline, source.period)
+                    if ticks_diff(now, deadline) >= 0:
+                        # Missed whole periods; go on from now
+                        deadline = ticks_add(now, source.period)
+                    source.deadline = deadline
+                else:
+                    source.deadline = None
+                source.expired = True
+                if source.callback is not None:
+                    source.callback()
+                source.event.set()
+                # The callback may have set it again
+                deadline = source.deadline
+            if source.check is not None:
+                if ticks_diff(now, source.next_check) >= 0:
+                    source.next_check = ticks_add(now, source.interval)
+                    if source.check():
+                        source.event.set()
+                if next_poll is None or ticks_diff(source.next_check, next_poll) < 0:
+                    next_poll = source.next_check
+            if deadline is not None and (next_poll is None or ticks_diff(deadline, next_poll) < 0):
+                next_poll = deadline
+        return next_poll
+
+    async def run(self):
+        while True:
+            # Deadlines set while polling, by a check, a callback or another
+            # task, are folded in through `due`
+            self.next_poll = None
+            next_poll = self.poll()
+            if self.next_poll is not None and (next_poll is None or ticks_diff(self.next_poll, next_poll) < 0):
+                next_poll = self.next_poll
+            self.next_poll = next_poll
+            self.roused.clear()
+            if next_poll is None:
+                # Nothing to look at until a deadline is set
+                await self.roused.wait()
+                continue
+            sleep = ticks_diff(next_poll, ticks_ms())
+            if sleep < LONG_SLEEP_MS:
+                await asyncio.sleep(max(0, sleep) / 1000)
+                continue
+            try:
+                await asyncio.wait_for(self.roused.wait(), sleep / 1000)
+            except asyncio.TimeoutError:
+                pass